@@ -0,0 +1,189 @@
+"""
+Bulk Streak Calculation
+
+Vectorized streak computation for many habits at once, used by the
+rebuild_streaks management command and bulk log imports. Works on flat
+NumPy arrays of completed log dates sorted by (habit_id, log_date) instead
+of per-habit lists of HabitLog objects.
+"""
+from datetime import date, timedelta
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from ..models import Habit, HabitLog, Streak
+from .leaderboard import refresh_leaderboard_entries
+
+EPOCH = date(1970, 1, 1)
+
+
+def dates_to_days(dates):
+    """Convert a sequence of dates to an int64 array of days since the epoch"""
+    return np.array(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def day_to_date(day):
+    """Convert days since the epoch back to a date"""
+    return EPOCH + timedelta(days=int(day))
+
+
+def compute_streak_runs(habit_ids, days, today):
+    """
+    Calculate streak runs for many habits at once.
+
+    A run is a maximal sequence of consecutive completed days of one habit.
+    The current streak of a habit is its last run if that run ends today or
+    yesterday, matching calculate_streaks.
+
+    Args:
+        habit_ids: int64 array of habit ids, sorted
+        days: int64 array of completed days (days since epoch), sorted within each habit
+        today: Today's date
+
+    Returns:
+        dict: {
+            'runs': {'habit_id', 'start', 'end', 'length', 'is_current'} arrays (one entry per run),
+            'habits': {'habit_id', 'current_streak', 'current_streak_start', 'longest_streak'} arrays
+                      (one entry per habit with at least one completed day)
+        }
+    """
+    count = len(days)
+    if count == 0:
+        empty = np.array([], dtype=np.int64)
+        return {
+            'runs': {
+                'habit_id': empty, 'start': empty, 'end': empty,
+                'length': empty, 'is_current': np.array([], dtype=bool)
+            },
+            'habits': {
+                'habit_id': empty, 'current_streak': empty,
+                'current_streak_start': empty, 'longest_streak': empty
+            },
+        }
+
+    # A new run starts at a new habit or after a gap of more than one day
+    new_run = np.ones(count, dtype=bool)
+    new_run[1:] = (habit_ids[1:] != habit_ids[:-1]) | (np.diff(days) != 1)
+    run_first = np.flatnonzero(new_run)
+    run_last = np.append(run_first[1:], count) - 1
+
+    run_habit = habit_ids[run_first]
+    run_start = days[run_first]
+    run_end = days[run_last]
+    run_length = run_last - run_first + 1
+
+    # Group runs by habit; the last run of each habit may be the current one
+    habit_first_run = np.flatnonzero(np.r_[True, run_habit[1:] != run_habit[:-1]])
+    habit_last_run = np.append(habit_first_run[1:], len(run_habit)) - 1
+
+    today_day = (today - EPOCH).days
+    is_live = run_end[habit_last_run] >= today_day - 1
+
+    run_is_current = np.zeros(len(run_habit), dtype=bool)
+    run_is_current[habit_last_run[is_live]] = True
+
+    return {
+        'runs': {
+            'habit_id': run_habit,
+            'start': run_start,
+            'end': run_end,
+            'length': run_length,
+            'is_current': run_is_current,
+        },
+        'habits': {
+            'habit_id': run_habit[habit_first_run],
+            'current_streak': np.where(is_live, run_length[habit_last_run], 0),
+            'current_streak_start': run_start[habit_last_run],
+            'longest_streak': np.maximum.reduceat(run_length, habit_first_run),
+        },
+    }
+
+
+def rebuild_streaks_for_habits(habits, today, dry_run=False):
+    """
+    Recompute current/longest streak and the Streak records of some habits.
+    
+    Completed logs of the habits are streamed ordered by (habit_id, log_date),
+    runs are computed with compute_streak_runs and the results are written
+    with bulk_update/bulk_create, replacing the habits' Streak records.
+    
+    Args:
+        habits: List of Habit instances (user_id, current_streak, longest_streak loaded)
+        today: Today's date
+        dry_run: Only compare with the stored values, don't write
+        
+    Returns:
+        dict: {'drifted': int, 'examples': [(habit_id, old_current, new_current, old_longest, new_longest)]}
+    """
+    result = {'drifted': 0, 'examples': []}
+    if not habits:
+        return result
+    
+    habit_ids = [habit.id for habit in habits]
+    rows = HabitLog.objects.filter(
+        habit_id__in=habit_ids,
+        status='completed',
+        log_date__lte=today
+    ).order_by('habit_id', 'log_date').values_list('habit_id', 'log_date')
+    
+    log_habit_ids = []
+    dates = []
+    for habit_id, log_date in rows.iterator(chunk_size=10000):
+        log_habit_ids.append(habit_id)
+        dates.append(log_date)
+    
+    streaks = compute_streak_runs(np.array(log_habit_ids, dtype=np.int64), dates_to_days(dates), today)
+    
+    # Habits without completed days have no entry and get zero streaks
+    computed = {
+        habit_id: (current, longest)
+        for habit_id, current, longest in zip(
+            streaks['habits']['habit_id'].tolist(),
+            streaks['habits']['current_streak'].tolist(),
+            streaks['habits']['longest_streak'].tolist()
+        )
+    }
+    
+    now = timezone.now()
+    changed = []
+    for habit in habits:
+        current, longest = computed.get(habit.id, (0, 0))
+        if habit.current_streak != current or habit.longest_streak != longest:
+            result['drifted'] += 1
+            if len(result['examples']) < 20:
+                result['examples'].append(
+                    (habit.id, habit.current_streak, current, habit.longest_streak, longest)
+                )
+            habit.current_streak = current
+            habit.longest_streak = longest
+            # bulk_update skips auto_now; delta sync relies on updated_at
+            habit.updated_at = now
+            changed.append(habit)
+    
+    if dry_run:
+        return result
+    
+    runs = streaks['runs']
+    streak_records = [
+        Streak(
+            habit_id=habit_id,
+            start_date=day_to_date(start),
+            end_date=None if is_current else day_to_date(end),
+            length_days=length,
+            is_current=is_current
+        )
+        for habit_id, start, end, length, is_current in zip(
+            runs['habit_id'].tolist(),
+            runs['start'].tolist(),
+            runs['end'].tolist(),
+            runs['length'].tolist(),
+            runs['is_current'].tolist()
+        )
+    ]
+    
+    with transaction.atomic():
+        Habit.objects.bulk_update(changed, ['current_streak', 'longest_streak', 'updated_at'], batch_size=1000)
+        Streak.objects.filter(habit_id__in=habit_ids).delete()
+        Streak.objects.bulk_create(streak_records, batch_size=1000)
+    
+    refresh_leaderboard_entries({habit.user_id for habit in changed})
+    return result
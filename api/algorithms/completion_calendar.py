@@ -0,0 +1,242 @@
+"""
+Completion Calendar
+
+This module maintains a compact per-habit completion calendar: one bit per
+day starting at Habit.calendar_start (the habit's creation date, moved back
+if older days get logged). Habit.completed_bitmap has a bit set for every
+completed day and Habit.missed_bitmap for every day that has a log which is
+not completed. Bitmaps are stored little-endian, so bit i is calendar_start + i.
+
+Streak and completion statistics can be computed from the bitmaps with
+integer bit operations instead of loading HabitLog rows.
+
+Bitmaps are rewritten whole from the Habit instance, so every write path
+locks the habit rows first (lock_calendars) and works on the values read
+under the lock; otherwise concurrent writes of different days would drop
+each other's bits.
+"""
+from datetime import date, timedelta
+from django.utils import timezone
+from ..models import Habit
+
+# Habit columns derived from the logs, read again under the lock
+CALENDAR_FIELDS = [
+    'calendar_start', 'completed_bitmap', 'missed_bitmap',
+    'current_streak', 'longest_streak', 'last_completed_date'
+]
+
+
+def _to_int(data):
+    """Convert a stored bitmap (bytes/memoryview) to an int"""
+    if not data:
+        return 0
+    return int.from_bytes(bytes(data), 'little')
+
+
+def _to_bytes(value):
+    """Convert an int bitmap to bytes for storage"""
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def _range_mask(first, last):
+    """Mask with bits first..last (inclusive) set"""
+    first = max(first, 0)
+    if last < first:
+        return 0
+    return ((1 << (last + 1)) - 1) ^ ((1 << first) - 1)
+
+
+def _longest_run(value):
+    """Length of the longest run of consecutive set bits"""
+    if not value:
+        return 0
+    return max(len(run) for run in bin(value)[2:].split('0'))
+
+
+def load_calendar(habit):
+    """
+    Load a habit's completion calendar.
+
+    Args:
+        habit: Habit instance
+
+    Returns:
+        tuple: (calendar_start, completed_bits, missed_bits) with the bitmaps as ints
+    """
+    calendar_start = habit.calendar_start or habit.created_at.date()
+    return (
+        calendar_start,
+        _to_int(habit.completed_bitmap),
+        _to_int(habit.missed_bitmap),
+    )
+
+
+def lock_calendars(habits):
+    """
+    Lock habit rows until the end of the transaction and reload their
+    calendar and streak columns onto the instances.
+
+    Must run inside transaction.atomic(), before the calendars are read.
+    Rows are locked in id order, like rollover.roll_over_habits does, so
+    concurrent writers cannot deadlock.
+
+    Args:
+        habits: List of Habit instances
+
+    Returns:
+        list: The same habits
+    """
+    locked = Habit.objects.select_for_update().filter(
+        id__in=[habit.id for habit in habits]
+    ).order_by('id').values('id', *CALENDAR_FIELDS)
+    current = {row.pop('id'): row for row in locked}
+    for habit in habits:
+        for field, value in current[habit.id].items():
+            setattr(habit, field, value)
+    return habits
+
+
+def store_calendar(habit, calendar_start, completed_bits, missed_bits):
+    """Write calendar state back onto the habit (not saved)"""
+    habit.calendar_start = calendar_start
+    habit.completed_bitmap = _to_bytes(completed_bits)
+    habit.missed_bitmap = _to_bytes(missed_bits)
+    return habit
+
+
+def record_log(habit, log_date, status):
+    """
+    Update the completion calendar for a single log write.
+
+    Args:
+        habit: Habit instance
+        log_date: Date of the log
+        status: New status of the log
+
+    Returns:
+        Habit: Updated habit instance (not saved)
+    """
+    calendar_start, completed_bits, missed_bits = load_calendar(habit)
+
+    if log_date < calendar_start:
+        # Move the start back in whole bytes so stored bitmaps stay aligned
+        shift = -(-(calendar_start - log_date).days // 8) * 8
+        completed_bits <<= shift
+        missed_bits <<= shift
+        calendar_start -= timedelta(days=shift)
+
+    bit = 1 << (log_date - calendar_start).days
+    completed_bits &= ~bit
+    missed_bits &= ~bit
+    if status == 'completed':
+        completed_bits |= bit
+    else:
+        missed_bits |= bit
+
+    return store_calendar(habit, calendar_start, completed_bits, missed_bits)
+
+
+def calendar_status(habit, log_date):
+    """
+    Status of a day in the completion calendar.
+
+    Args:
+        habit: Habit instance
+        log_date: Date to look up
+
+    Returns:
+        str or None: 'completed', 'missed' (a log that is not completed) or None (no log)
+    """
+    calendar_start, completed_bits, missed_bits = load_calendar(habit)
+    if log_date < calendar_start:
+        return None
+
+    index = (log_date - calendar_start).days
+    if completed_bits >> index & 1:
+        return 'completed'
+    if missed_bits >> index & 1:
+        return 'missed'
+    return None
+
+
+def year_bitmaps(habit):
+    """
+    Split the completion calendar into one pair of bitmaps per year.
+
+    Args:
+        habit: Habit instance
+
+    Returns:
+        dict: year -> (completed_bits, missed_bits) as ints where bit i is day
+              i of the year (January 1st is bit 0); years without logs are left out
+    """
+    calendar_start, completed_bits, missed_bits = load_calendar(habit)
+    logged_bits = completed_bits | missed_bits
+    if not logged_bits:
+        return {}
+
+    last_day = calendar_start + timedelta(days=logged_bits.bit_length() - 1)
+    years = {}
+    for year in range(calendar_start.year, last_day.year + 1):
+        offset = (date(year, 1, 1) - calendar_start).days
+        mask = (1 << (date(year + 1, 1, 1) - date(year, 1, 1)).days) - 1
+        if offset >= 0:
+            completed, missed = completed_bits >> offset & mask, missed_bits >> offset & mask
+        else:
+            completed, missed = completed_bits << -offset & mask, missed_bits << -offset & mask
+        if completed or missed:
+            years[year] = (completed, missed)
+    return years
+
+
+def rebuild_calendar(habit):
+    """
+    Rebuild the completion calendar from the habit's logs.
+
+    Args:
+        habit: Habit instance
+
+    Returns:
+        Habit: Updated habit instance (not saved)
+    """
+    store_calendar(habit, habit.created_at.date(), 0, 0)
+    for log_date, status in habit.logs.values_list('log_date', 'status'):
+        record_log(habit, log_date, status)
+    return habit
+
+
+def calendar_streaks(habit):
+    """
+    Calculate current and longest streak from the completion calendar.
+    Bit-operation equivalent of streak_calculator.calculate_streaks.
+
+    Args:
+        habit: Habit instance
+
+    Returns:
+        dict: {'current_streak': int, 'longest_streak': int, 'current_streak_start': date or None}
+    """
+    calendar_start, completed_bits, _ = load_calendar(habit)
+
+    if not completed_bits:
+        return {'current_streak': 0, 'longest_streak': 0, 'current_streak_start': None}
+
+    current_streak = 0
+    current_streak_start = None
+    today_index = (timezone.now().date() - calendar_start).days
+
+    # Streak counts back from today, or from yesterday if today is not completed
+    end_index = today_index if (today_index >= 0 and completed_bits >> today_index & 1) else today_index - 1
+    if end_index >= 0 and completed_bits >> end_index & 1:
+        # bin() of the bits up to end_index starts at end_index, so the
+        # leading ones are the run ending there
+        bits = bin(completed_bits & _range_mask(0, end_index))[2:]
+        zero_at = bits.find('0')
+        current_streak = len(bits) if zero_at == -1 else zero_at
+        current_streak_start = calendar_start + timedelta(days=end_index - current_streak + 1)
+
+    return {
+        'current_streak': current_streak,
+        'longest_streak': _longest_run(completed_bits),
+        'current_streak_start': current_streak_start
+    }
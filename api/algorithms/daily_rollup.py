@@ -0,0 +1,155 @@
+"""
+Daily Rollups
+
+This module maintains UserDailyRollup rows (habits completed, habits missed
+and active habits per user and day) so calendar and heatmap views never
+aggregate habit logs. Single log writes upsert their day with relative
+updates; bulk writes (imports, rollovers, habit edits) recompute from
+habits and logs.
+"""
+from bisect import bisect_right
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import connection
+from django.db.models import Count, Q
+from ..models import Habit, HabitLog, UserDailyRollup
+
+
+def rollup_deltas(old_status, new_status):
+    """
+    Change of a day's (completed, missed) counts when one log changes.
+
+    Args:
+        old_status: Calendar status before the write ('completed', 'missed' or None)
+        new_status: Log status after the write (None if the log was removed)
+
+    Returns:
+        tuple: (completed_delta, missed_delta)
+    """
+    old_completed = old_status == 'completed'
+    new_completed = new_status == 'completed'
+    return (
+        int(new_completed) - int(old_completed),
+        int(new_status is not None and not new_completed) - int(old_status is not None and not old_completed)
+    )
+
+
+def record_rollup_change(user_id, day, completed_delta=0, missed_delta=0):
+    """
+    Apply a log write of an active habit to a user's rollup row.
+
+    One upsert: an existing row is changed by the deltas; a day without a
+    row had no logs yet, so its row starts from this write, with
+    total_active counted in the same statement.
+
+    Args:
+        user_id: ID of the user
+        day: Date of the log
+        completed_delta: Change of the number of completed logs that day
+        missed_delta: Change of the number of not completed logs that day
+    """
+    if not completed_delta and not missed_delta:
+        return
+
+    # Habits created before the end of the day (UTC), like refresh_daily_rollups
+    day_end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {UserDailyRollup._meta.db_table} (user_id, date, completed, missed, total_active)
+            SELECT %s, %s, %s, %s, COUNT(*) FROM {Habit._meta.db_table}
+            WHERE user_id = %s AND is_active AND created_at < %s
+            ON CONFLICT (user_id, date) DO UPDATE SET
+                completed = {UserDailyRollup._meta.db_table}.completed + %s,
+                missed = {UserDailyRollup._meta.db_table}.missed + %s
+            """,
+            [
+                user_id, day, max(completed_delta, 0), max(missed_delta, 0),
+                user_id, connection.ops.adapt_datetimefield_value(day_end),
+                completed_delta, missed_delta
+            ]
+        )
+
+
+def refresh_daily_rollups(user_ids, days=None):
+    """
+    Recompute rollup rows of some users from their habits and logs.
+
+    Rows are written for every day with at least one log of an active habit
+    and removed for days that no longer have one.
+
+    Args:
+        user_ids: Iterable of user ids
+        days: Iterable of dates to recompute (default: every day)
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    logs = HabitLog.objects.filter(habit__user_id__in=user_ids, habit__is_active=True)
+    rows = UserDailyRollup.objects.filter(user_id__in=user_ids)
+    if days is not None:
+        days = set(days)
+        if not days:
+            return
+        logs = logs.filter(log_date__in=days)
+        rows = rows.filter(date__in=days)
+
+    counts = logs.values('habit__user_id', 'log_date').annotate(
+        completed=Count('id', filter=Q(status='completed')),
+        missed=Count('id', filter=~Q(status='completed'))
+    ).values_list('habit__user_id', 'log_date', 'completed', 'missed')
+
+    # Creation dates of each user's active habits, for total_active
+    created = {}
+    for user_id, created_at in Habit.objects.filter(
+        user_id__in=user_ids, is_active=True
+    ).values_list('user_id', 'created_at'):
+        created.setdefault(user_id, []).append(created_at.date())
+    for dates in created.values():
+        dates.sort()
+
+    rollups = [
+        UserDailyRollup(
+            user_id=user_id,
+            date=log_date,
+            completed=completed,
+            missed=missed,
+            total_active=bisect_right(created.get(user_id, []), log_date)
+        )
+        for user_id, log_date, completed, missed in counts
+    ]
+    UserDailyRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['completed', 'missed', 'total_active'],
+        batch_size=1000
+    )
+
+    current = {(rollup.user_id, rollup.date) for rollup in rollups}
+    stale = [
+        rollup_id
+        for rollup_id, user_id, day in rows.values_list('id', 'user_id', 'date')
+        if (user_id, day) not in current
+    ]
+    if stale:
+        UserDailyRollup.objects.filter(id__in=stale).delete()
+
+
+def get_rollup_calendar(user, start_date, end_date):
+    """
+    Read a user's rollup rows for a date range.
+
+    Args:
+        user: User instance
+        start_date: First day (inclusive)
+        end_date: Last day (inclusive)
+
+    Returns:
+        QuerySet: UserDailyRollup rows ordered by date (days without logs have no row)
+    """
+    return UserDailyRollup.objects.filter(
+        user=user,
+        date__gte=start_date,
+        date__lte=end_date
+    ).order_by('date')
@@ -0,0 +1,214 @@
+"""
+Global Leaderboard
+
+In-process rank index over every user's leaderboard figures, so global
+top-N lists and "my rank" never sort the users table.
+
+Each board (current streak, total completions) is a ScoreIndex: users are
+bucketed by score and a Fenwick tree over the scores counts users per score,
+giving a user's rank (number of users with a higher score + 1) in O(log S),
+S being the highest score. The index is built from LeaderboardEntry on first
+use in each process, updated in place by this process' writes and synced
+with entries written by other processes every few seconds. Deleted users are
+dropped when their entry is deleted (drop_deleted_entry), and by readers
+that come across users deleted by other processes.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+from heapq import nsmallest
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import LeaderboardEntry
+
+# Board name -> LeaderboardEntry field
+GLOBAL_BOARDS = {
+    'streak': 'total_current_streak',
+    'completions': 'total_completions',
+}
+
+# Entries updated shortly before the last sync are read again, so writes
+# whose transaction committed after that sync are not missed
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class ScoreIndex:
+    """
+    Rank structure for non-negative integer scores.
+
+    Users with equal scores share a rank; top() breaks ties by user id.
+    """
+
+    def __init__(self):
+        self._scores = {}       # user id -> score
+        self._buckets = {}      # score -> set of user ids
+        self._distinct = []     # sorted scores with a non-empty bucket
+        self._tree = [0] * 65   # Fenwick tree over scores 0..63 (1-based)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _tree_add(self, score, delta):
+        index = score + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _count_at_most(self, score):
+        """Number of users with a score <= score"""
+        index = min(score + 1, len(self._tree) - 1)
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def _grow(self, score):
+        """Resize the tree so it covers score, rebuilding it from the buckets"""
+        size = len(self._tree) - 1
+        while size <= score:
+            size *= 2
+        self._tree = [0] * (size + 1)
+        for bucket_score, bucket in self._buckets.items():
+            self._tree_add(bucket_score, len(bucket))
+
+    def remove(self, user_id):
+        score = self._scores.pop(user_id, None)
+        if score is None:
+            return
+        bucket = self._buckets[score]
+        bucket.discard(user_id)
+        if not bucket:
+            del self._buckets[score]
+            del self._distinct[bisect_left(self._distinct, score)]
+        self._tree_add(score, -1)
+
+    def set(self, user_id, score):
+        score = max(score, 0)
+        if self._scores.get(user_id) == score:
+            return
+        self.remove(user_id)
+
+        if score >= len(self._tree) - 1:
+            self._grow(score)
+        self._scores[user_id] = score
+        if score not in self._buckets:
+            self._buckets[score] = set()
+            insort(self._distinct, score)
+        self._buckets[score].add(user_id)
+        self._tree_add(score, 1)
+
+    def score(self, user_id):
+        return self._scores.get(user_id)
+
+    def rank(self, user_id):
+        """1-based rank of a user, or None if the user is not indexed"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return len(self._scores) - self._count_at_most(score) + 1
+
+    def top(self, limit):
+        """
+        Highest scores first, as (rank, user_id, score). Users with a score
+        of 0 are left out.
+        """
+        rows = []
+        rank = 1
+        for score in reversed(self._distinct):
+            if score == 0 or len(rows) >= limit:
+                break
+            bucket = self._buckets[score]
+            for user_id in nsmallest(limit - len(rows), bucket):
+                rows.append((rank, user_id, score))
+            rank += len(bucket)
+        return rows
+
+
+class GlobalLeaderboard:
+    """The per-process set of board indexes, kept in sync with LeaderboardEntry"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = None
+        self._synced_at = None
+        self._checked_at = 0.0
+
+    @property
+    def is_built(self):
+        return self._boards is not None
+
+    def _apply(self, rows):
+        """Set scores from (user_id, total_current_streak, total_completions) rows"""
+        for user_id, streak, completions in rows:
+            self._boards['streak'].set(user_id, streak)
+            self._boards['completions'].set(user_id, completions)
+
+    def _sync(self):
+        """Build the indexes, or apply entries written since the last sync"""
+        now = timezone.now()
+        entries = LeaderboardEntry.objects.all()
+        if self._boards is None:
+            self._boards = {board: ScoreIndex() for board in GLOBAL_BOARDS}
+        else:
+            entries = entries.filter(updated_at__gte=self._synced_at - SYNC_OVERLAP)
+
+        self._apply(entries.values_list('user_id', 'total_current_streak', 'total_completions').iterator())
+        self._synced_at = now
+        self._checked_at = time.monotonic()
+
+    def _ensure_synced(self):
+        interval = getattr(settings, 'GLOBAL_LEADERBOARD_SYNC_SECONDS', 10)
+        if self._boards is None or time.monotonic() - self._checked_at >= interval:
+            self._sync()
+
+    def rebuild(self):
+        """Drop the indexes and build them again from the database"""
+        with self._lock:
+            self._boards = None
+            self._sync()
+
+    def update(self, rows):
+        """
+        Apply fresh (user_id, total_current_streak, total_completions) values.
+        Does nothing until the indexes are built in this process.
+        """
+        with self._lock:
+            if self._boards is not None:
+                self._apply(rows)
+
+    def remove(self, user_ids):
+        """Drop deleted users from the indexes"""
+        with self._lock:
+            if self._boards is not None:
+                for user_id in user_ids:
+                    for index in self._boards.values():
+                        index.remove(user_id)
+
+    def top(self, board, limit):
+        """Top `limit` users of a board as (rank, user_id, score)"""
+        with self._lock:
+            self._ensure_synced()
+            return self._boards[board].top(limit)
+
+    def rank(self, board, user_id):
+        """(rank, score) of a user on a board, or (None, None) if not ranked"""
+        with self._lock:
+            self._ensure_synced()
+            index = self._boards[board]
+            return index.rank(user_id), index.score(user_id)
+
+    def size(self, board):
+        with self._lock:
+            self._ensure_synced()
+            return len(self._boards[board])
+
+
+global_leaderboard = GlobalLeaderboard()
+
+
+def drop_deleted_entry(sender, instance, **kwargs):
+    """post_delete handler for LeaderboardEntry (deleted with its user)"""
+    transaction.on_commit(lambda: global_leaderboard.remove([instance.user_id]))
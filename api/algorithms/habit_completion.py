@@ -5,8 +5,24 @@ This module contains algorithms for managing habit completion
 and awarding leaf dollars for streaks.
 """
 from django.utils import timezone
+from django.db import connection, transaction
+from django.db.models import Count, Min, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import ExtractIsoWeekDay
 from datetime import date, timedelta
-from .streak_calculator import update_streak
+from .streak_calculator import update_streak_for_date
+from .completion_calendar import calendar_status, lock_calendars, record_log
+from .daily_rollup import record_rollup_change, rollup_deltas
+from .user_stats import invalidate_user_stats
+from .leaderboard import record_leaderboard_change
+from .leaf_dollars import apply_leaf_dollar_entries, credit_leaf_dollars
+from ..feed import fan_out_completion, fan_out_completions
+from ..models import Habit, HabitLog
+
+# Habit columns changed by a completion
+COMPLETION_UPDATE_FIELDS = [
+    'last_completed_date', 'current_streak', 'longest_streak',
+    'calendar_start', 'completed_bitmap', 'missed_bitmap', 'updated_at'
+]
 
 
 def get_today_completion(habit):
@@ -26,6 +42,133 @@ def get_today_completion(habit):
         return None
 
 
+def annotate_completion_summary(habits):
+    """
+    Attach completion data to a Habit queryset without per-habit queries.
+    
+    Each habit gets `completed_count` (number of completed logs) as an
+    annotation and `today_logs` (list with today's log, if any) as a prefetch.
+    
+    Args:
+        habits: Habit QuerySet
+        
+    Returns:
+        QuerySet: Annotated queryset
+    """
+    today = timezone.now().date()
+    return habits.annotate(
+        completed_count=Count('logs', filter=Q(logs__status='completed'))
+    ).prefetch_related(
+        Prefetch('logs', queryset=HabitLog.objects.filter(log_date=today), to_attr='today_logs')
+    )
+
+
+def annotate_today_status(habits):
+    """
+    Annotate a Habit queryset with `today_status`, the status of today's log
+    (None if there is none), for check_can_complete.
+    
+    Args:
+        habits: Habit QuerySet
+        
+    Returns:
+        QuerySet: Annotated queryset
+    """
+    today = timezone.now().date()
+    return habits.annotate(
+        today_status=Subquery(
+            HabitLog.objects.filter(habit=OuterRef('pk'), log_date=today).values('status')[:1]
+        )
+    )
+
+
+def _from_db(field_name, value):
+    """Convert a raw cursor value of a HabitLog column like the ORM does"""
+    column = HabitLog._meta.get_field(field_name).get_col(HabitLog._meta.db_table)
+    for converter in connection.ops.get_db_converters(column) + column.get_db_converters(connection):
+        value = converter(value, column, connection)
+    return value
+
+
+def upsert_completed_logs(habits, log_date, notes='', amount_done=None):
+    """
+    Mark the logs of habits for a day completed with a single
+    INSERT ... ON CONFLICT (habit_id, log_date) DO UPDATE statement.
+    
+    An existing log is only updated if it is not completed yet, so the same
+    day can never be completed (and rewarded) twice, even by concurrent
+    requests. Like the other completion paths, an existing amount is kept
+    when none is given.
+    
+    Args:
+        habits: List of Habit instances (distinct)
+        log_date: Date of the logs
+        notes: Optional notes
+        amount_done: Optional amount completed
+        
+    Returns:
+        dict: habit id -> completed HabitLog, for the habits whose log was
+              not completed yet
+    """
+    if amount_done is not None:
+        amount_done = HabitLog._meta.get_field('amount_done').to_python(amount_done)
+    now = timezone.now()
+    db_now = connection.ops.adapt_datetimefield_value(now)
+    db_amount = connection.ops.adapt_decimalfield_value(amount_done, 10, 2)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO habit_logs (habit_id, log_date, status, amount_done, note, created_at, updated_at)
+            VALUES {', '.join(["(%s, %s, 'completed', %s, %s, %s, %s)"] * len(habits))}
+            ON CONFLICT (habit_id, log_date) DO UPDATE SET
+                status = EXCLUDED.status,
+                amount_done = COALESCE(EXCLUDED.amount_done, habit_logs.amount_done),
+                note = EXCLUDED.note,
+                updated_at = EXCLUDED.updated_at
+            WHERE habit_logs.status <> 'completed'
+            RETURNING habit_id, id, amount_done, created_at
+            """,
+            [
+                param
+                for habit in habits
+                for param in (habit.id, log_date, db_amount, notes, db_now, db_now)
+            ]
+        )
+        rows = cursor.fetchall()
+    
+    habits_by_id = {habit.id: habit for habit in habits}
+    return {
+        habit_id: HabitLog(
+            id=log_id,
+            habit=habits_by_id[habit_id],
+            log_date=log_date,
+            status='completed',
+            amount_done=_from_db('amount_done', amount_done),
+            note=notes,
+            created_at=_from_db('created_at', created_at),
+            updated_at=now
+        )
+        for habit_id, log_id, amount_done, created_at in rows
+    }
+
+
+def upsert_completed_log(habit, log_date, notes='', amount_done=None):
+    """
+    Mark a habit's log for a day completed (see upsert_completed_logs).
+    
+    Args:
+        habit: Habit instance
+        log_date: Date of the log
+        notes: Optional notes
+        amount_done: Optional amount completed
+        
+    Returns:
+        HabitLog or None: The completed log, or None if it was already completed
+    """
+    return upsert_completed_logs([habit], log_date, notes, amount_done).get(habit.id)
+
+
 def calculate_leaf_dollars_reward(is_new_completion=True):
     """
     Calculate leaf dollars reward for completing a habit.
@@ -46,67 +189,65 @@ def mark_habit_complete(habit, notes='', amount_done=None):
     """
     Mark a habit as complete for today and award leaf dollars.
     
+    Runs in one transaction that locks the habit row (lock_calendars) and
+    otherwise only writes, one statement per table: today's log is upserted
+    (upsert_completed_log), a streak continuing from yesterday is extended
+    with one conditional UPDATE, only the changed habit columns are written,
+    and the daily rollup, balance, ledger and leaderboard are updated
+    without reading them first.
+    
     Args:
         habit: Habit instance
         notes: Optional notes
         amount_done: Optional amount completed (for count/time tracking modes)
         
     Returns:
-        dict: {'completion': HabitLog, 'leaf_dollars_earned': int, 'new_streak': int}
+        dict: {'completion': HabitLog, 'leaf_dollars_earned': int, 'new_streak': int,
+               'already_completed': bool}
     """
     today = timezone.now().date()
     
-    # Check if already completed today BEFORE creating/updating
-    existing_log = None
-    try:
-        existing_log = habit.logs.get(log_date=today)
-        was_already_completed = existing_log.status == 'completed'
-    except habit.logs.model.DoesNotExist:
-        was_already_completed = False
-    
-    # Create or update the log
-    if existing_log:
-        # Already has a log for today
-        if was_already_completed:
+    with transaction.atomic():
+        lock_calendars([habit])
+        log = upsert_completed_log(habit, today, notes, amount_done)
+        if log is None:
             # Already completed - don't award again
             return {
-                'completion': existing_log,
+                'completion': habit.logs.get(log_date=today),
                 'leaf_dollars_earned': 0,
-                'new_streak': habit.current_streak or 0
+                'new_streak': habit.current_streak or 0,
+                'already_completed': True
             }
-        # Update existing log to completed
-        existing_log.status = 'completed'
-        existing_log.note = notes
-        if amount_done is not None:
-            existing_log.amount_done = amount_done
-        existing_log.save()
-        log = existing_log
-    else:
-        # Create new log
-        log = habit.logs.create(
-            log_date=today,
-            status='completed',
-            note=notes,
-            amount_done=amount_done
+        
+        # Update habit calendar, streak and last completed date
+        old_streak = habit.current_streak or 0
+        old_status = calendar_status(habit, today)
+        record_log(habit, today, 'completed')
+        habit.last_completed_date = today
+        update_streak_for_date(habit, today, was_completed=False, is_completed=True)
+        habit.save(update_fields=COMPLETION_UPDATE_FIELDS)
+        record_rollup_change(habit.user_id, today, *rollup_deltas(old_status, 'completed'))
+        
+        # Award 1 leaf dollar for this new completion
+        leaf_dollars_earned = calculate_leaf_dollars_reward(is_new_completion=True)
+        if leaf_dollars_earned > 0:
+            credit_leaf_dollars(habit.user, leaf_dollars_earned, 'completion', habit.id)
+        
+        record_leaderboard_change(
+            habit.user_id,
+            streak_delta=habit.current_streak - old_streak,
+            completions_delta=1,
+            week_completions_delta=1
         )
     
-    # Update habit streak and last completed date
-    habit.last_completed_date = today
-    update_streak(habit)
-    habit.save()
-    
-    # Award 1 leaf dollar for this new completion
-    leaf_dollars_earned = calculate_leaf_dollars_reward(is_new_completion=True)
-    
-    # Award leaf dollars to user
-    if leaf_dollars_earned > 0:
-        habit.user.leaf_dollars += leaf_dollars_earned
-        habit.user.save()
+    fan_out_completion(habit)
+    invalidate_user_stats(habit.user_id)
     
     return {
         'completion': log,
         'leaf_dollars_earned': leaf_dollars_earned,
-        'new_streak': habit.current_streak or 0
+        'new_streak': habit.current_streak or 0,
+        'already_completed': False
     }
 
 
@@ -124,18 +265,36 @@ def mark_habit_incomplete(habit, status='missed'):
     """
     today = timezone.now().date()
     
-    log, created = habit.logs.get_or_create(
-        log_date=today,
-        defaults={'status': status}
-    )
-    
-    if not created:
-        log.status = status
-        log.save()
+    with transaction.atomic():
+        lock_calendars([habit])
+        log, created = habit.logs.get_or_create(
+            log_date=today,
+            defaults={'status': status}
+        )
+        
+        was_completed = False
+        if not created:
+            was_completed = log.status == 'completed'
+            log.status = status
+            log.save()
+        
+        # Update calendar and streak (streak breaks on missed day)
+        old_streak = habit.current_streak or 0
+        is_completed = status == 'completed'
+        old_status = calendar_status(habit, today)
+        record_log(habit, today, status)
+        update_streak_for_date(habit, today, was_completed=was_completed, is_completed=is_completed)
+        habit.save()
+        record_rollup_change(habit.user_id, today, *rollup_deltas(old_status, status))
+        completions_delta = int(is_completed) - int(was_completed)
+        record_leaderboard_change(
+            habit.user_id,
+            streak_delta=habit.current_streak - old_streak,
+            completions_delta=completions_delta,
+            week_completions_delta=completions_delta
+        )
     
-    # Update streak (streak breaks on missed day)
-    update_streak(habit)
-    habit.save()
+    invalidate_user_stats(habit.user_id)
     
     return log
 
@@ -151,11 +310,25 @@ def can_complete_habit(habit):
     Returns:
         dict: {'can_complete': bool, 'reason': str}
     """
-    today = timezone.now().date()
     today_log = get_today_completion(habit)
+    return check_can_complete(habit, today_log.status if today_log else None)
+
+
+def check_can_complete(habit, today_status):
+    """
+    Check if a habit can be completed, given the status of today's log.
+    
+    Args:
+        habit: Habit instance
+        today_status: Status of today's log, or None if there is none
+        
+    Returns:
+        dict: {'can_complete': bool, 'reason': str}
+    """
+    today = timezone.now().date()
     
     # Check if already completed today
-    if today_log and today_log.status == 'completed':
+    if today_status == 'completed':
         return {
             'can_complete': False,
             'reason': 'Habit already completed today'
@@ -173,6 +346,87 @@ def can_complete_habit(habit):
     return {'can_complete': True, 'reason': ''}
 
 
+def mark_habits_complete(user, habits, notes='', amount_done=None):
+    """
+    Mark several habits as complete for today in one transaction.
+    
+    The habits are locked (lock_calendars) and today's logs are upserted
+    with a single guarded INSERT ... ON CONFLICT statement
+    (upsert_completed_logs). Only habits whose log was not completed yet -
+    a concurrent request may have completed some - get their streak
+    updated, leaf dollars and feed entries; they are written with one
+    bulk_update and the leaf dollars for all of them are added in one
+    update. Habits must already have passed check_can_complete.
+    
+    Args:
+        user: User owning the habits
+        habits: List of Habit instances
+        notes: Optional notes
+        amount_done: Optional amount completed (for count/time tracking modes)
+        
+    Returns:
+        dict: habit id -> {'completion': HabitLog, 'leaf_dollars_earned': int, 'new_streak': int,
+              'already_completed': bool}
+    """
+    if not habits:
+        return {}
+    
+    today = timezone.now().date()
+    now = timezone.now()
+    leaf_dollars_earned = calculate_leaf_dollars_reward(is_new_completion=True)
+    
+    with transaction.atomic():
+        lock_calendars(habits)
+        completions = upsert_completed_logs(habits, today, notes, amount_done)
+        completed_ids = set(completions)
+        completed = [habit for habit in habits if habit.id in completed_ids]
+        
+        if completed:
+            streak_delta = 0
+            missed_delta = 0
+            for habit in completed:
+                streak_delta -= habit.current_streak or 0
+                missed_delta += rollup_deltas(calendar_status(habit, today), 'completed')[1]
+                record_log(habit, today, 'completed')
+                habit.last_completed_date = today
+                update_streak_for_date(habit, today, was_completed=False, is_completed=True)
+                habit.updated_at = now
+                streak_delta += habit.current_streak
+            
+            Habit.objects.bulk_update(completed, COMPLETION_UPDATE_FIELDS)
+            record_rollup_change(user.id, today, completed_delta=len(completed), missed_delta=missed_delta)
+            
+            # Award 1 leaf dollar per new completion, one ledger entry each
+            apply_leaf_dollar_entries(user, [(leaf_dollars_earned, 'completion', habit.id) for habit in completed])
+            record_leaderboard_change(
+                user.id,
+                streak_delta=streak_delta,
+                completions_delta=len(completed),
+                week_completions_delta=len(completed)
+            )
+    
+    if completed:
+        invalidate_user_stats(user.id)
+        fan_out_completions(completed)
+    
+    # Logs completed concurrently are returned as they are, without reward
+    already_completed = [habit for habit in habits if habit.id not in completed_ids]
+    if already_completed:
+        completions.update(
+            (log.habit_id, log) for log in HabitLog.objects.filter(habit__in=already_completed, log_date=today)
+        )
+    
+    return {
+        habit.id: {
+            'completion': completions[habit.id],
+            'leaf_dollars_earned': leaf_dollars_earned if habit.id in completed_ids else 0,
+            'new_streak': habit.current_streak or 0,
+            'already_completed': habit.id not in completed_ids
+        }
+        for habit in habits
+    }
+
+
 def get_completion_stats(habit, start_date=None, end_date=None):
     """
     Get completion statistics for a habit.
@@ -191,23 +445,33 @@ def get_completion_stats(habit, start_date=None, end_date=None):
     if start_date and end_date:
         logs = logs.filter(log_date__gte=start_date, log_date__lte=end_date)
     
-    total = logs.count()
-    completed = logs.filter(status='completed').count()
-    skipped = logs.filter(status='skipped').count()
-    failed = logs.filter(status='failed').count()
-    partial = logs.filter(status='partial').count()
-    incomplete = total - completed
-    completion_rate = (completed / total * 100) if total > 0 else 0
+    # Status counts per weekday in a single aggregate query. Weekdays are
+    # ordered by their earliest log so by_day_of_week keeps the key order
+    # of iterating the logs through the (habit, log_date) index.
+    by_weekday = logs.annotate(
+        iso_day=ExtractIsoWeekDay('log_date')
+    ).values('iso_day').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed')),
+        skipped=Count('id', filter=Q(status='skipped')),
+        failed=Count('id', filter=Q(status='failed')),
+        partial=Count('id', filter=Q(status='partial')),
+        first_date=Min('log_date')
+    ).order_by('first_date')
     
-    # Get completion by day of week
+    total = completed = skipped = failed = partial = 0
     by_day_of_week = {}
-    for log in logs:
-        day = log.log_date.weekday()  # 0 = Monday, 6 = Sunday
-        if day not in by_day_of_week:
-            by_day_of_week[day] = {'completed': 0, 'total': 0}
-        by_day_of_week[day]['total'] += 1
-        if log.status == 'completed':
-            by_day_of_week[day]['completed'] += 1
+    for row in by_weekday:
+        total += row['total']
+        completed += row['completed']
+        skipped += row['skipped']
+        failed += row['failed']
+        partial += row['partial']
+        day = row['iso_day'] - 1  # 0 = Monday, 6 = Sunday
+        by_day_of_week[day] = {'completed': row['completed'], 'total': row['total']}
+    
+    incomplete = total - completed
+    completion_rate = (completed / total * 100) if total > 0 else 0
     
     return {
         'total': total,
@@ -0,0 +1,174 @@
+"""
+Leaderboards
+
+This module maintains the per-user LeaderboardEntry figures (total current
+streak over active habits, total completions and completions this week) and
+ranks friends by them. Entries are updated incrementally with relative
+UPDATEs by the completion paths; only missing entries and bulk writes (imports,
+rebuilds, habit edits) fall back to recomputing from habits and logs. Every
+change is also applied to this process' global leaderboard index once its
+transaction commits.
+"""
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from ..models import Friendship, Habit, HabitLog, LeaderboardEntry, User
+from .global_leaderboard import global_leaderboard
+
+LEADERBOARD_SORTS = {
+    'streak': 'total_current_streak',
+    'week': 'week_completions',
+    'leaf_dollars': 'leaf_dollars',
+}
+
+
+def get_week_start(day):
+    """Monday of the ISO week containing day"""
+    return day - timedelta(days=day.weekday())
+
+
+def refresh_leaderboard_entries(user_ids):
+    """
+    Recompute leaderboard entries of some users from their habits and logs.
+
+    Args:
+        user_ids: Iterable of user ids
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    today = timezone.now().date()
+    week_start = get_week_start(today)
+
+    streaks = dict(
+        Habit.objects.filter(user_id__in=user_ids, is_active=True)
+        .values('user_id')
+        .annotate(total=Sum('current_streak'))
+        .values_list('user_id', 'total')
+    )
+    completions = {
+        user_id: (total, week)
+        for user_id, total, week in HabitLog.objects.filter(
+            habit__user_id__in=user_ids,
+            habit__is_active=True,
+            status='completed'
+        ).values('habit__user_id').annotate(
+            total=Count('id'),
+            week=Count('id', filter=Q(log_date__gte=week_start, log_date__lte=today))
+        ).values_list('habit__user_id', 'total', 'week')
+    }
+
+    now = timezone.now()
+    entries = [
+        LeaderboardEntry(
+            user_id=user_id,
+            total_current_streak=streaks.get(user_id) or 0,
+            total_completions=completions.get(user_id, (0, 0))[0],
+            week_start=week_start,
+            week_completions=completions.get(user_id, (0, 0))[1],
+            updated_at=now
+        )
+        for user_id in user_ids
+    ]
+    LeaderboardEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['total_current_streak', 'total_completions', 'week_start', 'week_completions', 'updated_at']
+    )
+    rows = [(entry.user_id, entry.total_current_streak, entry.total_completions) for entry in entries]
+    transaction.on_commit(lambda: global_leaderboard.update(rows))
+
+
+def record_leaderboard_change(user_id, streak_delta=0, completions_delta=0, week_completions_delta=0):
+    """
+    Apply a change from the completion path to a user's leaderboard entry.
+
+    Args:
+        user_id: ID of the user
+        streak_delta: Change of the user's total current streak
+        completions_delta: Change of the user's total number of completions
+        week_completions_delta: Change of the number of completions this week
+    """
+    now = timezone.now()
+    week_start = get_week_start(now.date())
+
+    # One UPDATE returning the new totals for the global index; an entry
+    # from an earlier week had no completions recorded this week
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {LeaderboardEntry._meta.db_table} SET
+                total_current_streak = total_current_streak + %s,
+                total_completions = total_completions + %s,
+                week_completions = CASE WHEN week_start = %s THEN week_completions + %s ELSE %s END,
+                week_start = %s,
+                updated_at = %s
+            WHERE user_id = %s
+            RETURNING total_current_streak, total_completions
+            """,
+            [
+                streak_delta, completions_delta,
+                week_start, week_completions_delta, max(week_completions_delta, 0),
+                week_start, connection.ops.adapt_datetimefield_value(now), user_id
+            ]
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        refresh_leaderboard_entries([user_id])
+    else:
+        transaction.on_commit(lambda: global_leaderboard.update([(user_id, *row)]))
+
+
+def get_friends_leaderboard(user, sort='streak'):
+    """
+    Rank a user and their accepted friends.
+
+    Reads the friendship edges, the users and their leaderboard entries in
+    one joined query; habit logs are not touched.
+
+    Args:
+        user: User instance
+        sort: 'streak', 'week' or 'leaf_dollars'
+
+    Returns:
+        list: Entries ordered by rank, each {'rank', 'user', 'total_current_streak',
+              'week_completions', 'leaf_dollars', 'is_me'}
+    """
+    week_start = get_week_start(timezone.now().date())
+
+    friend_ids = Friendship.objects.filter(user=user).values('friend_id')
+    users = list(
+        (User.objects.filter(id__in=friend_ids) | User.objects.filter(id=user.id))
+        .select_related('leaderboard_entry')
+    )
+
+    # Users that never had an entry written get one now
+    missing = [member.id for member in users if not hasattr(member, 'leaderboard_entry')]
+    if missing:
+        refresh_leaderboard_entries(missing)
+        entries = LeaderboardEntry.objects.in_bulk(missing)
+        for member in users:
+            if member.id in entries:
+                member.leaderboard_entry = entries[member.id]
+
+    rows = []
+    for member in users:
+        entry = member.leaderboard_entry
+        rows.append({
+            'user': member,
+            'total_current_streak': entry.total_current_streak,
+            'week_completions': entry.week_completions if entry.week_start == week_start else 0,
+            'leaf_dollars': member.leaf_dollars,
+            'is_me': member.id == user.id,
+        })
+
+    key = LEADERBOARD_SORTS[sort]
+    rows.sort(key=lambda row: (-row[key], row['user'].username))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+
+    return rows
@@ -0,0 +1,126 @@
+"""
+Leaf Dollar Accounting
+
+All leaf dollar balance changes go through this module. Each change is one
+atomic relative UPDATE of users.leaf_dollars (debits are conditional on
+the balance covering them) returning the new balance, plus an append-only
+LeafDollarEntry row, in the same transaction. Balances are never read,
+modified in Python and written back, so concurrent requests cannot lose
+updates or overwrite other user columns.
+"""
+from django.db import connection, transaction
+from ..models import LeafDollarEntry, User
+
+
+def apply_leaf_dollar_entries(user, entries):
+    """
+    Apply several balance changes of one user in a single update.
+
+    Args:
+        user: User instance (its leaf_dollars is refreshed afterwards)
+        entries: List of (amount, reason, reference) tuples; negative amounts are debits
+
+    Returns:
+        bool: False if the balance does not cover the total debit (nothing is applied)
+    """
+    total = sum(amount for amount, _, _ in entries)
+
+    sql = f'UPDATE {User._meta.db_table} SET leaf_dollars = leaf_dollars + %s WHERE id = %s'
+    params = [total, user.id]
+    if total < 0:
+        # Conditional update: the row is only changed if the balance covers the debit
+        sql += ' AND leaf_dollars >= %s'
+        params.append(-total)
+
+    # Nothing is written when the debit fails, so no savepoint is needed
+    with transaction.atomic(savepoint=False):
+        # The new balance comes back with the update instead of a second read
+        with connection.cursor() as cursor:
+            cursor.execute(sql + ' RETURNING leaf_dollars', params)
+            row = cursor.fetchone()
+        if row is not None:
+            LeafDollarEntry.objects.bulk_create([
+                LeafDollarEntry(user_id=user.id, amount=amount, reason=reason, reference=str(reference))
+                for amount, reason, reference in entries
+            ])
+
+    if row is None:
+        user.refresh_from_db(fields=['leaf_dollars'])
+        return False
+    user.leaf_dollars = row[0]
+    return True
+
+
+def credit_leaf_dollars(user, amount, reason, reference=''):
+    """
+    Add leaf dollars to a user's balance.
+
+    Args:
+        user: User instance
+        amount: Leaf dollars to add
+        reason: LeafDollarEntry reason
+        reference: Optional id of the habit/reward involved
+
+    Returns:
+        int: New balance
+    """
+    apply_leaf_dollar_entries(user, [(amount, reason, reference)])
+    return user.leaf_dollars
+
+
+def debit_leaf_dollars(user, amount, reason, reference=''):
+    """
+    Take leaf dollars from a user's balance if it covers the amount.
+
+    Args:
+        user: User instance
+        amount: Leaf dollars to take
+        reason: LeafDollarEntry reason
+        reference: Optional id of the habit/reward involved
+
+    Returns:
+        bool: Whether the balance covered the amount (and was charged)
+    """
+    return apply_leaf_dollar_entries(user, [(-amount, reason, reference)])
+
+
+def set_leaf_dollars(user, amount, reason='admin'):
+    """
+    Set a user's balance to an absolute amount, recording the difference.
+
+    Args:
+        user: User instance
+        amount: New balance
+        reason: LeafDollarEntry reason
+
+    Returns:
+        int: Old balance
+    """
+    with transaction.atomic():
+        old_balance = User.objects.select_for_update().values_list('leaf_dollars', flat=True).get(id=user.id)
+        User.objects.filter(id=user.id).update(leaf_dollars=amount)
+        LeafDollarEntry.objects.create(user_id=user.id, amount=amount - old_balance, reason=reason)
+
+    user.leaf_dollars = amount
+    return old_balance
+
+
+def set_all_leaf_dollars(amount, reason='admin'):
+    """
+    Set every user's balance to an absolute amount, recording each difference.
+
+    Args:
+        amount: New balance
+        reason: LeafDollarEntry reason
+
+    Returns:
+        int: Number of users updated
+    """
+    with transaction.atomic():
+        balances = User.objects.select_for_update().exclude(leaf_dollars=amount).values_list('id', 'leaf_dollars')
+        entries = [
+            LeafDollarEntry(user_id=user_id, amount=amount - balance, reason=reason)
+            for user_id, balance in balances
+        ]
+        LeafDollarEntry.objects.bulk_create(entries, batch_size=5000)
+        return User.objects.update(leaf_dollars=amount)
@@ -0,0 +1,129 @@
+"""
+Day Rollover
+
+Records the days nobody logged as missed, so streaks break when the day is
+over instead of whenever the client next calls /incomplete/. Used by the
+rollover_day management command, which selects the active daily habits
+without a log for the day and hands them over in batches.
+"""
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from ..models import Habit, HabitLog, Streak
+from .completion_calendar import calendar_streaks, record_log
+from .daily_rollup import refresh_daily_rollups
+from .leaderboard import refresh_leaderboard_entries
+from .user_stats import invalidate_user_stats
+
+# Habit fields roll_over_habits reads
+ROLLOVER_HABIT_FIELDS = [
+    'id', 'user_id', 'current_streak', 'created_at', 'updated_at',
+    'calendar_start', 'completed_bitmap', 'missed_bitmap'
+]
+
+
+def insert_missed_logs(habit_ids, day):
+    """
+    Insert a missed log for day for each habit, skipping habits that already
+    have a log for it (written concurrently by a completion, say).
+
+    Args:
+        habit_ids: List of habit ids
+        day: The missed day
+
+    Returns:
+        set: Ids of the habits whose log was inserted
+    """
+    if not habit_ids:
+        return set()
+
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    values = ', '.join(["(%s, %s, 'missed', '', %s, %s)"] * len(habit_ids))
+    params = []
+    for habit_id in habit_ids:
+        params += [habit_id, day, now, now]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {HabitLog._meta.db_table} (habit_id, log_date, status, note, created_at, updated_at)
+            VALUES {values}
+            ON CONFLICT (habit_id, log_date) DO NOTHING
+            RETURNING habit_id
+            """,
+            params
+        )
+        return {habit_id for habit_id, in cursor.fetchall()}
+
+
+def roll_over_habits(habit_ids, day):
+    """
+    Mark a day missed for habits that have no log for it.
+
+    The habits are locked and read again inside the transaction, the missed
+    logs are inserted with one bulk INSERT and only the habits whose log was
+    actually inserted are changed: a habit that got a log concurrently (a
+    completion or revive since it was selected) is skipped, so its calendar
+    and streak are never overwritten with stale values. For those habits the
+    completion calendars are updated and the current streak is recomputed
+    from the calendar. Current Streak records that started on or before the
+    missed day cannot continue past it and are closed in bulk. Running a
+    batch again changes nothing.
+
+    Args:
+        habit_ids: List of ids of active habits selected for the day
+        day: The day to mark missed
+
+    Returns:
+        dict: {'missed': int, 'broken': int}
+    """
+    if not habit_ids:
+        return {'missed': 0, 'broken': 0}
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Locked in id order, so concurrent batches cannot deadlock
+        locked = list(
+            Habit.objects.select_for_update()
+            .filter(id__in=habit_ids, is_active=True)
+            .order_by('id')
+            .only(*ROLLOVER_HABIT_FIELDS)
+        )
+        inserted = insert_missed_logs([habit.id for habit in locked], day)
+        habits = [habit for habit in locked if habit.id in inserted]
+        if not habits:
+            return {'missed': 0, 'broken': 0}
+        rolled_ids = [habit.id for habit in habits]
+
+        # New current streak -> habits whose stored streak changed to it (almost always 0)
+        broken = []
+        new_streaks = {}
+        for habit in habits:
+            record_log(habit, day, 'missed')
+            current_streak = calendar_streaks(habit)['current_streak']
+            if current_streak != (habit.current_streak or 0):
+                habit.current_streak = current_streak
+                broken.append(habit)
+                new_streaks.setdefault(current_streak, []).append(habit.id)
+
+        # Only the missed bitmap (and a missing calendar start) differ per habit,
+        # everything else is written with plain UPDATEs
+        Habit.objects.bulk_update(habits, ['calendar_start', 'missed_bitmap'])
+        Habit.objects.filter(id__in=rolled_ids).update(updated_at=now)
+        for current_streak, ids in new_streaks.items():
+            Habit.objects.filter(id__in=ids).update(current_streak=current_streak)
+
+        closed = list(Streak.objects.filter(habit_id__in=rolled_ids, is_current=True, start_date__lte=day))
+        for record in closed:
+            record.is_current = False
+            record.end_date = record.start_date + timedelta(days=record.length_days - 1)
+        Streak.objects.bulk_update(closed, ['is_current', 'end_date'])
+
+    user_ids = {habit.user_id for habit in habits}
+    refresh_daily_rollups(user_ids, [day])
+    refresh_leaderboard_entries({habit.user_id for habit in broken})
+    for user_id in user_ids:
+        invalidate_user_stats(user_id)
+
+    return {'missed': len(habits), 'broken': len(broken)}
@@ -5,8 +5,10 @@ This module contains algorithms for calculating and maintaining habit streaks.
 """
 from datetime import date, timedelta
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q
 from ..models import Streak
+from .completion_calendar import calendar_streaks, load_calendar
 
 
 def calculate_streaks(logs):
@@ -92,8 +94,8 @@ def update_streak(habit):
     Returns:
         Habit: Updated habit instance (not saved)
     """
-    logs = habit.logs.all()
-    streaks = calculate_streaks(logs)
+    # Completion calendar is kept in sync with the logs, so no need to load them
+    streaks = calendar_streaks(habit)
     
     old_current_streak = habit.current_streak or 0
     new_current_streak = streaks['current_streak']
@@ -148,6 +150,192 @@ def update_streak(habit):
     return habit
 
 
+def close_streak(streak_record, end_date):
+    """
+    Close a current Streak record at the given end date.
+    
+    Args:
+        streak_record: Streak instance with is_current=True
+        end_date: Last completed day of the streak
+        
+    Returns:
+        Streak: The closed record (saved)
+    """
+    streak_record.is_current = False
+    streak_record.end_date = end_date
+    streak_record.length_days = (end_date - streak_record.start_date).days + 1
+    streak_record.save()
+    return streak_record
+
+
+def update_streak_for_date(habit, log_date, was_completed, is_completed):
+    """
+    Incrementally update streak after a single log changed.
+    
+    Uses only the changed date, the denormalized streak fields on the habit
+    and the current Streak record, so the cost does not depend on how many
+    logs the habit has. Falls back to a full rebuild with update_streak when
+    a past date is edited or the stored streak state is inconsistent.
+    
+    Args:
+        habit: Habit instance
+        log_date: Date of the log that changed
+        was_completed: Whether the log was 'completed' before the change
+        is_completed: Whether the log is 'completed' after the change
+        
+    Returns:
+        Habit: Updated habit instance (not saved)
+    """
+    today = timezone.now().date()
+    yesterday = today - timedelta(days=1)
+    
+    # Editing history can split or merge runs anywhere - rebuild from logs
+    if log_date != today:
+        return update_streak(habit)
+    
+    current_streak = habit.current_streak or 0
+    
+    # Common case: today extends a run that ended yesterday. The conditional
+    # UPDATE checks the stored run and extends it without reading it first
+    if is_completed and not was_completed and current_streak > 0:
+        extended = habit.streaks.filter(
+            is_current=True,
+            start_date=yesterday - timedelta(days=current_streak - 1),
+            length_days=current_streak
+        ).update(length_days=current_streak + 1)
+        if extended:
+            habit.current_streak = current_streak + 1
+            habit.longest_streak = max(habit.longest_streak or 0, habit.current_streak)
+            return habit
+    
+    with transaction.atomic(savepoint=False):
+        current_streak_record = habit.streaks.filter(is_current=True).first()
+        
+        # Current run as [start_date, run_end] according to the stored state
+        run_end = None
+        if current_streak_record:
+            if current_streak_record.length_days < 1 or current_streak_record.length_days != current_streak:
+                return update_streak(habit)
+            run_end = current_streak_record.start_date + timedelta(days=current_streak_record.length_days - 1)
+            if run_end > today:
+                return update_streak(habit)
+        elif current_streak != 0:
+            return update_streak(habit)
+        
+        if is_completed and not was_completed:
+            if run_end == today:
+                return update_streak(habit)
+            if run_end == yesterday:
+                # Today extends the current run
+                current_streak_record.length_days += 1
+                current_streak_record.save()
+                current_streak = current_streak_record.length_days
+            else:
+                # Previous run (if any) is already broken - start a new one
+                if current_streak_record:
+                    close_streak(current_streak_record, run_end)
+                current_streak_record = Streak.objects.create(
+                    habit=habit,
+                    start_date=today,
+                    length_days=1,
+                    is_current=True
+                )
+                current_streak = 1
+            run_end = today
+        elif was_completed and not is_completed:
+            if run_end != today:
+                return update_streak(habit)
+            if current_streak_record.length_days == 1:
+                # The run only consisted of today
+                current_streak_record.delete()
+                current_streak_record = None
+                current_streak = 0
+                run_end = None
+            else:
+                # Run now ends yesterday, which still counts as current
+                current_streak_record.length_days -= 1
+                current_streak_record.save()
+                current_streak = current_streak_record.length_days
+                run_end = yesterday
+        
+        # A run that ended before yesterday is no longer current
+        if current_streak_record and run_end < yesterday:
+            close_streak(current_streak_record, run_end)
+            current_streak = 0
+    
+    habit.current_streak = current_streak
+    habit.longest_streak = max(habit.longest_streak or 0, current_streak)
+    return habit
+
+
+def revive_streak(habit, revived_date):
+    """
+    Update streaks after a past day was marked completed (revive).
+    
+    Only the run containing the revived date is recomputed: its extent is
+    read from the completion calendar, and the Streak records of the runs it
+    merges (the run ending the day before and the run starting the day after)
+    are merged into one record in place. Other historical records are left
+    untouched, so the cost depends on the affected run rather than on the
+    whole history. The calendar must already include the revived day.
+    
+    Args:
+        habit: Habit instance
+        revived_date: Past date that is now completed
+        
+    Returns:
+        Habit: Updated habit instance (not saved)
+    """
+    calendar_start, completed_bits, _ = load_calendar(habit)
+    index = (revived_date - calendar_start).days
+    
+    # Completed days directly before the revived day (highest zero bit below it)
+    days_before = index - (~completed_bits & ((1 << index) - 1)).bit_length()
+    # Completed days directly after it (trailing ones above it)
+    bits_after = completed_bits >> (index + 1)
+    days_after = (bits_after ^ (bits_after + 1)).bit_length() - 1
+    
+    run_start = revived_date - timedelta(days=days_before)
+    run_end = revived_date + timedelta(days=days_after)
+    length_days = days_before + days_after + 1
+    yesterday = timezone.now().date() - timedelta(days=1)
+    is_current = run_end >= yesterday
+    
+    with transaction.atomic():
+        # Records of the merged runs start inside the new run; the current
+        # record is fetched too in case it has to be closed
+        records = list(habit.streaks.filter(
+            Q(start_date__gte=run_start, start_date__lte=run_end) | Q(is_current=True)
+        ).order_by('-is_current', 'start_date'))
+        merged = [record for record in records if run_start <= record.start_date <= run_end]
+        
+        for record in merged[1:]:
+            record.delete()
+        
+        for record in records:
+            if record.is_current and record not in merged:
+                record_end = record.start_date + timedelta(days=record.length_days - 1)
+                # Replaced by the revived run, or already broken
+                if is_current or record_end < yesterday:
+                    close_streak(record, record_end)
+                    habit.current_streak = 0
+        
+        streak_record = merged[0] if merged else Streak(habit=habit)
+        if streak_record.is_current and not is_current:
+            # The current run got merged into a run that has already ended
+            habit.current_streak = 0
+        streak_record.start_date = run_start
+        streak_record.end_date = None if is_current else run_end
+        streak_record.length_days = length_days
+        streak_record.is_current = is_current
+        streak_record.save()
+    
+    if is_current:
+        habit.current_streak = length_days
+    habit.longest_streak = max(habit.longest_streak or 0, length_days)
+    return habit
+
+
 def get_streak_stats(logs, start_date=None, end_date=None):
     """
     Get streak statistics for a date range.
@@ -166,16 +354,21 @@ def get_streak_stats(logs, start_date=None, end_date=None):
             log_date__lte=end_date,
             status='completed'
         )
+        completed_days = filtered.count()
         total_days = (end_date - start_date).days + 1
     else:
-        filtered = logs.filter(status='completed')
-        if filtered.exists():
-            dates = filtered.values_list('log_date', flat=True)
-            total_days = (max(dates) - min(dates)).days + 1 if len(dates) > 1 else 1
+        # Count and date bounds in one aggregate instead of loading every date
+        bounds = logs.filter(status='completed').aggregate(
+            completed_days=Count('id'),
+            first_date=Min('log_date'),
+            last_date=Max('log_date')
+        )
+        completed_days = bounds['completed_days']
+        if completed_days:
+            total_days = (bounds['last_date'] - bounds['first_date']).days + 1
         else:
             total_days = 0
     
-    completed_days = filtered.count()
     completion_rate = (completed_days / total_days * 100) if total_days > 0 else 0
     
     return {
@@ -184,3 +377,102 @@ def get_streak_stats(logs, start_date=None, end_date=None):
         'completion_rate': round(completion_rate, 2)
     }
 
+
+# Day number expression per database vendor; only differences between days matter
+DAY_NUMBER_SQL = {
+    'postgresql': "(log_date - DATE '1970-01-01')",
+    'sqlite': "CAST(julianday(log_date) AS INTEGER)",
+}
+
+# Gaps-and-islands: consecutive completed days share the same (day number - row number)
+RANGE_STREAKS_SQL = """
+    WITH completed_days AS (
+        SELECT log_date,
+               {day_number} - ROW_NUMBER() OVER (ORDER BY log_date) AS island
+        FROM habit_logs
+        WHERE habit_id = %s AND status = 'completed'{date_filter}
+    ),
+    runs AS (
+        SELECT MIN(log_date) AS start_date,
+               MAX(log_date) AS end_date,
+               COUNT(*) AS length_days
+        FROM completed_days
+        GROUP BY island
+    )
+    SELECT start_date, end_date, length_days,
+           MAX(length_days) OVER () AS longest_streak,
+           SUM(length_days) OVER () AS completed_days
+    FROM runs
+    ORDER BY start_date
+"""
+
+
+def _as_date(value):
+    """Raw SQLite cursors return computed dates as strings"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def get_range_streaks(habit, start_date=None, end_date=None):
+    """
+    Get streak runs and statistics for a date range, computed in the database.
+    
+    Run boundaries and lengths are found with window functions over
+    habit_logs (gaps-and-islands), so no log rows are loaded into Python.
+    Works on PostgreSQL and SQLite.
+    
+    Args:
+        habit: Habit instance
+        start_date: Start date (optional, requires end_date)
+        end_date: End date (optional, requires start_date)
+        
+    Returns:
+        dict: {'start_date', 'end_date', 'total_days', 'completed_days', 'completion_rate',
+               'longest_streak', 'runs': [{'start_date', 'end_date', 'length_days'}]}
+    """
+    params = [habit.id]
+    date_filter = ''
+    if start_date and end_date:
+        date_filter = ' AND log_date >= %s AND log_date <= %s'
+        params += [start_date, end_date]
+    
+    sql = RANGE_STREAKS_SQL.format(
+        day_number=DAY_NUMBER_SQL[connection.vendor],
+        date_filter=date_filter
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    
+    runs = [
+        {
+            'start_date': _as_date(run_start),
+            'end_date': _as_date(run_end),
+            'length_days': length_days
+        }
+        for run_start, run_end, length_days, _, _ in rows
+    ]
+    longest_streak = rows[0][3] if rows else 0
+    completed_days = rows[0][4] if rows else 0
+    
+    if start_date and end_date:
+        total_days = (end_date - start_date).days + 1
+    elif runs:
+        start_date = runs[0]['start_date']
+        end_date = runs[-1]['end_date']
+        total_days = (end_date - start_date).days + 1
+    else:
+        total_days = 0
+    
+    completion_rate = (completed_days / total_days * 100) if total_days > 0 else 0
+    
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'total_days': total_days,
+        'completed_days': completed_days,
+        'completion_rate': round(completion_rate, 2),
+        'longest_streak': longest_streak,
+        'runs': runs
+    }
@@ -0,0 +1,108 @@
+"""
+User Statistics
+
+This module computes the per-user dashboard statistics with a fixed number
+of aggregate queries, optionally cached per user. The cache is invalidated
+by every write that changes a user's habits or logs, so it must be shared by
+all worker processes (check_stats_cache).
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from ..models import Habit, HabitLog
+
+
+def _cache_key(user_id):
+    return f'user_stats:{user_id}'
+
+
+def check_stats_cache():
+    """
+    Refuse USER_STATS_CACHE_TIMEOUT with a per-process cache backend.
+    
+    An invalidation would only reach the worker that made the change, and
+    the others would serve stale stats until the timeout.
+    
+    Raises:
+        ImproperlyConfigured: If the timeout is set and the default cache is a LocMemCache
+    """
+    if getattr(settings, 'USER_STATS_CACHE_TIMEOUT', 0) and isinstance(caches['default'], LocMemCache):
+        raise ImproperlyConfigured(
+            'USER_STATS_CACHE_TIMEOUT needs a cache shared by all workers; '
+            'configure CACHES (e.g. Redis or Memcached) or set it to 0'
+        )
+
+
+def invalidate_user_stats(user_id):
+    """
+    Drop the cached stats snapshot for a user.
+    
+    Args:
+        user_id: ID of the user whose habits or logs changed
+    """
+    if getattr(settings, 'USER_STATS_CACHE_TIMEOUT', 0):
+        cache.delete(_cache_key(user_id))
+
+
+def _compute_habit_stats(user, today):
+    """Habit and log aggregates for a user's active habits (2 queries)"""
+    habits = Habit.objects.filter(user=user, is_active=True).aggregate(
+        total_habits=Count('id'),
+        total_streak=Sum('current_streak'),
+        longest_streak=Max('longest_streak')
+    )
+    logs = HabitLog.objects.filter(
+        habit__user=user,
+        habit__is_active=True,
+        status='completed'
+    ).aggregate(
+        total_completions=Count('id'),
+        total_completed_today=Count('id', filter=Q(log_date=today))
+    )
+    return {
+        'date': today,
+        'total_habits': habits['total_habits'],
+        'total_streak': habits['total_streak'] or 0,
+        'longest_streak': habits['longest_streak'] or 0,
+        'total_completions': logs['total_completions'],
+        'total_completed_today': logs['total_completed_today'],
+    }
+
+
+def get_user_stats(user):
+    """
+    Get dashboard statistics for a user.
+    
+    Uses the cached snapshot when USER_STATS_CACHE_TIMEOUT is set and the
+    snapshot is from today. Leaf dollars are always read from the user.
+    
+    Args:
+        user: User instance
+        
+    Returns:
+        dict: User statistics
+    """
+    today = timezone.now().date()
+    timeout = getattr(settings, 'USER_STATS_CACHE_TIMEOUT', 0)
+    
+    snapshot = cache.get(_cache_key(user.id)) if timeout else None
+    if snapshot is None or snapshot['date'] != today:
+        snapshot = _compute_habit_stats(user, today)
+        if timeout:
+            cache.set(_cache_key(user.id), snapshot, timeout)
+    
+    total_habits = snapshot['total_habits']
+    total_completed = snapshot['total_completed_today']
+    
+    return {
+        'total_habits': total_habits,
+        'total_completed_today': total_completed,
+        'completion_rate_today': round((total_completed / total_habits * 100) if total_habits > 0 else 0, 2),
+        'total_completions': snapshot['total_completions'],
+        'average_streak': round((snapshot['total_streak'] / total_habits) if total_habits > 0 else 0, 2),
+        'longest_streak': snapshot['longest_streak'],
+        'leaf_dollars': user.leaf_dollars
+    }
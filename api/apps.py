@@ -5,3 +5,13 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
 
+    def ready(self):
+        from django.db.models.signals import post_delete
+        from .algorithms.global_leaderboard import drop_deleted_entry
+        from .algorithms.user_stats import check_stats_cache
+        from .models import LeaderboardEntry
+
+        check_stats_cache()
+
+        # Keep this process' global leaderboard index free of deleted users
+        post_delete.connect(drop_deleted_entry, sender=LeaderboardEntry)
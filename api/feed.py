@@ -0,0 +1,146 @@
+"""
+Friend activity feed
+
+Completions of public habits are fanned out on write: a compact FeedEntry is
+inserted into the timeline of each of the actor's friends, in batches of
+FEED_FANOUT_BATCH_SIZE rows. Reading a feed is then a keyset-paginated scan
+of the reader's own timeline. Timelines are capped at FEED_TIMELINE_CAP
+entries; older entries are trimmed when the owner loads the first page and
+by the trim_feeds management command.
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+from .models import FeedEntry, Friendship, User
+
+# Default and maximum number of entries per feed page
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+
+def get_fanout_batch_size():
+    return getattr(settings, 'FEED_FANOUT_BATCH_SIZE', 1000)
+
+
+def get_timeline_cap():
+    return getattr(settings, 'FEED_TIMELINE_CAP', 500)
+
+
+def fan_out_completion(habit):
+    """
+    Write a 'completed' entry for a public habit into each friend's timeline.
+
+    Args:
+        habit: Habit instance that was just completed
+
+    Returns:
+        int: Number of entries written
+    """
+    return fan_out_completions([habit])
+
+
+def fan_out_completions(habits):
+    """
+    Write 'completed' entries for public habits into the timelines of
+    their owners' friends, reading each owner's friends once.
+
+    Args:
+        habits: Habit instances that were just completed
+
+    Returns:
+        int: Number of entries written
+    """
+    by_user = {}
+    for habit in habits:
+        if habit.is_public:
+            by_user.setdefault(habit.user_id, []).append(habit)
+
+    batch_size = get_fanout_batch_size()
+    written = 0
+    batch = []
+    for user_id, user_habits in by_user.items():
+        friend_ids = Friendship.objects.filter(user_id=user_id).values_list('friend_id', flat=True)
+        for friend_id in friend_ids.iterator(chunk_size=batch_size):
+            batch.extend(
+                FeedEntry(
+                    owner_id=friend_id,
+                    actor_id=user_id,
+                    verb='completed',
+                    habit_id=habit.id,
+                    habit_name=habit.name,
+                    habit_emoji=habit.emoji,
+                    streak=habit.current_streak or 0
+                )
+                for habit in user_habits
+            )
+            if len(batch) >= batch_size:
+                FeedEntry.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+
+    if batch:
+        FeedEntry.objects.bulk_create(batch)
+        written += len(batch)
+
+    return written
+
+
+def trim_timelines(owner_ids):
+    """
+    Delete entries beyond the newest FEED_TIMELINE_CAP of each timeline.
+
+    The cutoff id of every timeline is found with one query (an index scan
+    of at most FEED_TIMELINE_CAP rows per owner), then all timelines are
+    trimmed with a single DELETE.
+
+    Args:
+        owner_ids: Iterable of timeline owner ids
+
+    Returns:
+        int: Number of deleted entries
+    """
+    cap = get_timeline_cap()
+    cutoffs = User.objects.filter(id__in=set(owner_ids)).annotate(
+        cutoff=Subquery(
+            FeedEntry.objects.filter(owner_id=OuterRef('id')).order_by('-id').values('id')[cap:cap + 1]
+        )
+    ).filter(cutoff__isnull=False).values_list('id', 'cutoff')
+
+    condition = Q()
+    for owner_id, cutoff in cutoffs:
+        condition |= Q(owner_id=owner_id, id__lte=cutoff)
+
+    if not condition:
+        return 0
+
+    deleted, _ = FeedEntry.objects.filter(condition).delete()
+    return deleted
+
+
+def get_timeline(user, before=None, limit=FEED_PAGE_SIZE):
+    """
+    Get a page of a user's feed, newest first.
+
+    Args:
+        user: User instance
+        before: Entry id cursor; only older entries are returned (optional)
+        limit: Page size
+
+    Returns:
+        dict: {'entries': list of FeedEntry (actor loaded), 'next_cursor': int or None}
+    """
+    if before is None:
+        trim_timelines([user.id])
+
+    entries = FeedEntry.objects.filter(owner=user).select_related('actor').order_by('-id')
+    if before is not None:
+        entries = entries.filter(id__lt=before)
+
+    # One extra row tells whether there is a next page
+    page = list(entries[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return {
+        'entries': page,
+        'next_cursor': page[-1].id if has_more else None,
+    }
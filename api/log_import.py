@@ -0,0 +1,256 @@
+"""
+Bulk historical log import
+
+Loads habit logs from CSV or NDJSON files (e.g. exported from another habit
+tracker). Rows are parsed as a stream and written with chunked upserts on
+(habit, log_date); streaks and completion calendars are recomputed once per
+affected habit after all rows are loaded, instead of once per log.
+
+Each row has the fields: habit (habit id), date (YYYY-MM-DD), status,
+amount_done (optional) and note (optional).
+"""
+import csv
+import json
+import time
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import Habit, HabitLog
+from .algorithms.bulk_streaks import rebuild_streaks_for_habits
+from .algorithms.completion_calendar import rebuild_calendar
+from .algorithms.user_stats import invalidate_user_stats
+from .algorithms.leaderboard import refresh_leaderboard_entries
+from .algorithms.daily_rollup import refresh_daily_rollups
+
+# Rows written per INSERT ... ON CONFLICT statement
+IMPORT_CHUNK_SIZE = 1000
+
+# Number of invalid rows reported back in detail
+IMPORT_MAX_ERRORS = 20
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+LOG_STATUSES = {choice for choice, _ in HabitLog.STATUS_CHOICES}
+
+
+def detect_import_format(filename):
+    """Guess the import format from a file name, defaulting to csv"""
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def _read_rows(lines, input_format):
+    """Yield (line_number, row dict) from an iterable of text lines"""
+    if input_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            yield line_number, None
+        else:
+            yield line_number, row
+
+
+def _parse_row(row, today):
+    """
+    Validate a raw import row.
+
+    Returns:
+        HabitLog: Unsaved log
+
+    Raises:
+        ValueError: If the row is invalid
+    """
+    if row is None:
+        raise ValueError('Invalid JSON object')
+
+    try:
+        habit_id = int(row.get('habit') or '')
+    except (TypeError, ValueError):
+        raise ValueError('habit must be a habit id')
+
+    try:
+        log_date = date.fromisoformat(str(row.get('date') or ''))
+    except ValueError:
+        raise ValueError('date must be YYYY-MM-DD')
+    if log_date > today:
+        raise ValueError('Cannot import logs for future dates')
+
+    status = str(row.get('status') or 'completed')
+    if status not in LOG_STATUSES:
+        raise ValueError(f'Unknown status: {status}')
+
+    amount_done = row.get('amount_done')
+    if amount_done in (None, ''):
+        amount_done = None
+    else:
+        # The column's own checks: finite, max_digits and decimal_places,
+        # so the row is reported instead of failing the INSERT
+        field = HabitLog._meta.get_field('amount_done')
+        try:
+            amount_done = field.to_python(str(amount_done))
+            field.run_validators(amount_done)
+        except ValidationError as e:
+            raise ValueError(f'amount_done: {" ".join(e.messages)}')
+
+    note = str(row.get('note') or '')
+    if len(note) > 500:
+        raise ValueError('note must be at most 500 characters')
+
+    return HabitLog(habit_id=habit_id, log_date=log_date, status=status, amount_done=amount_done, note=note)
+
+
+def _write_chunk(logs, habits_filter, overwrite, result):
+    """Upsert one chunk of parsed logs; returns the ids of the habits written to"""
+    # The same (habit, date) twice in one ON CONFLICT statement is an error,
+    # so the last row wins inside a chunk
+    unique_logs = {(log.habit_id, log.log_date): log for log in logs}
+
+    habit_ids = {habit_id for habit_id, _ in unique_logs}
+    known_ids = set(habits_filter.filter(id__in=habit_ids).values_list('id', flat=True))
+
+    now = timezone.now()
+    rows = []
+    for (habit_id, _), log in unique_logs.items():
+        if habit_id not in known_ids:
+            result['skipped'] += 1
+            continue
+        log.created_at = now
+        log.updated_at = now
+        rows.append(log)
+
+    if overwrite:
+        HabitLog.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['habit', 'log_date'],
+            update_fields=['status', 'amount_done', 'note', 'updated_at']
+        )
+        imported = len(rows)
+    else:
+        # Conflicting rows are dropped by the database without telling which,
+        # so count the chunk's (habit, date) range before and after the insert
+        chunk_range = HabitLog.objects.filter(
+            habit_id__in={log.habit_id for log in rows},
+            log_date__in={log.log_date for log in rows}
+        )
+        with transaction.atomic():
+            existing = chunk_range.count()
+            HabitLog.objects.bulk_create(rows, ignore_conflicts=True)
+            imported = chunk_range.count() - existing
+        # Existing logs that were kept
+        result['skipped'] += len(rows) - imported
+
+    result['imported'] += imported
+    result['skipped'] += len(logs) - len(unique_logs)
+    return {log.habit_id for log in rows}
+
+
+def recompute_habits(habit_ids):
+    """
+    Rebuild calendars and streaks of habits after their logs were bulk written.
+
+    Args:
+        habit_ids: Ids of the affected habits
+    """
+    if not habit_ids:
+        return
+
+    today = timezone.now().date()
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Locked like the other calendar writers (completion_calendar.lock_calendars)
+        habits = list(Habit.objects.select_for_update().filter(id__in=habit_ids).order_by('id'))
+
+        last_completed = dict(
+            HabitLog.objects.filter(habit_id__in=habit_ids, status='completed', log_date__lte=today)
+            .values('habit_id')
+            .annotate(last_date=Max('log_date'))
+            .values_list('habit_id', 'last_date')
+        )
+
+        for habit in habits:
+            rebuild_calendar(habit)
+            habit.last_completed_date = last_completed.get(habit.id)
+            habit.updated_at = now
+
+        Habit.objects.bulk_update(habits, [
+            'calendar_start', 'completed_bitmap', 'missed_bitmap',
+            'last_completed_date', 'updated_at'
+        ], batch_size=1000)
+        rebuild_streaks_for_habits(habits, today)
+
+    user_ids = {habit.user_id for habit in habits}
+    for user_id in user_ids:
+        invalidate_user_stats(user_id)
+    refresh_leaderboard_entries(user_ids)
+    refresh_daily_rollups(user_ids)
+
+
+def import_logs(lines, input_format='csv', user=None, overwrite=True, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import habit logs from CSV or NDJSON lines.
+
+    Args:
+        lines: Iterable of text lines (file object, response stream, ...)
+        input_format: 'csv' (with a header row) or 'ndjson'
+        user: Only import logs for this user's habits (optional)
+        overwrite: Replace existing logs for the same habit and date
+                   (otherwise existing logs are kept)
+        chunk_size: Rows per upsert statement
+
+    Returns:
+        dict: {'rows', 'imported', 'skipped', 'invalid', 'errors', 'habits', 'elapsed', 'rows_per_sec'}
+    """
+    if input_format not in IMPORT_FORMATS:
+        raise ValueError(f'input_format must be one of: {", ".join(IMPORT_FORMATS)}')
+
+    started = time.monotonic()
+    today = timezone.now().date()
+    habits_filter = Habit.objects.filter(user=user) if user is not None else Habit.objects.all()
+
+    result = {'rows': 0, 'imported': 0, 'skipped': 0, 'invalid': 0, 'errors': []}
+    affected = set()
+    chunk = []
+
+    try:
+        for line_number, row in _read_rows(lines, input_format):
+            result['rows'] += 1
+            try:
+                chunk.append(_parse_row(row, today))
+            except ValueError as e:
+                result['invalid'] += 1
+                if len(result['errors']) < IMPORT_MAX_ERRORS:
+                    result['errors'].append({'line': line_number, 'error': str(e)})
+                continue
+
+            if len(chunk) >= chunk_size:
+                affected |= _write_chunk(chunk, habits_filter, overwrite, result)
+                chunk = []
+
+        if chunk:
+            affected |= _write_chunk(chunk, habits_filter, overwrite, result)
+    finally:
+        # Streaks and calendars once per habit, after all logs are in; also
+        # when reading fails midway, so already written chunks stay consistent
+        recompute_habits(affected)
+
+    elapsed = time.monotonic() - started
+    result['habits'] = len(affected)
+    result['elapsed'] = round(elapsed, 3)
+    result['rows_per_sec'] = round(result['rows'] / elapsed) if elapsed > 0 else result['rows']
+    return result
@@ -0,0 +1,49 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.algorithms.daily_rollup import refresh_daily_rollups
+from api.models import UserDailyRollup
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user daily rollup (calendar totals) from habits and logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of users recomputed per batch')
+        parser.add_argument('--user', type=str, help='Only recompute this user (username or email)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = User.objects.all()
+
+        if options['user']:
+            users = users.filter(username__iexact=options['user']) | users.filter(email__iexact=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f'User "{options["user"]}" not found'))
+                return
+
+        batch_size = max(1, options['batch_size'])
+        processed = 0
+        last_seen = 0
+
+        while True:
+            user_ids = list(
+                users.filter(id__gt=last_seen).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_seen = user_ids[-1]
+
+            refresh_daily_rollups(user_ids)
+            processed += len(user_ids)
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed > 0 else processed
+        rows = UserDailyRollup.objects.filter(user__in=users).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {processed} users ({rows} daily rollups) in {elapsed:.2f}s ({rate:.0f} users/sec)'
+        ))
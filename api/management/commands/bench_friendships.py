@@ -0,0 +1,110 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.models import Friend, Friendship
+
+from .bench_user_search import _bulk_create_users, _confirm, _summary, _timed
+
+User = get_user_model()
+
+BENCH_PREFIX = 'fbench_'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark friend lookups on a synthetic friendship graph (creates fbench_* users as needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Number of synthetic users in the graph')
+        parser.add_argument('--friends', type=int, default=20, help='Accepted friend requests sent per user')
+        parser.add_argument('--queries', type=int, default=500, help='Number of lookups to time per query type')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic graph and exit')
+        parser.add_argument('--yes', action='store_true', help='Confirm creating (or with --cleanup deleting) synthetic users in the configured database')
+
+    def handle(self, *args, **options):
+        bench_users = User.objects.filter(username__startswith=BENCH_PREFIX)
+
+        if options['cleanup']:
+            _confirm(options, f'deletes every {BENCH_PREFIX}* user')
+            deleted, _ = bench_users.delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} rows'))
+            return
+
+        if not bench_users.exists():
+            _confirm(options, f'creates {options["users"]} synthetic {BENCH_PREFIX}* users and their friendships')
+            self._seed(options['users'], options['friends'])
+
+        user_ids = list(bench_users.values_list('id', flat=True))
+        rng = random.Random(7)
+        users = [User(id=user_id) for user_id in rng.choices(user_ids, k=options['queries'])]
+        pairs = [(user, rng.choice(user_ids)) for user in users]
+
+        def legacy_friends(user):
+            return list(Friend.objects.filter(
+                Q(user=user) | Q(friend=user),
+                status='accepted'
+            ).values_list('user_id', 'friend_id'))
+
+        def legacy_are_friends(pair):
+            user, other_id = pair
+            return Friend.objects.filter(
+                Q(user=user, friend_id=other_id, status='accepted') |
+                Q(user_id=other_id, friend=user, status='accepted')
+            ).exists()
+
+        def friends(user):
+            return list(Friendship.objects.filter(user=user).values_list('friend_id', flat=True))
+
+        def are_friends(pair):
+            user, other_id = pair
+            return Friendship.objects.filter(user=user, friend_id=other_id).exists()
+
+        self.stdout.write(f'graph: {len(user_ids)} users, {Friendship.objects.count() // 2} friendships')
+        self.stdout.write(f'list friends (OR on friends):     {_summary(_timed(legacy_friends, users))}')
+        self.stdout.write(f'list friends (friendship edges):  {_summary(_timed(friends, users))}')
+        self.stdout.write(f'are friends (OR on friends):      {_summary(_timed(legacy_are_friends, pairs))}')
+        self.stdout.write(f'are friends (friendship edges):   {_summary(_timed(are_friends, pairs))}')
+
+    def _seed(self, user_count, friends_per_user):
+        """Create synthetic users and accepted friendships in batches"""
+        started = time.monotonic()
+        rng = random.Random(user_count)
+
+        for offset in range(0, user_count, 5000):
+            _bulk_create_users([
+                User(username=f'{BENCH_PREFIX}{i}', email=f'{BENCH_PREFIX}{i}@bench.example', password='!')
+                for i in range(offset, min(offset + 5000, user_count))
+            ])
+        user_ids = list(User.objects.filter(username__startswith=BENCH_PREFIX).values_list('id', flat=True))
+
+        # bulk_create skips Friend.save(), so the edges are written here
+        seen = set()
+        requests = []
+        for user_id in user_ids:
+            for friend_id in rng.sample(user_ids, friends_per_user):
+                pair = (min(user_id, friend_id), max(user_id, friend_id))
+                if user_id != friend_id and pair not in seen:
+                    seen.add(pair)
+                    requests.append(Friend(user_id=user_id, friend_id=friend_id, status='accepted'))
+
+            if len(requests) >= 5000 or user_id == user_ids[-1]:
+                Friend.objects.bulk_create(requests)
+                created = Friend.objects.filter(
+                    user_id__in={request.user_id for request in requests},
+                    status='accepted',
+                    edges__isnull=True
+                ).values_list('id', 'user_id', 'friend_id')
+                Friendship.objects.bulk_create([
+                    edge
+                    for request_id, a, b in created
+                    for edge in (
+                        Friendship(user_id=a, friend_id=b, request_id=request_id),
+                        Friendship(user_id=b, friend_id=a, request_id=request_id),
+                    )
+                ])
+                requests = []
+
+        self.stdout.write(f'Created {len(user_ids)} users and {len(seen)} friendships in {time.monotonic() - started:.1f}s')
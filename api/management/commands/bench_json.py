@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+from api.models import Habit, HabitLog
+from api.parsers import FastJSONParser
+from api.serializers import HabitLogSerializer, HabitSerializer
+
+STATUSES = ['completed', 'completed', 'completed', 'missed', 'skipped']
+
+
+def _timed(func, runs):
+    """Call func runs times and return the latencies in milliseconds"""
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _summary(latencies):
+    latencies = sorted(latencies)
+    return f'p50 {statistics.median(latencies):.2f}ms, max {latencies[-1]:.2f}ms'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark DRF JSONRenderer/JSONParser against FastJSONRenderer/FastJSONParser on large log payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logs', type=int, default=20000, help='Number of serialized habit logs in the payload')
+        parser.add_argument('--habits', type=int, default=500, help='Number of serialized habits in the payload')
+        parser.add_argument('--runs', type=int, default=20, help='Number of timed renders/parses per payload')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed - FastJSONRenderer falls back to JSONRenderer'))
+
+        payloads = {
+            'habit logs': self._logs(options['logs']),
+            'habits': self._habits(options['habits']),
+        }
+
+        for name, data in payloads.items():
+            default_renderer, fast_renderer = JSONRenderer(), renderers.FastJSONRenderer()
+            rendered = default_renderer.render(data)
+            if fast_renderer.render(data) != rendered:
+                self.stdout.write(self.style.ERROR(f'{name}: FastJSONRenderer output differs from JSONRenderer'))
+
+            self.stdout.write(f'{name} ({len(rendered) / 1024:.0f} KiB):')
+            self._compare(
+                'render', options['runs'],
+                ('JSONRenderer', lambda: default_renderer.render(data)),
+                ('FastJSONRenderer', lambda: fast_renderer.render(data))
+            )
+            self._compare(
+                'parse', options['runs'],
+                ('JSONParser', lambda: JSONParser().parse(BytesIO(rendered))),
+                ('FastJSONParser', lambda: FastJSONParser().parse(BytesIO(rendered)))
+            )
+
+    def _compare(self, operation, runs, default, fast):
+        """Time the default and the fast implementation of an operation"""
+        default_ms = _timed(default[1], runs)
+        fast_ms = _timed(fast[1], runs)
+        speedup = statistics.median(default_ms) / statistics.median(fast_ms)
+        self.stdout.write(f'  {operation} {default[0]}: {_summary(default_ms)}')
+        self.stdout.write(f'  {operation} {fast[0]}: {_summary(fast_ms)} ({speedup:.1f}x faster)')
+
+    def _logs(self, count):
+        """Serialized unsaved HabitLogs, like the logs endpoint returns them"""
+        rng = random.Random(42)
+        now = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        logs = []
+        for i in range(count):
+            status = rng.choice(STATUSES)
+            logs.append(HabitLog(
+                id=i + 1,
+                log_date=date(2024, 1, 1) + timedelta(days=i % 730),
+                status=status,
+                amount_done=Decimal(rng.randint(1, 5000)) / 100 if status == 'completed' and i % 3 == 0 else None,
+                note='' if i % 10 else 'Felt great ☀',
+                created_at=now - timedelta(seconds=i * 37),
+                updated_at=now - timedelta(seconds=i * 11)
+            ))
+        return HabitLogSerializer(logs, many=True).data
+
+    def _habits(self, count):
+        """Serialized unsaved Habits with today's log, like the habit list returns them"""
+        rng = random.Random(7)
+        now = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        habits = []
+        for i in range(count):
+            habit = Habit(
+                id=i + 1,
+                name=f'Habit {i}',
+                description='Read a few pages before bed',
+                emoji='📚',
+                tracking_mode='daily',
+                target_amount=Decimal('20.00'),
+                unit='pages',
+                duration_days=30,
+                current_streak=rng.randint(0, 100),
+                longest_streak=rng.randint(100, 400),
+                last_completed_date=date(2025, 12, 31),
+                created_at=now - timedelta(days=i),
+                updated_at=now
+            )
+            habit.completed_count = rng.randint(0, 30)
+            habit.today_logs = [HabitLog(
+                id=i + 1, log_date=date(2026, 1, 1), status='completed',
+                amount_done=Decimal('12.50'), created_at=now, updated_at=now
+            )]
+            habits.append(habit)
+        return HabitSerializer(habits, many=True).data
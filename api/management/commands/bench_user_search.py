@@ -0,0 +1,145 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import LeaderboardEntry, LeafDollarEntry, UserSearchTerm, build_search_terms
+from api.user_search import search_users
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_'
+FIRST_NAMES = ['alex', 'sam', 'jordan', 'taylor', 'morgan', 'casey', 'riley', 'jamie', 'avery', 'quinn']
+LAST_NAMES = ['smith', 'garcia', 'nguyen', 'kim', 'müller', 'rossi', 'okafor', 'silva', 'cohen', 'tanaka']
+
+
+def _timed(func, runs):
+    """Run func once per item in runs and return the latencies in milliseconds"""
+    latencies = []
+    for arg in runs:
+        started = time.perf_counter()
+        func(arg)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _confirm(options, action):
+    """Refuse to write to the database unless --yes was passed"""
+    if not options['yes']:
+        raise CommandError(
+            f'This {action} in the "{connection.settings_dict["NAME"]}" database. '
+            f'Run it against a scratch database and pass --yes to continue'
+        )
+
+
+def _bulk_create_users(users):
+    """
+    bulk_create users with the rows User.save() would write for them: the
+    opening balance ledger entry and the leaderboard entry.
+
+    Returns:
+        list: (id, username, email, display_name) of the created users
+    """
+    today = timezone.now().date()
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        balances = {user.username: user.leaf_dollars for user in users}
+        created = list(User.objects.filter(username__in=balances).values_list(
+            'id', 'username', 'email', 'display_name'
+        ))
+        LeafDollarEntry.objects.bulk_create([
+            LeafDollarEntry(user_id=user_id, amount=balances[username], reason='opening_balance')
+            for user_id, username, _, _ in created
+        ])
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(user_id=user_id, week_start=today - timedelta(days=today.weekday()))
+            for user_id, _, _, _ in created
+        ])
+    return created
+
+
+def _summary(latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    return f'p50 {statistics.median(latencies):.2f}ms, p95 {p95:.2f}ms, max {latencies[-1]:.2f}ms'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark user search against a synthetic user table (creates bench_* users as needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help='Number of synthetic users to search over')
+        parser.add_argument('--queries', type=int, default=200, help='Number of searches to time')
+        parser.add_argument('--legacy', action='store_true', help='Also time the previous unindexed icontains search')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic users and exit')
+        parser.add_argument('--yes', action='store_true', help='Confirm creating (or with --cleanup deleting) synthetic users in the configured database')
+
+    def handle(self, *args, **options):
+        bench_users = User.objects.filter(username__startswith=BENCH_PREFIX)
+
+        if options['cleanup']:
+            _confirm(options, f'deletes every {BENCH_PREFIX}* user')
+            deleted, _ = bench_users.delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} rows'))
+            return
+
+        _confirm(options, f'creates up to {options["users"]} synthetic {BENCH_PREFIX}* users')
+        self._seed(options['users'] - bench_users.count())
+
+        rng = random.Random(42)
+        queries = []
+        for _ in range(options['queries']):
+            name = rng.choice(FIRST_NAMES + LAST_NAMES)
+            queries.append(name[:rng.randint(2, len(name))])
+
+        latencies = _timed(lambda query: list(search_users(query)), queries)
+        self.stdout.write(f'search_users: {_summary(latencies)} over {len(queries)} queries')
+
+        if options['legacy']:
+            def legacy_search(query):
+                return list(User.objects.filter(
+                    Q(username__icontains=query) |
+                    Q(email__icontains=query) |
+                    Q(display_name__icontains=query)
+                ).order_by('username')[:20])
+
+            latencies = _timed(legacy_search, queries)
+            self.stdout.write(f'legacy icontains: {_summary(latencies)} over {len(queries)} queries')
+
+    def _seed(self, missing):
+        """Create synthetic users (and their search terms) in batches"""
+        if missing <= 0:
+            return
+
+        started = time.monotonic()
+        rng = random.Random(missing)
+        start = User.objects.filter(username__startswith=BENCH_PREFIX).count()
+        batch_size = 5000
+
+        for offset in range(start, start + missing, batch_size):
+            users = []
+            for i in range(offset, min(offset + batch_size, start + missing)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                users.append(User(
+                    username=f'{BENCH_PREFIX}{first}{i}',
+                    email=f'{first}.{last}{i}@bench.example',
+                    display_name=f'{first.title()} {last.title()}',
+                    password='!'
+                ))
+            # bulk_create skips save(), so terms are written here (PostgreSQL searches without them)
+            created = _bulk_create_users(users)
+            if connection.vendor == 'postgresql':
+                continue
+            UserSearchTerm.objects.bulk_create([
+                UserSearchTerm(user_id=user_id, term=term)
+                for user_id, username, email, display_name in created
+                for term in build_search_terms(username, email, display_name)
+            ])
+
+        self.stdout.write(f'Created {missing} users in {time.monotonic() - started:.1f}s')
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 
+from api.algorithms.leaf_dollars import set_leaf_dollars
+
 User = get_user_model()
 
 
@@ -25,9 +27,7 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f'User "{username}" not found'))
                 return
 
-            old_balance = user.leaf_dollars
-            user.leaf_dollars = amount
-            user.save()
+            old_balance = set_leaf_dollars(user, amount)
 
             self.stdout.write(self.style.SUCCESS(
                 f'Successfully set {user.username}\'s leaf dollars from {old_balance} to {amount}'
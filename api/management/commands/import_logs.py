@@ -0,0 +1,55 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.log_import import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, detect_import_format, import_logs
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Bulk import historical habit logs from a CSV or NDJSON file (habit, date, status, amount_done, note)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for stdin')
+        parser.add_argument('--format', dest='input_format', choices=IMPORT_FORMATS,
+                            help='Input format (default: from the file extension, csv otherwise)')
+        parser.add_argument('--user', help='Only import logs for habits of this username or email')
+        parser.add_argument('--keep-existing', action='store_true',
+                            help='Keep existing logs for the same habit and date instead of overwriting them')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Rows per insert statement')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['input_format'] or detect_import_format(path)
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first() or \
+                User.objects.filter(email=options['user']).first()
+            if not user:
+                raise CommandError(f"User '{options['user']}' not found")
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with stream:
+            result = import_logs(
+                stream,
+                input_format=input_format,
+                user=user,
+                overwrite=not options['keep_existing'],
+                chunk_size=max(1, options['chunk_size'])
+            )
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"  line {error['line']}: {error['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} of {result['rows']} rows for {result['habits']} habits "
+            f"in {result['elapsed']:.2f}s ({result['rows_per_sec']} rows/sec), "
+            f"{result['skipped']} skipped, {result['invalid']} invalid"
+        ))
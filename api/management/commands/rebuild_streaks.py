@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.algorithms.bulk_streaks import rebuild_streaks_for_habits
+from api.management.sharding import run_habit_shards
+from api.models import Habit
+
+
+def rebuild_habit_range(first_id, last_id, batch_size, dry_run, today):
+    """
+    Rebuild streaks for habits with first_id <= id <= last_id.
+
+    Habits are processed in batches of batch_size ids with
+    rebuild_streaks_for_habits, which streams their completed logs ordered by
+    (habit_id, log_date) and computes the streak runs with NumPy.
+
+    Returns:
+        dict: {'habits': int, 'drifted': int, 'examples': list}
+    """
+    result = {'habits': 0, 'drifted': 0, 'examples': []}
+    last_seen = first_id - 1
+
+    while True:
+        habits = list(
+            Habit.objects.filter(id__gt=last_seen, id__lte=last_id)
+            .order_by('id')
+            .only('id', 'user_id', 'current_streak', 'longest_streak', 'updated_at')[:batch_size]
+        )
+        if not habits:
+            break
+        last_seen = habits[-1].id
+
+        batch = rebuild_streaks_for_habits(habits, today, dry_run=dry_run)
+        result['habits'] += len(habits)
+        result['drifted'] += batch['drifted']
+        result['examples'].extend(batch['examples'][:20 - len(result['examples'])])
+
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Recompute Habit.current_streak/longest_streak and the Streak table from habit logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Number of habits processed per batch')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes (split by habit id range)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report habits whose stored streaks drifted')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        workers = options['workers']
+        dry_run = options['dry_run']
+        today = timezone.now().date()
+
+        started = time.monotonic()
+        results = run_habit_shards(rebuild_habit_range, workers, batch_size, dry_run, today)
+        if results is None:
+            self.stdout.write('No habits to rebuild')
+            return
+        elapsed = time.monotonic() - started
+
+        habits = sum(result['habits'] for result in results)
+        drifted = sum(result['drifted'] for result in results)
+        rate = habits / elapsed if elapsed > 0 else habits
+
+        if dry_run:
+            self.stdout.write(f'Drift report: {drifted} of {habits} habits have stale streaks')
+            for result in results:
+                for habit_id, old_current, new_current, old_longest, new_longest in result['examples']:
+                    self.stdout.write(
+                        f'  habit {habit_id}: current {old_current} -> {new_current}, '
+                        f'longest {old_longest} -> {new_longest}'
+                    )
+
+        action = 'Checked' if dry_run else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {habits} habits in {elapsed:.2f}s ({rate:.0f} habits/sec), {drifted} drifted'
+        ))
@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from api.models import LeafDollarEntry
+
+User = get_user_model()
+
+
+def _mismatches(users):
+    """(user id, username, balance, ledger total) of users whose balance differs from their ledger"""
+    return list(
+        users.annotate(ledger_total=Coalesce(Sum('leaf_dollar_entries__amount'), 0))
+        .exclude(leaf_dollars=F('ledger_total'))
+        .values_list('id', 'username', 'leaf_dollars', 'ledger_total')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compare every leaf dollar balance with the sum of its ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Append adjustment entries so each ledger matches its balance')
+        parser.add_argument('--limit', type=int, default=50, help='Maximum number of mismatches to list')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        mismatches = _mismatches(User.objects.all())
+
+        for user_id, username, balance, ledger_total in mismatches[:options['limit']]:
+            self.stdout.write(f'{username} (id {user_id}): balance {balance}, ledger {ledger_total}')
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(
+                f'All balances match their ledgers ({time.monotonic() - started:.2f}s)'
+            ))
+            return
+
+        if not options['fix']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(mismatches)} balances differ from their ledgers; run with --fix to add adjustments'
+            ))
+            return
+
+        # Lock the rows and compare again, so balances changed since the scan are not misjudged
+        with transaction.atomic():
+            users = User.objects.filter(id__in=[row[0] for row in mismatches])
+            list(users.select_for_update().values_list('id', flat=True))
+            adjustments = [
+                LeafDollarEntry(user_id=user_id, amount=balance - ledger_total, reason='adjustment')
+                for user_id, _, balance, ledger_total in _mismatches(users)
+            ]
+            LeafDollarEntry.objects.bulk_create(adjustments, batch_size=5000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {len(adjustments)} adjustment entries in {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,93 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from api.algorithms.rollover import roll_over_habits
+from api.management.sharding import run_habit_shards
+from api.models import Habit, HabitLog
+
+
+def roll_over_habit_range(first_id, last_id, batch_size, day):
+    """
+    Mark day missed for active daily habits with first_id <= id <= last_id
+    that have no log for it.
+
+    Habits are selected in id order, batch_size at a time, and each batch is
+    committed on its own. Habits rolled over by an earlier (interrupted) run
+    already have a log for the day and are not selected again, so running the
+    command again continues where it stopped.
+
+    Returns:
+        dict: {'missed': int, 'broken': int}
+    """
+    result = {'missed': 0, 'broken': 0}
+    last_seen = first_id - 1
+
+    pending = Habit.objects.filter(
+        is_active=True,
+        tracking_mode='daily',
+        created_at__date__lte=day
+    ).exclude(
+        Exists(HabitLog.objects.filter(habit=OuterRef('pk'), log_date=day))
+    )
+
+    while True:
+        habit_ids = list(
+            pending.filter(id__gt=last_seen, id__lte=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not habit_ids:
+            break
+        last_seen = habit_ids[-1]
+
+        # Habits are read again under lock by roll_over_habits
+        batch = roll_over_habits(habit_ids, day)
+        result['missed'] += batch['missed']
+        result['broken'] += batch['broken']
+
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Mark a finished day missed for every active daily habit without a log for it, and break their streaks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, help='Day to roll over as YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Number of habits processed per batch')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes (split by habit id range)')
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Invalid date format. Use YYYY-MM-DD')
+        else:
+            day = today - timedelta(days=1)
+
+        if day >= today:
+            raise CommandError('Only days that are over can be rolled over')
+
+        batch_size = options['batch_size']
+        workers = options['workers']
+
+        started = time.monotonic()
+        results = run_habit_shards(roll_over_habit_range, workers, batch_size, day)
+        if results is None:
+            self.stdout.write('No habits to roll over')
+            return
+        elapsed = time.monotonic() - started
+
+        missed = sum(result['missed'] for result in results)
+        broken = sum(result['broken'] for result in results)
+        rate = missed / elapsed if elapsed > 0 else missed
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled over {day}: {missed} habits marked missed in {elapsed:.2f}s '
+            f'({rate:.0f} habits/sec), {broken} streaks broken'
+        ))
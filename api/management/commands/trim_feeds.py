@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from api.feed import get_timeline_cap, trim_timelines
+from api.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Trim every activity feed timeline to the newest FEED_TIMELINE_CAP entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of timelines trimmed per DELETE')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        batch_size = max(1, options['batch_size'])
+
+        # Only timelines over the cap need trimming
+        owner_ids = list(
+            FeedEntry.objects.values('owner_id')
+            .annotate(entries=Count('id'))
+            .filter(entries__gt=get_timeline_cap())
+            .values_list('owner_id', flat=True)
+        )
+
+        deleted = 0
+        for offset in range(0, len(owner_ids), batch_size):
+            deleted += trim_timelines(owner_ids[offset:offset + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Trimmed {len(owner_ids)} timelines, deleted {deleted} entries '
+            f'in {time.monotonic() - started:.2f}s'
+        ))
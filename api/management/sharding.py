@@ -0,0 +1,54 @@
+"""
+Habit id sharding for management commands
+
+Commands that walk every habit split the habit id range into one contiguous
+shard per worker and process the shards in a process pool. Each worker opens
+its own database connection.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+from django.db.models import Max, Min
+
+from api.models import Habit
+
+
+def _run_shard(args):
+    """Process pool entry point - each worker opens its own DB connection"""
+    process_range, shard_args = args
+    connections.close_all()
+    return process_range(*shard_args)
+
+
+def run_habit_shards(process_range, workers, *args):
+    """
+    Run process_range over the whole habit id range, split across workers.
+
+    Args:
+        process_range: Module-level function called as
+                       process_range(first_id, last_id, *args) for each shard
+        workers: Number of worker processes (1 runs in this process)
+        *args: Extra arguments passed to process_range
+
+    Returns:
+        list: Result of each shard, or None if there are no habits
+    """
+    workers = max(1, workers)
+    bounds = Habit.objects.aggregate(first_id=Min('id'), last_id=Max('id'))
+    if bounds['first_id'] is None:
+        return None
+
+    first_id, last_id = bounds['first_id'], bounds['last_id']
+    shard_size = (last_id - first_id) // workers + 1
+    shards = [
+        (start, min(start + shard_size - 1, last_id), *args)
+        for start in range(first_id, last_id + 1, shard_size)
+    ]
+
+    if workers == 1:
+        return [process_range(*shards[0])]
+
+    # Forked workers must not share the parent's connection
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_shard, [(process_range, shard) for shard in shards]))
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:16
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def build_completion_calendars(apps, schema_editor):
+    """Build completion bitmaps for existing habits from their logs"""
+    Habit = apps.get_model('api', 'Habit')
+    HabitLog = apps.get_model('api', 'HabitLog')
+
+    for habit in Habit.objects.all().iterator():
+        logs = list(HabitLog.objects.filter(habit_id=habit.id).values_list('log_date', 'status'))
+        calendar_start = habit.created_at.date()
+        if logs:
+            earliest = min(log_date for log_date, _ in logs)
+            if earliest < calendar_start:
+                # Keep the start byte-aligned with the creation date
+                shift = -(-(calendar_start - earliest).days // 8) * 8
+                calendar_start -= timedelta(days=shift)
+
+        completed_bits = 0
+        missed_bits = 0
+        for log_date, status in logs:
+            bit = 1 << (log_date - calendar_start).days
+            if status == 'completed':
+                completed_bits |= bit
+            else:
+                missed_bits |= bit
+
+        Habit.objects.filter(id=habit.id).update(
+            calendar_start=calendar_start,
+            completed_bitmap=completed_bits.to_bytes((completed_bits.bit_length() + 7) // 8, 'little'),
+            missed_bitmap=missed_bits.to_bytes((missed_bits.bit_length() + 7) // 8, 'little'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_set_all_leaf_dollars_150'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='calendar_start',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='completed_bitmap',
+            field=models.BinaryField(blank=True, default=bytes),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='missed_bitmap',
+            field=models.BinaryField(blank=True, default=bytes),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='leaf_dollars',
+            field=models.IntegerField(default=150),
+        ),
+        migrations.RunPython(build_completion_calendars, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_habit_completion_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('habit', 'Habit'), ('habit_log', 'Habit Log')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('habit_id', models.BigIntegerField()),
+                ('log_date', models.DateField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sync_tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'updated_at'], name='habits_user_id_821a26_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habitlog',
+            index=models.Index(fields=['habit', 'updated_at'], name='habit_logs_habit_i_53d575_idx'),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='sync_tombst_user_id_019028_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:30
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Trigram indexes on the expressions Django's icontains lookup compiles to on
+# PostgreSQL, so UPPER(col::text) LIKE UPPER('%q%') can use them
+TRIGRAM_INDEXES = [
+    ('users_username_trgm_idx', 'username'),
+    ('users_email_trgm_idx', 'email'),
+    ('users_display_name_trgm_idx', 'display_name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON users USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def build_search_terms(apps, schema_editor):
+    """Build prefix-search terms for existing users (same rules as models.build_search_terms)"""
+    if schema_editor.connection.vendor == 'postgresql':
+        # Search uses the trigram indexes there
+        return
+    User = apps.get_model('api', 'User')
+    UserSearchTerm = apps.get_model('api', 'UserSearchTerm')
+
+    terms = []
+    for user_id, username, email, display_name in User.objects.values_list(
+        'id', 'username', 'email', 'display_name'
+    ).iterator():
+        user_terms = {(email or '').strip().lower()[:254]} - {''}
+        for value in (username, display_name, (email or '').split('@')[0]):
+            value = (value or '').strip().lower()
+            if not value:
+                continue
+            user_terms.add(value[:254])
+            user_terms.update(word[:254] for word in re.split(r'[\W_]+', value) if word)
+        terms.extend(UserSearchTerm(user_id=user_id, term=term) for term in user_terms)
+
+        if len(terms) >= 5000:
+            UserSearchTerm.objects.bulk_create(terms)
+            terms = []
+
+    UserSearchTerm.objects.bulk_create(terms)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=254)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_search_terms',
+                'indexes': [models.Index(fields=['term'], name='user_search_term_caf803_idx')],
+                'unique_together': {('user', 'term')},
+            },
+        ),
+        migrations.RunPython(build_search_terms, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def build_friendship_edges(apps, schema_editor):
+    """Create both edges for every existing accepted friend request"""
+    Friend = apps.get_model('api', 'Friend')
+    Friendship = apps.get_model('api', 'Friendship')
+
+    now = timezone.now()
+    edges = []
+    for request_id, user_id, friend_id in Friend.objects.filter(status='accepted').values_list(
+        'id', 'user_id', 'friend_id'
+    ).iterator():
+        edges.append(Friendship(user_id=user_id, friend_id=friend_id, request_id=request_id, created_at=now))
+        edges.append(Friendship(user_id=friend_id, friend_id=user_id, request_id=request_id, created_at=now))
+
+        if len(edges) >= 5000:
+            Friendship.objects.bulk_create(edges, ignore_conflicts=True)
+            edges = []
+
+    Friendship.objects.bulk_create(edges, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_user_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Friendship',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('friend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='api.friend')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friendships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'friendships',
+                'unique_together': {('user', 'friend')},
+            },
+        ),
+        migrations.RunPython(build_friendship_edges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:03
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def create_entries(apps, schema_editor):
+    """Write an entry for every existing user (same figures as leaderboard.refresh_leaderboard_entries)"""
+    User = apps.get_model('api', 'User')
+    Habit = apps.get_model('api', 'Habit')
+    HabitLog = apps.get_model('api', 'HabitLog')
+    LeaderboardEntry = apps.get_model('api', 'LeaderboardEntry')
+
+    today = timezone.now().date()
+    week_start = today - timedelta(days=today.weekday())
+
+    streaks = dict(
+        Habit.objects.filter(is_active=True)
+        .values('user_id')
+        .annotate(total=Sum('current_streak'))
+        .values_list('user_id', 'total')
+    )
+    week_completions = dict(
+        HabitLog.objects.filter(
+            habit__is_active=True,
+            status='completed',
+            log_date__gte=week_start,
+            log_date__lte=today
+        ).values('habit__user_id').annotate(week=Count('id')).values_list('habit__user_id', 'week')
+    )
+
+    entries = []
+    for user_id in User.objects.values_list('id', flat=True).iterator():
+        entries.append(LeaderboardEntry(
+            user_id=user_id,
+            total_current_streak=streaks.get(user_id) or 0,
+            week_start=week_start,
+            week_completions=week_completions.get(user_id, 0)
+        ))
+        if len(entries) >= 5000:
+            LeaderboardEntry.objects.bulk_create(entries)
+            entries = []
+
+    LeaderboardEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_friendship_edges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_current_streak', models.IntegerField(default=0)),
+                ('week_start', models.DateField()),
+                ('week_completions', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'leaderboard_entries',
+            },
+        ),
+        # total_completions is filled by 0012
+        migrations.RunPython(create_entries, migrations.RunPython.noop),
+    ]
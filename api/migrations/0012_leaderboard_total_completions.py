@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:04
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_total_completions(apps, schema_editor):
+    """Fill total_completions of existing entries from the habit logs"""
+    LeaderboardEntry = apps.get_model('api', 'LeaderboardEntry')
+    HabitLog = apps.get_model('api', 'HabitLog')
+
+    totals = HabitLog.objects.filter(
+        habit__user_id__in=LeaderboardEntry.objects.values('user_id'),
+        habit__is_active=True,
+        status='completed'
+    ).values('habit__user_id').annotate(total=Count('id')).values_list('habit__user_id', 'total')
+
+    for user_id, total in totals.iterator():
+        LeaderboardEntry.objects.filter(user_id=user_id).update(total_completions=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_leaderboard_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='total_completions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['updated_at'], name='leaderboard_updated_78e63b_idx'),
+        ),
+        migrations.RunPython(count_total_completions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_leaderboard_total_completions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('completed', 'Completed')], default='completed', max_length=10)),
+                ('habit_id', models.BigIntegerField()),
+                ('habit_name', models.CharField(max_length=100)),
+                ('habit_emoji', models.CharField(blank=True, max_length=10)),
+                ('streak', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'feed_entries',
+                'indexes': [models.Index(fields=['owner', '-id'], name='feed_entrie_owner_i_0a2c46_idx')],
+            },
+        ),
+    ]
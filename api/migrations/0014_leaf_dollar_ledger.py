@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def create_opening_balances(apps, schema_editor):
+    """Open the ledger of every existing user with their current balance"""
+    User = apps.get_model('api', 'User')
+    LeafDollarEntry = apps.get_model('api', 'LeafDollarEntry')
+
+    now = timezone.now()
+    entries = []
+    for user_id, leaf_dollars in User.objects.values_list('id', 'leaf_dollars').iterator():
+        entries.append(LeafDollarEntry(user_id=user_id, amount=leaf_dollars, reason='opening_balance', created_at=now))
+        if len(entries) >= 5000:
+            LeafDollarEntry.objects.bulk_create(entries)
+            entries = []
+
+    LeafDollarEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_feed_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeafDollarEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening_balance', 'Opening Balance'), ('completion', 'Habit Completion'), ('revive', 'Revive'), ('reward_purchase', 'Reward Purchase'), ('character_purchase', 'Character Purchase'), ('admin', 'Admin Change'), ('adjustment', 'Reconciliation Adjustment')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaf_dollar_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'leaf_dollar_ledger',
+                'indexes': [models.Index(fields=['user', 'created_at'], name='leaf_dollar_user_id_1d3a0e_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:16
+
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    """Write rollup rows from existing logs (same figures as daily_rollup.refresh_daily_rollups)"""
+    Habit = apps.get_model('api', 'Habit')
+    HabitLog = apps.get_model('api', 'HabitLog')
+    UserDailyRollup = apps.get_model('api', 'UserDailyRollup')
+
+    created = {}
+    for user_id, created_at in Habit.objects.filter(is_active=True).values_list('user_id', 'created_at'):
+        created.setdefault(user_id, []).append(created_at.date())
+    for dates in created.values():
+        dates.sort()
+
+    counts = HabitLog.objects.filter(habit__is_active=True).values('habit__user_id', 'log_date').annotate(
+        completed=Count('id', filter=Q(status='completed')),
+        missed=Count('id', filter=~Q(status='completed'))
+    ).values_list('habit__user_id', 'log_date', 'completed', 'missed')
+
+    rollups = []
+    for user_id, log_date, completed, missed in counts.iterator():
+        rollups.append(UserDailyRollup(
+            user_id=user_id,
+            date=log_date,
+            completed=completed,
+            missed=missed,
+            total_active=bisect_right(created.get(user_id, []), log_date)
+        ))
+        if len(rollups) >= 5000:
+            UserDailyRollup.objects.bulk_create(rollups)
+            rollups = []
+
+    UserDailyRollup.objects.bulk_create(rollups)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_leaf_dollar_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('completed', models.IntegerField(default=0)),
+                ('missed', models.IntegerField(default=0)),
+                ('total_active', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_daily_rollup',
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
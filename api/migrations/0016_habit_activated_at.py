@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_user_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='activated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
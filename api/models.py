@@ -1,9 +1,30 @@
-from django.db import models
+import re
+from datetime import timedelta
+from django.db import connections, models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinLengthValidator, MaxLengthValidator
 from django.utils import timezone
 
 
+def build_search_terms(username, email, display_name):
+    """
+    Normalized prefix-search terms for a user: the lowercased username,
+    display name, email local part and each of their words, plus the email.
+    """
+    terms = {(email or '').strip().lower()[:254]} - {''}
+    for value in (username, display_name, (email or '').split('@')[0]):
+        value = (value or '').strip().lower()
+        if not value:
+            continue
+        terms.add(value[:254])
+        terms.update(word[:254] for word in re.split(r'[\W_]+', value) if word)
+    return terms
+
+
+# User fields the search terms are built from
+SEARCH_TERM_FIELDS = {'username', 'email', 'display_name'}
+
+
 class User(AbstractUser):
     """Custom User model extending Django's AbstractUser"""
     email = models.EmailField(unique=True)
@@ -26,10 +47,57 @@ class User(AbstractUser):
             models.Index(fields=['is_active']),
         ]
 
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        super().save(*args, **kwargs)
+        if creating:
+            # Every balance starts with a ledger entry, so the ledger sums to it
+            LeafDollarEntry.objects.create(user=self, amount=self.leaf_dollars, reason='opening_balance')
+            # ... and is ranked on the leaderboards from the start
+            today = timezone.now().date()
+            LeaderboardEntry.objects.create(user=self, week_start=today - timedelta(days=today.weekday()))
+        if update_fields is None or SEARCH_TERM_FIELDS & set(update_fields):
+            self._update_search_terms(creating)
+
+    def _update_search_terms(self, creating):
+        """Write the changes of the user's prefix-search terms (not used on PostgreSQL, see user_search)"""
+        if connections[self._state.db].vendor == 'postgresql':
+            return
+        if self.get_deferred_fields() & SEARCH_TERM_FIELDS:
+            return
+
+        terms = build_search_terms(self.username, self.email, self.display_name)
+        stored = set() if creating else set(self.search_terms.values_list('term', flat=True))
+        if stored - terms:
+            self.search_terms.filter(term__in=stored - terms).delete()
+        if terms - stored:
+            UserSearchTerm.objects.bulk_create([UserSearchTerm(user=self, term=term) for term in terms - stored])
+
     def __str__(self):
         return f"{self.display_name or self.username} ({self.email})"
 
 
+class UserSearchTerm(models.Model):
+    """
+    Normalized prefix-search terms of a user (see build_search_terms), kept
+    up to date by User.save(). Lets user search run as an index range scan
+    on databases without trigram indexes; not written on PostgreSQL.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=254)
+
+    class Meta:
+        db_table = 'user_search_terms'
+        unique_together = ['user', 'term']
+        indexes = [
+            models.Index(fields=['term']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.term}"
+
+
 class Habit(models.Model):
     """Habit model with enhanced tracking capabilities"""
     
@@ -64,12 +132,19 @@ class Habit(models.Model):
     duration_days = models.IntegerField(null=True, blank=True, help_text="Duration of habit challenge in days (e.g., 30-day challenge)")
     is_public = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # When the habit was last made active again (delta sync resends its logs)
+    activated_at = models.DateTimeField(null=True, blank=True)
     
     # Denormalized streak fields (for performance)
     current_streak = models.IntegerField(default=0)
     longest_streak = models.IntegerField(default=0)
     last_completed_date = models.DateField(null=True, blank=True)
     
+    # Completion calendar: one bit per day since calendar_start (see algorithms/completion_calendar.py)
+    calendar_start = models.DateField(null=True, blank=True)
+    completed_bitmap = models.BinaryField(default=bytes, blank=True)
+    missed_bitmap = models.BinaryField(default=bytes, blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -79,12 +154,33 @@ class Habit(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_active']),
             models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['user', 'updated_at']),
             models.Index(fields=['is_public']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        habit = super().from_db(db, field_names, values)
+        # is_active as loaded, so save() notices a reactivation
+        habit._loaded_is_active = habit.__dict__.get('is_active')
+        return habit
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        reactivated = (
+            self.is_active and getattr(self, '_loaded_is_active', None) is False
+            and (update_fields is None or 'is_active' in update_fields)
+        )
+        if reactivated:
+            self.activated_at = timezone.now()
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, 'activated_at']
+        super().save(*args, **kwargs)
+        self._loaded_is_active = self.is_active
+
 
 class HabitLog(models.Model):
     """Daily/periodic log entries for habit tracking (renamed from HabitCompletion)"""
@@ -112,6 +208,7 @@ class HabitLog(models.Model):
         indexes = [
             models.Index(fields=['habit', 'log_date']),
             models.Index(fields=['habit', 'status']),
+            models.Index(fields=['habit', 'updated_at']),
             models.Index(fields=['log_date']),
         ]
 
@@ -127,6 +224,31 @@ class HabitCompletion(HabitLog):
         db_table = 'habit_completions'
 
 
+class SyncTombstone(models.Model):
+    """Deleted habits/logs, so delta sync can tell clients to drop them"""
+    
+    KIND_CHOICES = [
+        ('habit', 'Habit'),
+        ('habit_log', 'Habit Log'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_tombstones')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    habit_id = models.BigIntegerField()  # Plain id - the habit may be gone
+    log_date = models.DateField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.kind} {self.object_id} ({self.deleted_at})"
+
+
 class Streak(models.Model):
     """Historical streak records for habits"""
     habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='streaks')
@@ -239,6 +361,144 @@ class Friend(models.Model):
             )
         ]
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the mirrored Friendship edges in step with the request status
+        if self.status == 'accepted':
+            Friendship.objects.bulk_create([
+                Friendship(user_id=self.user_id, friend_id=self.friend_id, request=self),
+                Friendship(user_id=self.friend_id, friend_id=self.user_id, request=self),
+            ], ignore_conflicts=True)
+        else:
+            Friendship.objects.filter(request=self).delete()
+
     def __str__(self):
         return f"{self.user.username} -> {self.friend.username} ({self.status})"
 
+
+class Friendship(models.Model):
+    """
+    Accepted friendships stored as mirrored edges: one row per direction.
+
+    "Friends of A" and "are A and B friends" are then single index lookups on
+    (user, friend) instead of OR conditions across Friend.user/Friend.friend.
+    Rows are written by Friend.save() and removed with their Friend request.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friendships')
+    friend = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    request = models.ForeignKey(Friend, on_delete=models.CASCADE, related_name='edges')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'friendships'
+        unique_together = ['user', 'friend']
+
+    def __str__(self):
+        return f"{self.user_id} <-> {self.friend_id}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Per-user leaderboard figures, maintained incrementally by the completion
+    paths (see algorithms.leaderboard) so leaderboards never scan habit logs.
+    week_completions counts completed logs in the ISO week starting week_start.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_entry')
+    total_current_streak = models.IntegerField(default=0)
+    total_completions = models.IntegerField(default=0)
+    week_start = models.DateField()
+    week_completions = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'leaderboard_entries'
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: streak {self.total_current_streak}, week {self.week_completions}"
+
+
+class FeedEntry(models.Model):
+    """
+    One activity item in a user's friend feed (timeline). Entries are written
+    to every friend's timeline when the activity happens (fan-out on write),
+    so reading a feed is a single index range scan on (owner, id).
+    """
+
+    VERB_CHOICES = [
+        ('completed', 'Completed'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=10, choices=VERB_CHOICES, default='completed')
+    habit_id = models.BigIntegerField()  # Plain id - the habit may be gone
+    habit_name = models.CharField(max_length=100)
+    habit_emoji = models.CharField(max_length=10, blank=True)
+    streak = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'feed_entries'
+        indexes = [
+            models.Index(fields=['owner', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}: {self.actor_id} {self.verb} {self.habit_name}"
+
+
+class LeafDollarEntry(models.Model):
+    """
+    Append-only ledger of leaf dollar balance changes. The sum of a user's
+    entries equals User.leaf_dollars (see the reconcile_leaf_dollars command).
+    """
+
+    REASON_CHOICES = [
+        ('opening_balance', 'Opening Balance'),
+        ('completion', 'Habit Completion'),
+        ('revive', 'Revive'),
+        ('reward_purchase', 'Reward Purchase'),
+        ('character_purchase', 'Character Purchase'),
+        ('admin', 'Admin Change'),
+        ('adjustment', 'Reconciliation Adjustment'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaf_dollar_entries')
+    amount = models.IntegerField()  # Positive for credits, negative for debits
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=100, blank=True)  # e.g. habit/reward id
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'leaf_dollar_ledger'
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.amount:+d} ({self.reason})"
+
+
+class UserDailyRollup(models.Model):
+    """
+    Per-user daily totals for calendar and heatmap views, maintained by the
+    log write paths (see algorithms.daily_rollup). Like the leaderboard, only
+    active habits count: completed and missed are the numbers of those habits
+    with a completed / not completed log on the day, total_active the number
+    of them created on or before the day.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    completed = models.IntegerField(default=0)
+    missed = models.IntegerField(default=0)
+    total_active = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'user_daily_rollup'
+        unique_together = ['user', 'date']
+
+    def __str__(self):
+        return f"{self.user_id} {self.date}: {self.completed}/{self.total_active}"
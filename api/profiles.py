@@ -0,0 +1,133 @@
+"""
+Public profile helpers
+
+Builds the public profiles friends can view (public habits with progress and
+unlocked characters) and friendship statuses for any number of users in a
+constant number of queries.
+"""
+from django.db.models import Count, Q
+from .models import Friend, Friendship, Habit, User, UserReward
+
+# Maximum number of users per batched profile request
+MAX_PROFILE_BATCH = 50
+
+
+def get_friend_ids(viewer, user_ids):
+    """
+    Get which of user_ids are accepted friends of viewer, in one query.
+
+    Args:
+        viewer: User instance
+        user_ids: Iterable of user ids
+
+    Returns:
+        set: Ids of accepted friends
+    """
+    return set(Friendship.objects.filter(
+        user=viewer,
+        friend_id__in=set(user_ids)
+    ).values_list('friend_id', flat=True))
+
+
+def get_friend_statuses(viewer, user_ids):
+    """
+    Get the friendship status between viewer and each of user_ids, in one query.
+
+    Statuses are 'accepted' (in either direction), 'pending' (request sent
+    by viewer) and 'received_pending' (request received by viewer); users
+    without such a relationship are left out.
+
+    Args:
+        viewer: User instance
+        user_ids: Iterable of user ids
+
+    Returns:
+        dict: user id -> status
+    """
+    user_ids = set(user_ids)
+    relationships = Friend.objects.filter(
+        Q(user=viewer, friend_id__in=user_ids) | Q(friend=viewer, user_id__in=user_ids),
+        status__in=['accepted', 'pending']
+    ).values_list('user_id', 'friend_id', 'status')
+
+    statuses = {}
+    for user_id, friend_id, friend_status in relationships:
+        if user_id == viewer.id:
+            other_id, pending_status = friend_id, 'pending'
+        else:
+            other_id, pending_status = user_id, 'received_pending'
+
+        if friend_status == 'accepted':
+            statuses[other_id] = 'accepted'
+        elif statuses.get(other_id) not in ('accepted', 'pending'):
+            # A sent request takes precedence over a received one
+            statuses[other_id] = pending_status
+
+    return statuses
+
+
+def get_public_profiles(viewer, user_ids):
+    """
+    Build public profiles for the users in user_ids that are friends of viewer.
+
+    Uses four queries regardless of the number of users or habits: the
+    friendship lookup, the users, their public habits with annotated
+    completion counts and their avatar rewards.
+
+    Args:
+        viewer: User instance viewing the profiles
+        user_ids: Iterable of user ids
+
+    Returns:
+        dict: user id -> {'user': User, 'public_habits': list, 'characters': list}
+              (users that are not friends of viewer are left out)
+    """
+    friend_ids = get_friend_ids(viewer, user_ids)
+    if not friend_ids:
+        return {}
+
+    profiles = {
+        user.id: {'user': user, 'public_habits': [], 'characters': []}
+        for user in User.objects.filter(id__in=friend_ids)
+    }
+
+    # Get public habits with current streaks
+    public_habits = Habit.objects.filter(
+        user_id__in=profiles,
+        is_public=True,
+        is_active=True
+    ).annotate(
+        completed_count=Count('logs', filter=Q(logs__status='completed'))
+    ).order_by('user_id', 'id')
+
+    for habit in public_habits:
+        # Calculate progress
+        progress = 0
+        if habit.duration_days and habit.duration_days > 0:
+            progress = round((habit.completed_count / habit.duration_days) * 100, 2)
+            progress = min(100, progress)
+
+        profiles[habit.user_id]['public_habits'].append({
+            'id': habit.id,
+            'name': habit.name,
+            'emoji': habit.emoji,
+            'current_streak': habit.current_streak or 0,
+            'progress': progress,
+        })
+
+    # Get users' characters (avatar rewards)
+    avatar_rewards = UserReward.objects.filter(
+        user_id__in=profiles,
+        reward__category='avatar'
+    ).values_list('user_id', 'reward__icon_url')
+
+    for user_id, icon_url in avatar_rewards:
+        # Get emoji from icon_url or use a default
+        profiles[user_id]['characters'].append(icon_url or '👤')
+
+    # If no characters from rewards, use avatar_url as fallback
+    for profile in profiles.values():
+        if not profile['characters'] and profile['user'].avatar_url:
+            profile['characters'].append(profile['user'].avatar_url)
+
+    return profiles
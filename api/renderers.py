@@ -0,0 +1,105 @@
+"""
+Fast JSON rendering
+
+FastJSONRenderer is a drop-in replacement for DRF's JSONRenderer that
+encodes with orjson when it is installed. Datetimes are passed to DRF's
+own JSONEncoder. Data orjson would render differently is rendered by
+JSONRenderer instead, so responses stay byte-for-byte identical: floats
+orjson writes in another notation (1e16 for 1e+16, 0.00001 for 1e-05),
+NaN and Infinity (null from orjson, an error from JSONRenderer), integers
+beyond 64 bits, dict keys that are not strings and values only the
+JSONEncoder handles (Decimal, QuerySets, ...).
+Without orjson, or when indented output is requested (browsable API,
+'application/json; indent=4'), it simply is JSONRenderer.
+"""
+from datetime import date, time, timedelta
+from itertools import chain
+from uuid import UUID
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+# Values orjson (or the JSONEncoder, for datetimes) writes like JSONRenderer
+EXACT_TYPES = (str, int, type(None), date, time, timedelta, UUID)
+
+
+def _renders_exactly(data):
+    """
+    Whether orjson renders data byte for byte like JSONRenderer.
+
+    Walks data one nesting level at a time and looks at the types present
+    on each level, so lists of flat dicts are checked without a Python
+    loop over their values. Integers beyond 64 bits and keys that are not
+    strings are left to orjson, which raises on them.
+
+    Args:
+        data: Data to render
+
+    Returns:
+        bool: False if data holds NaN, Infinity or a float outside
+        [1e-4, 1e16) (written in another notation by orjson), or a value
+        the JSONEncoder would have to convert
+    """
+    dicts, sequences = [], [(data,)]
+    while dicts or sequences:
+        values = list(chain(chain.from_iterable(map(dict.values, dicts)), chain.from_iterable(sequences)))
+        dicts, sequences = [], []
+        for kind in set(map(type, values)):
+            if issubclass(kind, EXACT_TYPES):
+                continue
+            if kind is float:
+                floats = [value for value in values if type(value) is float]
+                if not all(1e-4 <= abs(value) < 1e16 or value == 0.0 for value in floats):
+                    return False
+            elif issubclass(kind, dict):
+                dicts.extend(value for value in values if type(value) is kind)
+            elif issubclass(kind, (list, tuple)):
+                sequences.extend(value for value in values if type(value) is kind)
+            else:
+                return False
+    return True
+
+
+def json_dumps(data):
+    """
+    Encode data as compact JSON bytes, like FastJSONRenderer.
+
+    Args:
+        data: JSON-serializable data (or anything DRF's JSONEncoder handles)
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    return FastJSONRenderer().render(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson when available"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if not _renders_exactly(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits or keys that are not strings
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Like JSONRenderer, escape the separators JavaScript strings cannot contain
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -1,8 +1,8 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from .models import Habit, HabitLog, Streak, Reward, UserReward, Friend
+from .models import Habit, HabitLog, Streak, Reward, UserReward, Friend, FeedEntry, UserDailyRollup
+from .profiles import get_friend_statuses
 
 User = get_user_model()
 
@@ -81,6 +81,14 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'leaf_dollars', 'created_at', 'updated_at', 'last_login']
 
+    def update(self, instance, validated_data):
+        # Only write the submitted columns, so a profile edit can never
+        # overwrite a balance changed by a concurrent request
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
 
 class HabitLogSerializer(serializers.ModelSerializer):
     class Meta:
@@ -130,10 +138,22 @@ class HabitSerializer(serializers.ModelSerializer):
             'completion_percentage'
         ]
     
+    def update(self, instance, validated_data):
+        # Only write the submitted columns, so an edit can never overwrite
+        # a calendar or streak changed by a concurrent completion
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+    
     def get_today_completion(self, obj):
         """Get today's completion status"""
-        from .algorithms.habit_completion import get_today_completion
-        completion = get_today_completion(obj)
+        if hasattr(obj, 'today_logs'):
+            # Prefetched by annotate_completion_summary
+            completion = obj.today_logs[0] if obj.today_logs else None
+        else:
+            from .algorithms.habit_completion import get_today_completion
+            completion = get_today_completion(obj)
         if completion:
             return HabitLogSerializer(completion).data
         return None
@@ -147,8 +167,10 @@ class HabitSerializer(serializers.ModelSerializer):
         if not obj.duration_days or obj.duration_days == 0:
             return 0
         
-        # Count completed days (status='completed')
-        completed = obj.logs.filter(status='completed').count()
+        # Count completed days (status='completed'), annotated when listing
+        completed = getattr(obj, 'completed_count', None)
+        if completed is None:
+            completed = obj.logs.filter(status='completed').count()
         
         # Progress = completed days / total duration * 100
         progress = (completed / obj.duration_days) * 100
@@ -179,6 +201,60 @@ class HabitStatsSerializer(serializers.Serializer):
     last_completed_date = serializers.DateField(allow_null=True)
 
 
+class StreakRunSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    length_days = serializers.IntegerField()
+
+
+class RangeStreakStatsSerializer(serializers.Serializer):
+    start_date = serializers.DateField(allow_null=True)
+    end_date = serializers.DateField(allow_null=True)
+    total_days = serializers.IntegerField()
+    completed_days = serializers.IntegerField()
+    completion_rate = serializers.FloatField()
+    longest_streak = serializers.IntegerField()
+    runs = StreakRunSerializer(many=True)
+
+
+class LeaderboardUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'display_name', 'avatar_url']
+
+
+class GlobalLeaderboardRowSerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    user = LeaderboardUserSerializer()
+    score = serializers.IntegerField()
+
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    user = LeaderboardUserSerializer()
+    total_current_streak = serializers.IntegerField()
+    week_completions = serializers.IntegerField()
+    leaf_dollars = serializers.IntegerField()
+    is_me = serializers.BooleanField()
+
+
+class FeedEntrySerializer(serializers.ModelSerializer):
+    actor = LeaderboardUserSerializer(read_only=True)
+    
+    class Meta:
+        model = FeedEntry
+        fields = [
+            'id', 'actor', 'verb', 'habit_id', 'habit_name', 'habit_emoji',
+            'streak', 'created_at'
+        ]
+
+
+class DailyRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserDailyRollup
+        fields = ['date', 'completed', 'missed', 'total_active']
+
+
 class StreakSerializer(serializers.ModelSerializer):
     class Meta:
         model = Streak
@@ -245,17 +321,23 @@ class UserSearchSerializer(serializers.ModelSerializer):
             'is_friend', 'friend_status'
         ]
     
+    def _get_friend_status(self, obj):
+        """
+        Friendship status between the current user and obj. Views pass the
+        statuses of all results as context['friend_statuses'] (see
+        profiles.get_friend_statuses); otherwise it is loaded per instance.
+        """
+        if 'friend_statuses' in self.context:
+            return self.context['friend_statuses'].get(obj.id)
+        return get_friend_statuses(self.context['request'].user, [obj.id]).get(obj.id)
+    
     def get_is_friend(self, obj):
         """Check if current user is friends with this user"""
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
         
-        # Check if there's an accepted friendship
-        return Friend.objects.filter(
-            (Q(user=request.user, friend=obj) | Q(user=obj, friend=request.user)),
-            status='accepted'
-        ).exists()
+        return self._get_friend_status(obj) == 'accepted'
     
     def get_friend_status(self, obj):
         """Get the friend request status"""
@@ -263,23 +345,5 @@ class UserSearchSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return None
         
-        # Check for accepted friendship
-        accepted = Friend.objects.filter(
-            (Q(user=request.user, friend=obj) | Q(user=obj, friend=request.user)),
-            status='accepted'
-        ).first()
-        if accepted:
-            return 'accepted'
-        
-        # Check for pending request sent by current user
-        sent = Friend.objects.filter(user=request.user, friend=obj, status='pending').first()
-        if sent:
-            return 'pending'
-        
-        # Check for pending request received by current user
-        received = Friend.objects.filter(user=obj, friend=request.user, status='pending').first()
-        if received:
-            return 'received_pending'
-        
-        return None
+        return self._get_friend_status(obj)
 
@@ -0,0 +1,276 @@
+"""
+Log synchronization helpers
+
+Builds the habit log sync documents sent to the frontend on login: the full
+all_logs document and cursor-based deltas of what changed since the last sync.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from .models import Habit, HabitLog, SyncTombstone
+from .algorithms.completion_calendar import year_bitmaps
+from .algorithms.habit_completion import annotate_completion_summary
+from .renderers import json_dumps
+
+# Number of log rows fetched per cursor round-trip and encoded per chunk
+SYNC_CHUNK_SIZE = 2000
+
+# Rows updated shortly before a cursor are sent again, so writes whose
+# transaction committed after the previous sync read are not missed
+SYNC_CURSOR_OVERLAP = timedelta(seconds=30)
+
+# Tombstones older than this are pruned; older cursors get a full resync
+SYNC_TOMBSTONE_RETENTION = timedelta(days=90)
+
+
+def sync_log_entry(habit_id, log_date, status, amount_done):
+    """Format a single log the way the frontend log store expects it"""
+    return {
+        'habit_id': habit_id,
+        'date': log_date.isoformat(),
+        'completed': status == 'completed',
+        'status': status,
+        'amount_done': float(amount_done) if amount_done else None,
+    }
+
+
+def stream_sync_document(fields, rows):
+    """
+    Yield a JSON object of some fields plus a streamed 'logs' list.
+    
+    Log rows are encoded chunk by chunk, each chunk with a single
+    json_dumps call, so memory use does not grow with the number of logs.
+    The other fields come first so clients can read them before the logs
+    arrive.
+    
+    Args:
+        fields: Dict of the document's other (small) fields
+        rows: QuerySet of (habit_id, log_date, status, amount_done) tuples
+        
+    Yields:
+        bytes: Consecutive pieces of the JSON document
+    """
+    header = json_dumps(fields)
+    yield header[:-1] + (b',"logs":[' if fields else b'"logs":[')
+    
+    chunk = []
+    separator = b''
+    for row in rows.iterator(chunk_size=SYNC_CHUNK_SIZE):
+        chunk.append(sync_log_entry(*row))
+        if len(chunk) == SYNC_CHUNK_SIZE:
+            # Encode the chunk as a list and drop its brackets
+            yield separator + json_dumps(chunk)[1:-1]
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + json_dumps(chunk)[1:-1]
+    
+    yield b']}'
+
+
+def stream_all_logs(user):
+    """
+    Yield the all_logs sync document for a user as JSON byte chunks.
+    
+    All logs of the user's active habits are read through a single joined
+    query iterated with a server-side cursor (see stream_sync_document).
+    
+    Args:
+        user: User instance
+        
+    Yields:
+        bytes: Consecutive pieces of the JSON document
+    """
+    rows = HabitLog.objects.filter(
+        habit__user=user,
+        habit__is_active=True
+    ).order_by('habit_id', 'log_date').values_list(
+        'habit_id', 'log_date', 'status', 'amount_done'
+    )
+    
+    return stream_sync_document({
+        'leaf_dollars': user.leaf_dollars,
+        'unlocked_characters': user.unlocked_characters or [],
+        'selected_character': user.selected_character,
+    }, rows)
+
+
+def _encode_bitmap(bits):
+    """Base64 of a bitmap's little-endian bytes (trailing zero bytes left out)"""
+    return base64.b64encode(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')).decode()
+
+
+def get_log_bitmaps(habits):
+    """
+    Build the compact ('bitmap' mode) log history of some habits.
+    
+    Completed and missed days come straight from each habit's completion
+    calendar as one pair of base64 bitmaps per year: bit i of the
+    little-endian bytes is day i of the year (January 1st is bit 0), and
+    missed covers every log that is not completed. Only logs the bitmaps
+    cannot describe - with an amount, a note or a status other than
+    completed/missed - are read, into a sparse per-habit details list.
+    
+    Args:
+        habits: Habit instances (calendar fields loaded)
+        
+    Returns:
+        list: One {'habit_id', 'years': {year: {'completed', 'missed'}}, 'details'} per habit
+    """
+    habits = list(habits)
+    
+    details = {}
+    rows = HabitLog.objects.filter(habit__in=habits).filter(
+        Q(amount_done__isnull=False) | ~Q(note='') | ~Q(status__in=['completed', 'missed'])
+    ).order_by('habit_id', 'log_date').values_list('habit_id', 'log_date', 'status', 'amount_done', 'note')
+    for habit_id, log_date, status, amount_done, note in rows:
+        details.setdefault(habit_id, []).append({
+            'date': log_date.isoformat(),
+            'status': status,
+            'amount_done': float(amount_done) if amount_done is not None else None,
+            'note': note,
+        })
+    
+    return [
+        {
+            'habit_id': habit.id,
+            'years': {
+                str(year): {'completed': _encode_bitmap(completed), 'missed': _encode_bitmap(missed)}
+                for year, (completed, missed) in year_bitmaps(habit).items()
+            },
+            'details': details.get(habit.id, []),
+        }
+        for habit in habits
+    ]
+
+
+def get_all_log_bitmaps(user):
+    """
+    Build the all_logs sync document in compact ('bitmap') mode.
+    
+    Args:
+        user: User instance
+        
+    Returns:
+        dict: The user fields of the all_logs document plus 'encoding' and
+              'habits' (see get_log_bitmaps) for the user's active habits
+    """
+    habits = Habit.objects.filter(user=user, is_active=True).order_by('id').only(
+        'id', 'created_at', 'calendar_start', 'completed_bitmap', 'missed_bitmap'
+    )
+    return {
+        'leaf_dollars': user.leaf_dollars,
+        'unlocked_characters': user.unlocked_characters or [],
+        'selected_character': user.selected_character,
+        'encoding': 'bitmap',
+        'habits': get_log_bitmaps(habits),
+    }
+
+
+def encode_sync_cursor(timestamp):
+    """Encode a sync timestamp as an opaque cursor string"""
+    payload = json.dumps({'v': 1, 't': timestamp.isoformat()})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_sync_cursor(cursor):
+    """
+    Decode a cursor created by encode_sync_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = datetime.fromisoformat(payload['t'])
+    except (TypeError, KeyError, json.JSONDecodeError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f'Invalid sync cursor: {e}')
+    if timezone.is_naive(timestamp):
+        raise ValueError('Invalid sync cursor: missing timezone')
+    return timestamp
+
+
+def record_tombstone(user_id, kind, object_id, habit_id, log_date=None):
+    """
+    Record a deleted habit or log for delta sync.
+    
+    Args:
+        user_id: Owner of the deleted row
+        kind: 'habit' or 'habit_log'
+        object_id: ID of the deleted row
+        habit_id: Habit the row belonged to (the habit itself for 'habit')
+        log_date: Date of the deleted log (for 'habit_log')
+    """
+    return SyncTombstone.objects.create(
+        user_id=user_id,
+        kind=kind,
+        object_id=object_id,
+        habit_id=habit_id,
+        log_date=log_date
+    )
+
+
+def get_sync_delta(user, cursor=None):
+    """
+    Get habits, logs and deletes changed since a sync cursor.
+    
+    Changes are found through the updated_at columns (and tombstones for
+    deletes). Clients drop the logs of deactivated habits, so all logs of a
+    habit activated again since the cursor are sent. Without a cursor, or with one older than the tombstone
+    retention, everything is returned with reset=True and the client should
+    replace its local state. Logs are returned as a lazy QuerySet of rows,
+    so a reset can be streamed with stream_sync_document.
+    
+    Args:
+        user: User instance
+        cursor: Cursor returned by the previous sync (optional)
+        
+    Returns:
+        dict: {'cursor', 'reset', 'habits', 'logs', 'deleted_habits', 'deleted_logs'}
+            where habits is a Habit QuerySet, logs a QuerySet of
+            (habit_id, log_date, status, amount_done) tuples and the rest plain data
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    now = timezone.now()
+    since = decode_sync_cursor(cursor) if cursor else None
+    reset = since is None or since < now - SYNC_TOMBSTONE_RETENTION
+    
+    # Opportunistically drop this user's expired tombstones
+    user.sync_tombstones.filter(deleted_at__lt=now - SYNC_TOMBSTONE_RETENTION).delete()
+    
+    habits = Habit.objects.filter(user=user)
+    logs = HabitLog.objects.filter(habit__user=user, habit__is_active=True)
+    deleted_habits = []
+    deleted_logs = []
+    
+    if reset:
+        habits = habits.filter(is_active=True)
+    else:
+        changed_since = since - SYNC_CURSOR_OVERLAP
+        # Deactivated habits are included so the client can drop them
+        habits = habits.filter(updated_at__gt=changed_since)
+        logs = logs.filter(Q(updated_at__gt=changed_since) | Q(habit__activated_at__gt=changed_since))
+        
+        tombstones = user.sync_tombstones.filter(
+            deleted_at__gt=changed_since
+        ).values_list('kind', 'habit_id', 'log_date')
+        for kind, habit_id, log_date in tombstones:
+            if kind == 'habit':
+                deleted_habits.append(habit_id)
+            else:
+                deleted_logs.append({'habit_id': habit_id, 'date': log_date.isoformat()})
+    
+    return {
+        'cursor': encode_sync_cursor(now),
+        'reset': reset,
+        'habits': annotate_completion_summary(habits.order_by('id')),
+        'logs': logs.order_by('habit_id', 'log_date').values_list(
+            'habit_id', 'log_date', 'status', 'amount_done'
+        ),
+        'deleted_habits': deleted_habits,
+        'deleted_logs': deleted_logs,
+    }
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.algorithms.daily_rollup import refresh_daily_rollups
+from api.models import Habit, HabitLog, User, UserDailyRollup
+
+
+class DailyRollupBackfillMigrationTests(TransactionTestCase):
+    """Migration 0015 writes rollup rows for existing logs"""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('api', target)])
+        return executor.loader.project_state([('api', target)]).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('api')[0][1])
+
+    def test_existing_logs_get_rollups(self):
+        apps = self.migrate('0014_leaf_dollar_ledger')
+        User = apps.get_model('api', 'User')
+        Habit = apps.get_model('api', 'Habit')
+        HabitLog = apps.get_model('api', 'HabitLog')
+
+        today = timezone.now().date()
+        user = User.objects.create(username='historian', email='historian@example.com')
+        reading = Habit.objects.create(user=user, name='read')
+        running = Habit.objects.create(user=user, name='run')
+        dropped = Habit.objects.create(user=user, name='old', is_active=False)
+        Habit.objects.filter(id__in=[reading.id, dropped.id]).update(created_at=timezone.now() - timedelta(days=5))
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=habit, log_date=today - timedelta(days=day), status=status)
+            for habit, day, status in [
+                (reading, 3, 'completed'), (reading, 0, 'missed'),
+                (running, 0, 'completed'), (dropped, 3, 'completed'),
+            ]
+        ])
+
+        apps = self.migrate('0015_user_daily_rollup')
+        rollups = {
+            rollup.date: (rollup.completed, rollup.missed, rollup.total_active)
+            for rollup in apps.get_model('api', 'UserDailyRollup').objects.filter(user_id=user.id)
+        }
+
+        self.assertEqual(rollups, {
+            today - timedelta(days=3): (1, 0, 1),
+            today: (1, 1, 2),
+        })
+
+
+class CalendarViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='planner', email='planner@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_month_must_be_between_1_and_12(self):
+        for month in ['0', '13', '-1', 'may']:
+            response = self.client.get('/api/users/calendar/', {'year': 2026, 'month': month})
+            self.assertEqual(response.status_code, 400, month)
+
+    def test_month_and_year_ranges(self):
+        habit = Habit.objects.create(user=self.user, name='stretch')
+        today = timezone.now().date()
+        HabitLog.objects.create(habit=habit, log_date=today, status='completed')
+        refresh_daily_rollups([self.user.id])
+
+        response = self.client.get('/api/users/calendar/', {'year': today.year, 'month': today.month})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['start_date'], today.replace(day=1))
+        self.assertEqual(response.data['total_completed'], 1)
+
+        response = self.client.get('/api/users/calendar/', {'year': today.year})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['month'])
+        self.assertEqual(response.data['end_date'], today.replace(month=12, day=31))
+        self.assertEqual(UserDailyRollup.objects.filter(user=self.user).count(), 1)
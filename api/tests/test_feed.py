@@ -0,0 +1,71 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.feed import fan_out_completion
+from api.models import FeedEntry, Friend, Habit, User
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@example.com')
+        self.bob = User.objects.create(username='bob', email='bob@example.com')
+        self.carol = User.objects.create(username='carol', email='carol@example.com')
+        Friend.objects.create(user=self.alice, friend=self.bob, status='accepted')
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def get_feed(self, **params):
+        response = self.client.get('/api/friends/feed/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_friend_completion_appears_in_feed(self):
+        habit = Habit.objects.create(user=self.alice, name='run', emoji='🏃', is_public=True)
+        private = Habit.objects.create(user=self.alice, name='diary', is_public=False)
+        client = APIClient()
+        client.force_authenticate(self.alice)
+
+        client.post(f'/api/habits/{habit.id}/complete/', {}, format='json')
+        client.post(f'/api/habits/{private.id}/complete/', {}, format='json')
+
+        entries = self.get_feed()['entries']
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['actor']['id'], self.alice.id)
+        self.assertEqual(entries[0]['habit_id'], habit.id)
+        self.assertEqual(entries[0]['habit_name'], 'run')
+        self.assertEqual(entries[0]['streak'], 1)
+        # Only friends get the entry
+        self.assertFalse(FeedEntry.objects.filter(owner__in=[self.alice, self.carol]).exists())
+
+    @override_settings(FEED_TIMELINE_CAP=5)
+    def test_first_page_trims_timeline_to_cap(self):
+        habit = Habit.objects.create(user=self.alice, name='run', is_public=True)
+        for _ in range(8):
+            fan_out_completion(habit)
+        newest = list(FeedEntry.objects.filter(owner=self.bob).order_by('-id').values_list('id', flat=True))[:5]
+
+        self.get_feed(limit=2)
+
+        self.assertEqual(list(FeedEntry.objects.filter(owner=self.bob).order_by('-id').values_list('id', flat=True)), newest)
+
+    def test_cursor_pages_have_no_duplicates_or_gaps(self):
+        habit = Habit.objects.create(user=self.alice, name='run', is_public=True)
+        for _ in range(7):
+            fan_out_completion(habit)
+        expected = list(FeedEntry.objects.filter(owner=self.bob).order_by('-id').values_list('id', flat=True))
+
+        seen = []
+        page = self.get_feed(limit=3)
+        seen.extend(entry['id'] for entry in page['entries'])
+        # A newer entry arriving between pages does not shift the later pages
+        fan_out_completion(habit)
+        while page['next_cursor'] is not None:
+            page = self.get_feed(limit=3, before=page['next_cursor'])
+            seen.extend(entry['id'] for entry in page['entries'])
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/friends/feed/', {'before': 'x'})
+        self.assertEqual(response.status_code, 400)
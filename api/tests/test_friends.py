@@ -0,0 +1,59 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.models import Friend, Friendship, User
+
+
+class FriendViewSetTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@example.com')
+        self.bob = User.objects.create(username='bob', email='bob@example.com')
+        self.carol = User.objects.create(username='carol', email='carol@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def send_request(self, friend):
+        return self.client.post('/api/friends/send_request/', {'friend_id': friend.id}, format='json')
+
+    def test_list_returns_accepted_friendships(self):
+        Friend.objects.create(user=self.bob, friend=self.alice, status='accepted')
+        Friend.objects.create(user=self.alice, friend=self.carol, status='pending')
+
+        response = self.client.get('/api/friends/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['user']['id'] for row in response.data['results']], [self.bob.id])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/friends/')
+        self.assertNotIn(' OR ', ' '.join(query['sql'] for query in queries))
+
+    def test_send_request_states(self):
+        response = self.send_request(self.bob)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.send_request(self.bob).data['error'], 'Friend request already sent')
+
+        # Bob sending back accepts the pending request
+        self.client.force_authenticate(self.bob)
+        response = self.send_request(self.alice)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'accepted')
+        self.assertTrue(Friendship.objects.filter(user=self.alice, friend=self.bob).exists())
+        self.assertEqual(self.send_request(self.alice).data['error'], 'You are already friends')
+
+    def test_send_request_looks_up_both_directions_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.send_request(self.bob)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        # The friend's user row and the existing requests
+        self.assertEqual(len(selects), 2)
+
+    def test_accept_incoming_request(self):
+        request = Friend.objects.create(user=self.carol, friend=self.alice, status='pending')
+
+        response = self.client.post(f'/api/friends/{request.id}/accept/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Friendship.objects.filter(user=self.alice, friend=self.carol).exists())
@@ -0,0 +1,181 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.algorithms.completion_calendar import calendar_status, rebuild_calendar
+from api.algorithms.daily_rollup import refresh_daily_rollups
+from api.algorithms.habit_completion import mark_habit_complete, mark_habits_complete
+from api.algorithms.leaderboard import refresh_leaderboard_entries
+from api.algorithms.streak_calculator import update_streak
+from api.models import FeedEntry, Friend, Habit, HabitLog, LeaderboardEntry, LeafDollarEntry, User, UserDailyRollup
+
+# Statements written by one completion: log upsert, streak extension,
+# habit columns, daily rollup upsert, balance, ledger entry, leaderboard entry
+COMPLETION_WRITES = 7
+# ... after the habit row is locked and its calendar read again
+COMPLETION_LOCKS = 1
+
+
+class MarkHabitCompleteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='completer', email='completer@example.com')
+        self.habit = Habit.objects.create(user=self.user, name='read')
+        today = timezone.now().date()
+        # A streak that ended yesterday, so today extends it
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=self.habit, log_date=today - timedelta(days=day), status='completed')
+            for day in range(1, 4)
+        ])
+        rebuild_calendar(self.habit)
+        update_streak(self.habit)
+        self.habit.save()
+        refresh_daily_rollups([self.user.id])
+        refresh_leaderboard_entries([self.user.id])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def statements(self, queries):
+        return [
+            query['sql'] for query in queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+
+    def test_completion_statement_budget(self):
+        habit = Habit.objects.select_related('user').get(pk=self.habit.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = mark_habit_complete(habit, amount_done='2.5')
+
+        statements = self.statements(queries)
+        self.assertEqual(len(statements), COMPLETION_LOCKS + COMPLETION_WRITES, '\n'.join(statements))
+        lock, writes = statements[0], statements[1:]
+        self.assertIn('"habits"', lock)
+        if connection.features.has_select_for_update:
+            self.assertIn('FOR UPDATE', lock)
+        self.assertFalse([sql for sql in writes if sql.lstrip().startswith('SELECT')])
+
+        log = result['completion']
+        self.assertEqual(log, HabitLog.objects.get(habit=self.habit, log_date=timezone.now().date()))
+        self.assertEqual(log.amount_done, Decimal('2.50'))
+        self.assertEqual(log.created_at, HabitLog.objects.get(pk=log.pk).created_at)
+        self.assertEqual(result['new_streak'], 4)
+
+    def test_complete_endpoint_query_budget(self):
+        # get_object (with today's status), the lock, the completion writes
+        # and the SAVEPOINT/RELEASE its transaction becomes inside the test case
+        with self.assertNumQueries(1 + COMPLETION_LOCKS + COMPLETION_WRITES + 2):
+            response = self.client.post(f'/api/habits/{self.habit.id}/complete/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_completion_updates_derived_tables(self):
+        today = timezone.now().date()
+        balance = self.user.leaf_dollars
+
+        self.client.post(f'/api/habits/{self.habit.id}/complete/', {}, format='json')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.leaf_dollars, balance + 1)
+        self.assertTrue(LeafDollarEntry.objects.filter(user=self.user, reason='completion', amount=1).exists())
+
+        entry = LeaderboardEntry.objects.get(user=self.user)
+        self.assertEqual((entry.total_current_streak, entry.total_completions), (4, 4))
+
+        incremental = list(UserDailyRollup.objects.filter(user=self.user).values_list('date', 'completed', 'missed', 'total_active'))
+        refresh_daily_rollups([self.user.id])
+        recomputed = list(UserDailyRollup.objects.filter(user=self.user).values_list('date', 'completed', 'missed', 'total_active'))
+        self.assertEqual(sorted(incremental), sorted(recomputed))
+        self.assertIn((today, 1, 0, 1), recomputed)
+
+    def test_second_completion_is_not_rewarded(self):
+        self.client.post(f'/api/habits/{self.habit.id}/complete/', {}, format='json')
+        habit = Habit.objects.select_related('user').get(pk=self.habit.pk)
+        habit.last_completed_date = None
+
+        result = mark_habit_complete(habit)
+
+        self.assertTrue(result['already_completed'])
+        self.assertEqual(LeafDollarEntry.objects.filter(user=self.user, reason='completion').count(), 1)
+
+
+class StaleCalendarTests(TestCase):
+    """Calendar writers work on the row read under lock, not on a stale instance"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='racer', email='racer@example.com', leaf_dollars=50)
+        self.habit = Habit.objects.create(user=self.user, name='swim')
+        Habit.objects.filter(id=self.habit.id).update(created_at=timezone.now() - timedelta(days=10))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_completion_keeps_a_concurrent_revive(self):
+        today = timezone.now().date()
+        stale = Habit.objects.select_related('user').get(pk=self.habit.pk)
+
+        response = self.client.post(
+            f'/api/habits/{self.habit.id}/revive/', {'date': (today - timedelta(days=1)).isoformat()}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        result = mark_habit_complete(stale)
+
+        habit = Habit.objects.get(pk=self.habit.pk)
+        self.assertEqual(calendar_status(habit, today - timedelta(days=1)), 'completed')
+        self.assertEqual(calendar_status(habit, today), 'completed')
+        self.assertEqual((result['new_streak'], habit.current_streak), (2, 2))
+
+    def test_habit_edit_writes_only_the_submitted_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/habits/{self.habit.id}/', {'name': 'swim more'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "habits"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('bitmap', updates[0])
+        self.assertNotIn('current_streak', updates[0])
+
+
+class MarkHabitsCompleteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='batcher', email='batcher@example.com')
+        self.habits = [Habit.objects.create(user=self.user, name=f'habit {i}', is_public=True) for i in range(3)]
+        for i in range(2):
+            friend = User.objects.create(username=f'friend{i}', email=f'friend{i}@example.com')
+            Friend.objects.create(user=self.user, friend=friend, status='accepted')
+        refresh_leaderboard_entries([self.user.id])
+
+    def test_logs_completed_concurrently_are_not_rewarded_again(self):
+        today = timezone.now().date()
+        # Completed by another request after these habits passed check_can_complete
+        stale = list(Habit.objects.filter(user=self.user).order_by('id'))
+        mark_habit_complete(Habit.objects.select_related('user').get(pk=self.habits[0].pk))
+        balance = User.objects.get(pk=self.user.pk).leaf_dollars
+
+        results = mark_habits_complete(User.objects.get(pk=self.user.pk), stale)
+
+        self.assertTrue(results[self.habits[0].id]['already_completed'])
+        self.assertEqual(results[self.habits[0].id]['leaf_dollars_earned'], 0)
+        self.assertEqual(results[self.habits[0].id]['completion'], HabitLog.objects.get(habit=self.habits[0], log_date=today))
+        self.assertEqual([results[habit.id]['leaf_dollars_earned'] for habit in self.habits[1:]], [1, 1])
+
+        self.assertEqual(User.objects.get(pk=self.user.pk).leaf_dollars, balance + 2)
+        self.assertEqual(LeafDollarEntry.objects.filter(user=self.user, reason='completion').count(), 3)
+        entry = LeaderboardEntry.objects.get(user=self.user)
+        self.assertEqual((entry.total_current_streak, entry.total_completions, entry.week_completions), (3, 3, 3))
+        self.assertEqual(FeedEntry.objects.filter(habit_id=self.habits[0].id).count(), 2)
+        self.assertEqual(UserDailyRollup.objects.get(user=self.user, date=today).completed, 3)
+
+    def test_friends_are_read_once_per_batch(self):
+        habits = list(Habit.objects.filter(user=self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            mark_habits_complete(self.user, habits)
+
+        friend_reads = [query['sql'] for query in queries if 'FROM "friendships"' in query['sql']]
+        self.assertEqual(len(friend_reads), 1, friend_reads)
+        self.assertEqual(FeedEntry.objects.filter(actor=self.user).count(), 6)
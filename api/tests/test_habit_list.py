@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Habit, HabitLog, User
+
+
+class HabitListQueryTests(TestCase):
+    """GET /api/habits/ runs a constant number of queries"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='lister', email='lister@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_habits(self, count):
+        today = timezone.now().date()
+        for i in range(count):
+            habit = Habit.objects.create(user=self.user, name=f'habit {i}', duration_days=30)
+            HabitLog.objects.bulk_create([
+                HabitLog(habit=habit, log_date=today - timedelta(days=day), status='completed' if day % 3 else 'missed')
+                for day in range(10)
+            ])
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/habits/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_query_count_does_not_depend_on_habit_count(self):
+        self.add_habits(1)
+        one_habit_queries, data = self.list_queries()
+        self.assertEqual(data['count'], 1)
+
+        self.add_habits(20)
+        many_habits_queries, data = self.list_queries()
+        self.assertEqual(data['count'], 21)
+
+        self.assertEqual(many_habits_queries, one_habit_queries)
+        # COUNT for pagination, the annotated habits and the prefetched today's logs
+        self.assertLessEqual(many_habits_queries, 3)
+
+    def test_serializes_prefetched_summary(self):
+        self.add_habits(1)
+        _, data = self.list_queries()
+        habit = data['results'][0]
+        # 10 logs, days 0, 3, 6 and 9 missed
+        self.assertEqual(habit['completion_percentage'], round(6 / 30 * 100, 2))
+        self.assertEqual(habit['today_completion']['status'], 'missed')
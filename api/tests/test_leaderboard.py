@@ -0,0 +1,154 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.algorithms.global_leaderboard import drop_deleted_entry, global_leaderboard
+from api.algorithms.leaderboard import get_week_start, record_leaderboard_change, refresh_leaderboard_entries
+from api.models import Habit, HabitLog, LeaderboardEntry, User
+
+
+class LeaderboardBackfillMigrationTests(TransactionTestCase):
+    """Migrations 0011/0012 write leaderboard entries for existing users"""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('api', target)])
+        return executor.loader.project_state([('api', target)]).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('api')[0][1])
+
+    def test_existing_users_get_entries(self):
+        apps = self.migrate('0010_friendship_edges')
+        User = apps.get_model('api', 'User')
+        Habit = apps.get_model('api', 'Habit')
+        HabitLog = apps.get_model('api', 'HabitLog')
+
+        today = timezone.now().date()
+        active = User.objects.create(username='active', email='active@example.com')
+        idle = User.objects.create(username='idle', email='idle@example.com')
+        habit = Habit.objects.create(user=active, name='read', current_streak=3)
+        Habit.objects.create(user=active, name='old', current_streak=5, is_active=False)
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=habit, log_date=today - timedelta(days=day), status='completed')
+            for day in range(3)
+        ] + [HabitLog(habit=habit, log_date=today - timedelta(days=30), status='completed')])
+
+        apps = self.migrate('0012_leaderboard_total_completions')
+        entries = {
+            entry.user_id: entry
+            for entry in apps.get_model('api', 'LeaderboardEntry').objects.all()
+        }
+
+        self.assertEqual(set(entries), {active.id, idle.id})
+        self.assertEqual(entries[active.id].total_current_streak, 3)
+        self.assertEqual(entries[active.id].total_completions, 4)
+        self.assertEqual(entries[active.id].week_completions, min(3, today.weekday() + 1))
+        self.assertEqual(entries[idle.id].total_current_streak, 0)
+        self.assertEqual(entries[idle.id].total_completions, 0)
+
+
+class GlobalLeaderboardTests(TransactionTestCase):
+
+    def setUp(self):
+        self.users = [
+            User.objects.create(username=f'user{i}', email=f'user{i}@example.com') for i in range(3)
+        ]
+        for user, streak in zip(self.users, [5, 3, 1]):
+            LeaderboardEntry.objects.filter(user=user).update(total_current_streak=streak)
+        global_leaderboard.rebuild()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[2])
+
+    def test_new_users_are_ranked(self):
+        user = User.objects.create(username='newcomer', email='newcomer@example.com')
+        global_leaderboard.rebuild()
+        self.assertEqual(global_leaderboard.rank('streak', user.id), (4, 0))
+
+    def test_deleted_users_leave_the_index(self):
+        deleted_id = self.users[0].id
+        self.assertEqual(global_leaderboard.rank('streak', deleted_id), (1, 5))
+        self.users[0].delete()
+
+        self.assertEqual(global_leaderboard.rank('streak', deleted_id), (None, None))
+        self.assertEqual(global_leaderboard.rank('streak', self.users[2].id), (2, 1))
+
+    def test_changes_reach_the_index_only_when_committed(self):
+        user_id = self.users[2].id
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                record_leaderboard_change(user_id, streak_delta=10)
+                raise RuntimeError
+        self.assertEqual(global_leaderboard.rank('streak', user_id), (3, 1))
+
+        with transaction.atomic():
+            record_leaderboard_change(user_id, streak_delta=10)
+            self.assertEqual(global_leaderboard.rank('streak', user_id), (3, 1))
+        self.assertEqual(global_leaderboard.rank('streak', user_id), (1, 11))
+
+    def test_users_deleted_elsewhere_are_dropped_on_read(self):
+        deleted_id = self.users[0].id
+        # Deleted by another process: this process' handler does not run
+        post_delete.disconnect(drop_deleted_entry, sender=LeaderboardEntry)
+        try:
+            self.users[0].delete()
+        finally:
+            post_delete.connect(drop_deleted_entry, sender=LeaderboardEntry)
+        self.assertEqual(global_leaderboard.rank('streak', deleted_id), (1, 5))
+
+        response = self.client.get('/api/users/leaderboard/')
+
+        self.assertEqual([row['user']['id'] for row in response.data['top']], [self.users[1].id, self.users[2].id])
+        self.assertEqual(response.data['top'][0]['rank'], 1)
+        self.assertEqual(response.data['me'], {'rank': 2, 'score': 1})
+        self.assertEqual(global_leaderboard.rank('streak', deleted_id), (None, None))
+
+
+class ReviveLeaderboardTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reviver', email='reviver@example.com', leaf_dollars=50)
+        self.habit = Habit.objects.create(user=self.user, name='walk')
+        Habit.objects.filter(id=self.habit.id).update(created_at=timezone.now() - timedelta(days=30))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def revive(self, day):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/habits/{self.habit.id}/revive/', {'date': day.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return LeaderboardEntry.objects.get(user=self.user)
+
+    def assertMatchesRefresh(self, entry):
+        self.assertEqual(global_leaderboard.rank('completions', self.user.id)[1], entry.total_completions)
+        refresh_leaderboard_entries([self.user.id])
+        refreshed = LeaderboardEntry.objects.get(user=self.user)
+        self.assertEqual(
+            (entry.total_completions, entry.week_completions),
+            (refreshed.total_completions, refreshed.week_completions)
+        )
+
+    def test_revive_before_this_week_counts_only_in_total(self):
+        today = timezone.now().date()
+        entry = self.revive(get_week_start(today) - timedelta(days=1))
+
+        self.assertEqual(entry.total_completions, 1)
+        self.assertEqual(entry.week_completions, 0)
+        self.assertMatchesRefresh(entry)
+
+    def test_revive_this_week_counts_in_both(self):
+        today = timezone.now().date()
+        if today == get_week_start(today):
+            self.skipTest('no earlier day this week')
+        entry = self.revive(today - timedelta(days=1))
+
+        self.assertEqual(entry.total_completions, 1)
+        self.assertEqual(entry.week_completions, 1)
+        self.assertEqual(HabitLog.objects.get(habit=self.habit).status, 'completed')
+        self.assertMatchesRefresh(entry)
@@ -0,0 +1,73 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import TransactionTestCase
+
+from api.algorithms.habit_completion import mark_habit_complete
+from api.algorithms.leaf_dollars import debit_leaf_dollars
+from api.models import Habit, HabitLog, LeafDollarEntry, User
+
+THREADS = 8
+COMPLETIONS = 40
+PURCHASES = 80
+COST = 3
+
+
+class ConcurrentLeafDollarTests(TransactionTestCase):
+    """Concurrent completions and purchases on one user lose no balance updates"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='hammered', email='hammered@example.com', leaf_dollars=50)
+        Habit.objects.bulk_create([Habit(user=self.user, name=f'habit {i}') for i in range(COMPLETIONS)])
+
+    def run_operation(self, task):
+        kind, key = task
+        try:
+            if kind == 'complete':
+                habit = Habit.objects.select_related('user').get(id=key)
+                return kind, mark_habit_complete(habit)['leaf_dollars_earned']
+            buyer = User.objects.get(id=self.user.id)
+            return kind, debit_leaf_dollars(buyer, COST, 'character_purchase', f'purchase-{key}')
+        except OperationalError as e:
+            # SQLite's shared-cache test database refuses some concurrent
+            # writers ("table is locked"); those roll back like failed requests
+            if connection.vendor != 'sqlite':
+                raise
+            return 'error', repr(e)
+        finally:
+            connection.close()
+
+    def test_completions_and_purchases_from_many_threads(self):
+        tasks = [('complete', habit_id) for habit_id in self.user.habits.values_list('id', flat=True)]
+        tasks += [('purchase', i) for i in range(PURCHASES)]
+        random.Random(20).shuffle(tasks)
+
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            results = list(pool.map(self.run_operation, tasks))
+
+        self.assertTrue(any(kind == 'complete' for kind, _ in results))
+        self.assertTrue(any(kind == 'purchase' and value for kind, value in results))
+
+        self.user.refresh_from_db(fields=['leaf_dollars'])
+        entries = LeafDollarEntry.objects.filter(user=self.user)
+        completions = entries.filter(reason='completion')
+        purchases = entries.filter(reason='character_purchase')
+
+        # Every committed change is in the ledger and in the balance
+        self.assertEqual(self.user.leaf_dollars, entries.aggregate(total=Sum('amount'))['total'])
+        self.assertEqual(self.user.leaf_dollars, 50 + completions.count() - COST * purchases.count())
+        self.assertGreaterEqual(self.user.leaf_dollars, 0)
+        # ... and each completed day was rewarded exactly once
+        self.assertEqual(completions.count(), HabitLog.objects.filter(habit__user=self.user, status='completed').count())
+        self.assertEqual(
+            sorted(completions.values_list('reference', flat=True)),
+            sorted(str(habit_id) for habit_id in self.user.habits.filter(logs__status='completed').values_list('id', flat=True))
+        )
+        # Successful purchases all committed (a refused read after the commit
+        # can make a committed one report an error on SQLite)
+        bought = sum(1 for kind, value in results if kind == 'purchase' and value)
+        errors = sum(1 for kind, _ in results if kind == 'error')
+        self.assertGreaterEqual(purchases.count(), bought)
+        self.assertLessEqual(purchases.count(), bought + errors)
@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.test import TestCase
+
+from api.log_import import import_logs
+from api.models import Habit, HabitLog, User
+
+
+class LogImportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='importer', email='importer@example.com')
+        self.habit = Habit.objects.create(user=self.user, name='run')
+        HabitLog.objects.create(habit=self.habit, log_date=date(2024, 1, 2), status='missed', note='kept')
+
+    def lines(self, days):
+        return ['habit,date,status'] + [f'{self.habit.id},2024-01-{day:02d},completed' for day in days]
+
+    def test_keep_existing_counts_only_inserted_rows(self):
+        result = import_logs(self.lines([1, 2, 3]), user=self.user, overwrite=False, chunk_size=2)
+
+        self.assertEqual(result['rows'], 3)
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['skipped'], 1)
+        self.assertEqual(HabitLog.objects.get(habit=self.habit, log_date=date(2024, 1, 2)).note, 'kept')
+        self.assertEqual(self.habit.logs.count(), 3)
+
+    def test_overwrite_counts_replaced_rows(self):
+        result = import_logs(self.lines([1, 2, 3]), user=self.user)
+
+        self.assertEqual(result['imported'], 3)
+        self.assertEqual(result['skipped'], 0)
+        self.assertEqual(HabitLog.objects.get(habit=self.habit, log_date=date(2024, 1, 2)).status, 'completed')
+
+    def test_amounts_the_column_cannot_hold_are_reported(self):
+        amounts = ['NaN', 'Infinity', '-Infinity', '1e20', '1.234', 'lots']
+        lines = ['habit,date,status,amount_done'] + [
+            f'{self.habit.id},2024-02-{day:02d},completed,{amount}' for day, amount in enumerate(amounts, start=1)
+        ] + [f'{self.habit.id},2024-02-20,completed,12.5']
+
+        result = import_logs(lines, user=self.user)
+
+        self.assertEqual(result['invalid'], len(amounts))
+        self.assertEqual([error['line'] for error in result['errors']], list(range(2, 2 + len(amounts))))
+        self.assertTrue(all(error['error'].startswith('amount_done') for error in result['errors']))
+        self.assertEqual(result['imported'], 1)
+        self.assertEqual(str(HabitLog.objects.get(habit=self.habit, log_date=date(2024, 2, 20)).amount_done), '12.50')
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Friend, Habit, HabitLog, Reward, User, UserReward
+from api.profiles import MAX_PROFILE_BATCH
+
+
+class ProfilesEndpointTests(TestCase):
+
+    def setUp(self):
+        self.viewer = User.objects.create(username='viewer', email='viewer@example.com')
+        self.friends = [
+            User.objects.create(username=f'friend{i}', email=f'friend{i}@example.com', avatar_url=f'https://example.com/{i}.png')
+            for i in range(3)
+        ]
+        for friend in self.friends:
+            Friend.objects.create(user=self.viewer, friend=friend, status='accepted')
+        self.stranger = User.objects.create(username='stranger', email='stranger@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def get_profiles(self, ids):
+        return self.client.get('/api/users/profiles/', {'ids': ','.join(map(str, ids))})
+
+    def add_habits(self, user):
+        today = timezone.now().date()
+        habit = Habit.objects.create(user=user, name='read', emoji='📚', is_public=True, duration_days=10, current_streak=2)
+        HabitLog.objects.create(habit=habit, log_date=today, status='completed')
+        HabitLog.objects.create(habit=habit, log_date=today - timedelta(days=1), status='missed')
+        Habit.objects.create(user=user, name='secret', is_public=False)
+        return habit
+
+    def test_returns_friend_profiles_in_request_order(self):
+        habit = self.add_habits(self.friends[1])
+        reward = Reward.objects.create(name='fox', category='avatar', icon_url='https://example.com/fox.png')
+        UserReward.objects.create(user=self.friends[1], reward=reward)
+
+        ids = [self.friends[1].id, self.stranger.id, self.friends[0].id, 999999]
+        response = self.get_profiles(ids)
+
+        self.assertEqual(response.status_code, 200)
+        profiles = response.data['profiles']
+        self.assertEqual([profile['user']['id'] for profile in profiles], [self.friends[1].id, self.friends[0].id])
+        self.assertEqual(response.data['unavailable'], [self.stranger.id, 999999])
+        self.assertEqual(profiles[0]['public_habits'], [{
+            'id': habit.id, 'name': 'read', 'emoji': '📚', 'current_streak': 2, 'progress': 10.0,
+        }])
+        self.assertEqual(profiles[0]['characters'], ['https://example.com/fox.png'])
+        # Without avatar rewards the avatar url is the character
+        self.assertEqual(profiles[1]['public_habits'], [])
+        self.assertEqual(profiles[1]['characters'], ['https://example.com/0.png'])
+
+    def test_matches_single_profile_action(self):
+        self.add_habits(self.friends[2])
+        single = self.client.get(f'/api/users/{self.friends[2].id}/profile/').data
+
+        batched = self.get_profiles([self.friends[2].id]).data['profiles'][0]
+
+        self.assertEqual(batched, single)
+
+    def test_query_count_does_not_grow_with_users(self):
+        with CaptureQueriesContext(connection) as one:
+            self.get_profiles([self.friends[0].id])
+        for friend in self.friends:
+            self.add_habits(friend)
+        with CaptureQueriesContext(connection) as many:
+            self.get_profiles([friend.id for friend in self.friends])
+
+        self.assertEqual(len(many), len(one))
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.get_profiles([]).status_code, 400)
+        self.assertEqual(self.client.get('/api/users/profiles/', {'ids': '1,x'}).status_code, 400)
+        too_many = range(1, MAX_PROFILE_BATCH + 2)
+        self.assertEqual(self.get_profiles(too_many).status_code, 400)
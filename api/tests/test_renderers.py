@@ -0,0 +1,43 @@
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from uuid import UUID
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+from api.renderers import FastJSONRenderer
+
+
+@unittest.skipIf(renderers.orjson is None, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+    """FastJSONRenderer output is byte-identical to JSONRenderer"""
+
+    def assertRendersLikeJSONRenderer(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data), data)
+
+    def test_plain_data(self):
+        self.assertRendersLikeJSONRenderer([
+            {'id': 1, 'name': 'read ☀ ', 'done': True, 'note': None, 'rate': 0.5, 'tags': ['a', ('b', 2)]},
+            {'when': datetime(2026, 1, 1, 12, 30, 0, 15, tzinfo=dt_timezone.utc), 'took': timedelta(minutes=3)},
+            {'uuid': UUID('12345678-1234-5678-1234-567812345678'), 'nested': {'x': [{'y': 1e-4}, 9999999999999998.0]}},
+        ])
+
+    def test_floats_in_other_notation(self):
+        for value in [1e16, -1.5e300, 1e-5, 9.99e-5, 1e-7, 5e-324, 0.0, -0.0, 1e15, 0.1]:
+            self.assertRendersLikeJSONRenderer({'value': value})
+            self.assertRendersLikeJSONRenderer([[value]])
+            self.assertRendersLikeJSONRenderer(value)
+
+    def test_non_finite_floats_raise(self):
+        for value in [float('nan'), float('inf'), float('-inf')]:
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'values': [1, {'value': value}]})
+
+    def test_values_orjson_cannot_encode(self):
+        self.assertRendersLikeJSONRenderer({'big': 2 ** 64, 'small': -2 ** 70})
+        self.assertRendersLikeJSONRenderer({1: 'one', None: 'none', True: 'yes'})
+
+    def test_values_for_the_json_encoder(self):
+        self.assertRendersLikeJSONRenderer({'amount': Decimal('12.50'), 'huge': Decimal('1e20'), 'set': {1}})
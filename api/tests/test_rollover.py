@@ -0,0 +1,64 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api.algorithms.completion_calendar import calendar_status, record_log
+from api.algorithms.rollover import roll_over_habits
+from api.algorithms.streak_calculator import update_streak
+from api.models import Habit, HabitLog, User
+
+
+class RolloverTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='sleeper', email='sleeper@example.com')
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def make_habit(self, name, completed_days_ago):
+        habit = Habit.objects.create(user=self.user, name=name)
+        Habit.objects.filter(id=habit.id).update(created_at=timezone.now() - timedelta(days=10))
+        habit = Habit.objects.get(id=habit.id)
+        for days_ago in completed_days_ago:
+            HabitLog.objects.create(habit=habit, log_date=self.today - timedelta(days=days_ago), status='completed')
+            record_log(habit, self.today - timedelta(days=days_ago), 'completed')
+        update_streak(habit)
+        habit.save()
+        return habit
+
+    def test_marks_missed_and_breaks_streaks(self):
+        broken = self.make_habit('broken', [2, 3])
+        kept = self.make_habit('kept', [1, 2])
+
+        call_command('rollover_day', stdout=StringIO())
+        call_command('rollover_day', stdout=StringIO())
+
+        broken.refresh_from_db()
+        kept.refresh_from_db()
+        self.assertEqual(HabitLog.objects.get(habit=broken, log_date=self.yesterday).status, 'missed')
+        self.assertEqual(calendar_status(broken, self.yesterday), 'missed')
+        self.assertEqual(broken.current_streak, 0)
+        self.assertFalse(broken.streaks.filter(is_current=True).exists())
+        self.assertEqual(kept.current_streak, 2)
+        self.assertEqual(HabitLog.objects.filter(log_date=self.yesterday, status='missed').count(), 1)
+
+    def test_habits_logged_after_selection_are_left_alone(self):
+        habit = self.make_habit('late', [2, 3])
+        selected = [habit.id]
+
+        # A revive of yesterday lands between selection and rollover
+        HabitLog.objects.create(habit=habit, log_date=self.yesterday, status='completed')
+        record_log(habit, self.yesterday, 'completed')
+        update_streak(habit)
+        habit.save()
+
+        result = roll_over_habits(selected, self.yesterday)
+
+        habit.refresh_from_db()
+        self.assertEqual(result, {'missed': 0, 'broken': 0})
+        self.assertEqual(calendar_status(habit, self.yesterday), 'completed')
+        self.assertEqual(habit.current_streak, 3)
+        self.assertEqual(HabitLog.objects.get(habit=habit, log_date=self.yesterday).status, 'completed')
@@ -0,0 +1,241 @@
+import random
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.algorithms import streak_calculator
+from api.algorithms.bulk_streaks import rebuild_streaks_for_habits
+from api.algorithms.completion_calendar import rebuild_calendar
+from api.algorithms.habit_completion import mark_habit_complete, mark_habit_incomplete
+from api.models import Habit, HabitLog, Streak, User
+
+# Operations applied on one day: c = complete, m = mark missed
+DAY_OPERATIONS = [[], ['c'], ['m'], ['c', 'm'], ['m', 'c'], ['c', 'm', 'c']]
+
+
+class IncrementalStreakTests(TestCase):
+    """update_streak_for_date must agree with calculate_streaks over the full history"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='streaks', email='streaks@example.com')
+
+    def assert_matches_full_rescan(self, habit, longest_seen):
+        expected = streak_calculator.calculate_streaks(list(habit.logs.all()))
+        self.assertEqual(habit.current_streak, expected['current_streak'])
+        self.assertEqual(habit.longest_streak, longest_seen)
+
+        current = list(habit.streaks.filter(is_current=True))
+        if expected['current_streak']:
+            self.assertEqual(len(current), 1)
+            self.assertEqual(current[0].start_date, expected['current_streak_start'])
+            self.assertEqual(current[0].length_days, expected['current_streak'])
+        else:
+            self.assertEqual(current, [])
+
+    def test_randomized_histories_match_calculate_streaks(self):
+        start = timezone.now()
+        rebuilds = []
+        full_rebuild = streak_calculator.update_streak
+
+        def counting_rebuild(habit):
+            rebuilds.append(habit.id)
+            return full_rebuild(habit)
+
+        for seed in range(20):
+            rng = random.Random(seed)
+            habit = Habit.objects.create(user=self.user, name=f'habit {seed}')
+            longest_seen = 0
+
+            with mock.patch.object(streak_calculator, 'update_streak', counting_rebuild):
+                for day in range(rng.randint(5, 50)):
+                    now = start + timedelta(days=day)
+                    with mock.patch('django.utils.timezone.now', return_value=now):
+                        for operation in rng.choice(DAY_OPERATIONS):
+                            habit = Habit.objects.get(pk=habit.pk)
+                            if operation == 'c':
+                                # Allow completing again after marking missed the same day
+                                habit.last_completed_date = None
+                                mark_habit_complete(habit)
+                            else:
+                                mark_habit_incomplete(habit)
+
+                            habit = Habit.objects.get(pk=habit.pk)
+                            expected = streak_calculator.calculate_streaks(list(habit.logs.all()))
+                            longest_seen = max(longest_seen, expected['longest_streak'])
+                            with self.subTest(seed=seed, day=day, operation=operation):
+                                self.assert_matches_full_rescan(habit, longest_seen)
+
+        # Only today's log changes, so the incremental path never needs a rebuild
+        self.assertEqual(rebuilds, [])
+
+
+class ReviveStreakTests(TestCase):
+    """Reviving a past day merges the runs around it (revive_streak)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='reviver', email='reviver@example.com', leaf_dollars=50)
+        self.today = timezone.now().date()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_habit(self, completed_days_ago):
+        habit = Habit.objects.create(user=self.user, name='meditate')
+        Habit.objects.filter(id=habit.id).update(created_at=timezone.now() - timedelta(days=30))
+        habit = Habit.objects.get(id=habit.id)
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=habit, log_date=self.today - timedelta(days=days_ago), status='completed')
+            for days_ago in completed_days_ago
+        ])
+        rebuild_calendar(habit)
+        habit.save()
+        rebuild_streaks_for_habits([habit], self.today)
+        habit.refresh_from_db()
+        return habit
+
+    def revive(self, habit, days_ago):
+        response = self.client.post(
+            f'/api/habits/{habit.id}/revive/',
+            {'date': (self.today - timedelta(days=days_ago)).isoformat()},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        habit.refresh_from_db()
+        return response
+
+    def assert_matches_full_rescan(self, habit):
+        expected = streak_calculator.calculate_streaks(list(habit.logs.all()))
+        self.assertEqual(habit.current_streak, expected['current_streak'])
+        self.assertEqual(habit.longest_streak, expected['longest_streak'])
+
+    def runs(self, habit):
+        return [
+            (record.start_date, record.length_days, record.is_current)
+            for record in habit.streaks.order_by('start_date')
+        ]
+
+    def test_revived_day_bridges_two_runs(self):
+        habit = self.make_habit([6, 5, 3, 2, 1])
+        self.assertEqual(habit.current_streak, 3)
+
+        response = self.revive(habit, 4)
+
+        self.assertEqual(response.data['new_streak'], 6)
+        self.assertEqual(habit.current_streak, 6)
+        self.assertEqual(habit.longest_streak, 6)
+        self.assertEqual(self.runs(habit), [(self.today - timedelta(days=6), 6, True)])
+        self.assert_matches_full_rescan(habit)
+
+    def test_revived_day_extends_the_current_run(self):
+        habit = self.make_habit([2, 1])
+
+        self.revive(habit, 3)
+
+        self.assertEqual(habit.current_streak, 3)
+        self.assertEqual(habit.longest_streak, 3)
+        self.assertEqual(self.runs(habit), [(self.today - timedelta(days=3), 3, True)])
+        self.assert_matches_full_rescan(habit)
+
+    def test_isolated_old_day_leaves_the_current_streak(self):
+        habit = self.make_habit([12, 11, 10, 2, 1])
+
+        self.revive(habit, 6)
+
+        self.assertEqual(habit.current_streak, 2)
+        self.assertEqual(habit.longest_streak, 3)
+        self.assertEqual(self.runs(habit), [
+            (self.today - timedelta(days=12), 3, False),
+            (self.today - timedelta(days=6), 1, False),
+            (self.today - timedelta(days=2), 2, True),
+        ])
+        self.assert_matches_full_rescan(habit)
+
+    def test_failed_derived_write_rolls_back_the_revive(self):
+        habit = self.make_habit([2, 1])
+
+        with mock.patch('api.views.record_rollup_change', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(
+                    f'/api/habits/{habit.id}/revive/',
+                    {'date': (self.today - timedelta(days=3)).isoformat()},
+                    format='json'
+                )
+
+        self.user.refresh_from_db()
+        habit.refresh_from_db()
+        self.assertEqual(self.user.leaf_dollars, 50)
+        self.assertFalse(habit.logs.filter(log_date=self.today - timedelta(days=3), status='completed').exists())
+        self.assertEqual(habit.current_streak, 2)
+
+
+class RebuildStreaksCommandTests(TestCase):
+    """rebuild_streaks must agree with update_streak on habits with gaps"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='rebuilder', email='rebuilder@example.com')
+        self.today = timezone.now().date()
+
+    def make_habit(self, name, days_ago):
+        """A habit with completed logs on days_ago and missed logs filling the gaps"""
+        habit = Habit.objects.create(user=self.user, name=name)
+        Habit.objects.filter(id=habit.id).update(created_at=timezone.now() - timedelta(days=30))
+        habit = Habit.objects.get(id=habit.id)
+        HabitLog.objects.bulk_create([
+            HabitLog(
+                habit=habit,
+                log_date=self.today - timedelta(days=day),
+                status='completed' if day in days_ago else 'missed'
+            )
+            for day in range(max(days_ago) + 1)
+        ])
+        rebuild_calendar(habit)
+        habit.save()
+        return habit
+
+    def expected(self, habit):
+        """Streak state update_streak computes for a copy of the habit"""
+        copy = Habit.objects.get(id=habit.id)
+        with transaction.atomic():
+            streak_calculator.update_streak(copy)
+            current = copy.streaks.filter(is_current=True).values_list('start_date', 'length_days').first()
+            transaction.set_rollback(True)
+        return copy.current_streak, copy.longest_streak, current
+
+    def test_rebuilt_streaks_match_update_streak(self):
+        habits = [
+            self.make_habit('current', [0, 1, 2, 5, 6, 9, 10, 11, 12]),
+            self.make_habit('from yesterday', [1, 2, 4]),
+            self.make_habit('broken', [3, 4, 5, 6, 8]),
+        ]
+        expected = [self.expected(habit) for habit in habits]
+        # Stale stored streaks
+        Habit.objects.filter(id__in=[habit.id for habit in habits]).update(current_streak=7, longest_streak=1)
+        Streak.objects.filter(habit__in=habits).delete()
+
+        out = StringIO()
+        call_command('rebuild_streaks', '--dry-run', stdout=out)
+        self.assertIn('3 of 3 habits have stale streaks', out.getvalue())
+        call_command('rebuild_streaks', '--batch-size', '2', stdout=StringIO())
+
+        for habit, (current_streak, longest_streak, current_run) in zip(habits, expected):
+            habit.refresh_from_db()
+            with self.subTest(habit=habit.name):
+                self.assertEqual(habit.current_streak, current_streak)
+                self.assertEqual(habit.longest_streak, longest_streak)
+                self.assertEqual(
+                    habit.streaks.filter(is_current=True).values_list('start_date', 'length_days').first(),
+                    current_run
+                )
+        self.assertEqual([habit.current_streak for habit in habits], [3, 2, 0])
+        self.assertEqual([habit.longest_streak for habit in habits], [4, 2, 4])
+        # Every run is recorded, not only the current one
+        self.assertEqual(habits[0].streaks.count(), 3)
+
+        out = StringIO()
+        call_command('rebuild_streaks', '--dry-run', stdout=out)
+        self.assertIn('0 of 3 habits have stale streaks', out.getvalue())
@@ -0,0 +1,130 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.algorithms.completion_calendar import rebuild_calendar
+from api.models import Habit, HabitLog, User
+from api import sync
+
+
+class DeltaSyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='syncer', email='syncer@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name='read')
+        today = timezone.now().date()
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=self.habit, log_date=today - timedelta(days=day), status='completed')
+            for day in range(5)
+        ])
+
+    def test_reset_is_streamed_in_chunks(self):
+        with mock.patch.object(sync, 'SYNC_CHUNK_SIZE', 2):
+            response = self.client.get('/api/habits/sync/')
+            document = json.loads(b''.join(response.streaming_content))
+
+        self.assertTrue(response.streaming)
+        self.assertTrue(document['reset'])
+        self.assertEqual(len(document['logs']), 5)
+        self.assertEqual([habit['id'] for habit in document['habits']], [self.habit.id])
+        self.assertEqual(document['leaf_dollars'], self.user.leaf_dollars)
+
+    def test_delta_reports_deactivated_habits(self):
+        cursor = json.loads(b''.join(self.client.get('/api/habits/sync/').streaming_content))['cursor']
+        self.client.patch(f'/api/habits/{self.habit.id}/', {'is_active': False}, format='json')
+
+        response = self.client.get('/api/habits/sync/', {'cursor': cursor})
+
+        self.assertFalse(response.data['reset'])
+        self.assertEqual([(habit['id'], habit['is_active']) for habit in response.data['habits']], [(self.habit.id, False)])
+        self.assertEqual(response.data['logs'], [])
+
+    def test_delta_resends_logs_of_reactivated_habits(self):
+        cursor = json.loads(b''.join(self.client.get('/api/habits/sync/').streaming_content))['cursor']
+        self.client.patch(f'/api/habits/{self.habit.id}/', {'is_active': False}, format='json')
+        cursor = self.client.get('/api/habits/sync/', {'cursor': cursor}).data['cursor']
+        # Inactive habits are hidden from the API; reactivated e.g. in the admin
+        habit = Habit.objects.get(pk=self.habit.pk)
+        habit.is_active = True
+        habit.save()
+
+        response = self.client.get('/api/habits/sync/', {'cursor': cursor})
+
+        self.assertFalse(response.data['reset'])
+        self.assertEqual([(habit['id'], habit['is_active']) for habit in response.data['habits']], [(self.habit.id, True)])
+        self.assertEqual(len(response.data['logs']), 5)
+
+
+class BitmapModeTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='bitmapper', email='bitmapper@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name='read')
+        Habit.objects.filter(id=self.habit.id).update(created_at=timezone.make_aware(datetime(2023, 12, 1)))
+        statuses = {
+            date(2023, 12, 30): 'completed',
+            date(2023, 12, 31): 'missed',
+            date(2024, 1, 1): 'completed',
+            date(2024, 1, 3): 'skipped',
+            date(2024, 12, 31): 'completed',
+            date(2025, 2, 1): 'missed',
+        }
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=self.habit, log_date=log_date, status=log_status)
+            for log_date, log_status in statuses.items()
+        ])
+        HabitLog.objects.create(habit=self.habit, log_date=date(2024, 6, 1), status='completed', amount_done=2.5, note='long one')
+        self.habit.refresh_from_db()
+        rebuild_calendar(self.habit)
+        self.habit.save()
+        self.other = Habit.objects.create(user=self.user, name='empty')
+
+    def decode(self, years):
+        """Turn a years document back into {date: 'completed' or 'missed'}"""
+        days = {}
+        for year, bitmaps in years.items():
+            for log_status, encoded in bitmaps.items():
+                bits = int.from_bytes(base64.b64decode(encoded), 'little')
+                for day in range(bits.bit_length()):
+                    if bits >> day & 1:
+                        days[date(int(year), 1, 1) + timedelta(days=day)] = log_status
+        return days
+
+    def expected_days(self):
+        return {
+            log.log_date: 'completed' if log.status == 'completed' else 'missed'
+            for log in HabitLog.objects.filter(habit=self.habit)
+        }
+
+    def test_logs_bitmaps_match_stored_logs(self):
+        response = self.client.get(f'/api/habits/{self.habit.id}/logs/', {'mode': 'bitmap'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['encoding'], 'bitmap')
+        self.assertEqual(sorted(response.data['years']), ['2023', '2024', '2025'])
+        self.assertEqual(self.decode(response.data['years']), self.expected_days())
+        self.assertEqual(response.data['details'], [
+            {'date': '2024-01-03', 'status': 'skipped', 'amount_done': None, 'note': ''},
+            {'date': '2024-06-01', 'status': 'completed', 'amount_done': 2.5, 'note': 'long one'},
+        ])
+
+    def test_all_logs_bitmaps_cover_every_active_habit(self):
+        Habit.objects.create(user=self.user, name='gone', is_active=False)
+
+        response = self.client.get('/api/habits/all_logs/', {'mode': 'bitmap'})
+
+        self.assertEqual(response.data['encoding'], 'bitmap')
+        self.assertEqual(response.data['leaf_dollars'], self.user.leaf_dollars)
+        habits = response.data['habits']
+        self.assertEqual([habit['habit_id'] for habit in habits], [self.habit.id, self.other.id])
+        self.assertEqual(self.decode(habits[0]['years']), self.expected_days())
+        self.assertEqual(habits[1], {'habit_id': self.other.id, 'years': {}, 'details': []})
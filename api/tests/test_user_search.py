@@ -0,0 +1,36 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import User
+from api.user_search import search_users
+
+
+class UserSearchTermTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='jane_doe', email='jane@example.com', display_name='Jane Doe')
+
+    def terms(self):
+        return set(self.user.search_terms.values_list('term', flat=True))
+
+    def test_terms_written_on_create(self):
+        self.assertEqual(self.terms(), {'jane_doe', 'jane', 'doe', 'jane doe', 'jane@example.com'})
+        self.assertEqual(list(search_users('do')), [self.user])
+
+    def test_name_change_rewrites_terms(self):
+        self.user.display_name = 'Janet'
+        self.user.save(update_fields=['display_name'])
+
+        self.assertEqual(self.terms(), {'jane_doe', 'jane', 'doe', 'janet', 'jane@example.com'})
+        self.assertEqual(list(search_users('janet')), [self.user])
+
+    def test_other_field_updates_skip_terms(self):
+        self.user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+    def test_unchanged_terms_are_not_rewritten(self):
+        user = User.objects.get(pk=self.user.pk)
+        # UPDATE users, then read the stored terms
+        with self.assertNumQueries(2):
+            user.save()
@@ -0,0 +1,24 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from api.algorithms.user_stats import check_stats_cache
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+SHARED = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/habittree-test-cache'}}
+
+
+class StatsCacheCheckTests(SimpleTestCase):
+    """A stats cache timeout needs a cache shared by all workers"""
+
+    @override_settings(USER_STATS_CACHE_TIMEOUT=60, CACHES=LOCMEM)
+    def test_timeout_with_per_process_cache_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_stats_cache()
+
+    @override_settings(USER_STATS_CACHE_TIMEOUT=0, CACHES=LOCMEM)
+    def test_disabled_cache_is_allowed(self):
+        check_stats_cache()
+
+    @override_settings(USER_STATS_CACHE_TIMEOUT=60, CACHES=SHARED)
+    def test_timeout_with_shared_cache_is_allowed(self):
+        check_stats_cache()
@@ -0,0 +1,84 @@
+"""
+User search
+
+Index-backed user search for the friends screen. On PostgreSQL the
+substring match on username, email and display name is served by the
+trigram GIN indexes from migration 0009 and results are ranked by match
+quality and trigram similarity. Other databases match word prefixes through
+the user_search_terms table, which is a plain index range scan.
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from .models import User, UserSearchTerm
+
+# Maximum number of users returned per search
+SEARCH_RESULT_LIMIT = 20
+
+# Matching terms read (in term order, so exact and shortest matches first)
+# before ranking; keeps short, unselective prefixes from ranking every user
+SEARCH_CANDIDATE_LIMIT = 500
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _match_rank(query):
+    """Rank matches: exact username, then username/display name/email prefixes, then the rest"""
+    return Case(
+        When(username__iexact=query, then=Value(0)),
+        When(username__istartswith=query, then=Value(1)),
+        When(display_name__istartswith=query, then=Value(2)),
+        When(email__istartswith=query, then=Value(3)),
+        default=Value(4),
+        output_field=IntegerField()
+    )
+
+
+def search_users(query, exclude_user=None, limit=SEARCH_RESULT_LIMIT):
+    """
+    Search users by username, email or display name.
+
+    Args:
+        query: Search text (at least one character)
+        exclude_user: User to leave out of the results (optional)
+        limit: Maximum number of results
+
+    Returns:
+        QuerySet: Matching users, best matches first
+    """
+    query = query.strip()
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+
+        users = User.objects.filter(
+            Q(username__icontains=query) |
+            Q(email__icontains=query) |
+            Q(display_name__icontains=query)
+        ).annotate(
+            match_rank=_match_rank(query),
+            similarity=Greatest(
+                TrigramSimilarity('username', query),
+                TrigramSimilarity('display_name', query)
+            )
+        ).order_by('match_rank', '-similarity', 'username')
+    else:
+        prefix = query.lower()
+        matching_ids = UserSearchTerm.objects.filter(
+            term__gte=prefix,
+            term__lt=_prefix_upper_bound(prefix)
+        ).order_by('term').values('user_id')[:SEARCH_CANDIDATE_LIMIT]
+
+        users = User.objects.filter(
+            id__in=matching_ids
+        ).annotate(
+            match_rank=_match_rank(query)
+        ).order_by('match_rank', 'username')
+
+    if exclude_user is not None:
+        users = users.exclude(id=exclude_user.id)
+
+    return users[:limit]
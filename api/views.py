@@ -4,18 +4,41 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from django.db import transaction
-from .models import Habit, HabitLog, Reward, UserReward, Friend
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from .models import Habit, HabitLog, Reward, UserReward, Friend, Friendship
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, HabitSerializer, HabitCreateSerializer,
-    HabitStatsSerializer, HabitLogSerializer, HabitCompletionSerializer,
-    RewardSerializer, UserRewardSerializer, FriendSerializer, UserSearchSerializer
+    HabitStatsSerializer, RangeStreakStatsSerializer, HabitLogSerializer, HabitCompletionSerializer,
+    RewardSerializer, UserRewardSerializer, FriendSerializer, UserSearchSerializer,
+    LeaderboardEntrySerializer, GlobalLeaderboardRowSerializer, FeedEntrySerializer,
+    DailyRollupSerializer
 )
 from .algorithms.habit_completion import (
     mark_habit_complete, mark_habit_incomplete,
-    can_complete_habit, get_completion_stats, get_today_completion
+    get_completion_stats, get_today_completion,
+    annotate_completion_summary, annotate_today_status, check_can_complete, mark_habits_complete
 )
-from .algorithms.streak_calculator import update_streak
+from .algorithms.streak_calculator import revive_streak, get_range_streaks
+from .algorithms.completion_calendar import calendar_status, lock_calendars, record_log
+from .algorithms.daily_rollup import (
+    get_rollup_calendar, record_rollup_change, refresh_daily_rollups, rollup_deltas
+)
+from .algorithms.user_stats import get_user_stats, invalidate_user_stats
+from .algorithms.leaf_dollars import debit_leaf_dollars, set_all_leaf_dollars, set_leaf_dollars
+from .algorithms.global_leaderboard import GLOBAL_BOARDS, global_leaderboard
+from .algorithms.leaderboard import (
+    LEADERBOARD_SORTS, get_friends_leaderboard, get_week_start,
+    record_leaderboard_change, refresh_leaderboard_entries
+)
+from .sync import (
+    stream_all_logs, stream_sync_document, sync_log_entry, get_sync_delta, record_tombstone,
+    get_log_bitmaps, get_all_log_bitmaps
+)
+from .log_import import IMPORT_FORMATS, detect_import_format, import_logs
+from .profiles import MAX_PROFILE_BATCH, get_friend_statuses, get_public_profiles
+from .user_search import search_users
+from .feed import FEED_MAX_PAGE_SIZE, FEED_PAGE_SIZE, get_timeline
 
 User = get_user_model()
 
@@ -53,97 +76,154 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get user statistics"""
-        habits = Habit.objects.filter(user=request.user, is_active=True)
-        
-        total_habits = habits.count()
-        total_completed = 0
-        total_completions = 0
-        total_streak = 0
-        longest_streak = 0
-        
-        for habit in habits:
-            today_log = get_today_completion(habit)
-            if today_log and today_log.status == 'completed':
-                total_completed += 1
-            
-            total_completions += habit.logs.filter(status='completed').count()
-            total_streak += habit.current_streak or 0
-            longest_streak = max(longest_streak, habit.longest_streak or 0)
+        return Response(get_user_stats(request.user))
+    
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Per-day completion totals of the current user's active habits, read
+        from the daily rollups. ?year= (default: this year); ?month=1-12
+        (optional, the whole year if omitted). Days without logs are left out.
+        """
+        from calendar import monthrange
+        from datetime import date
+        from django.utils import timezone
+        
+        month = request.query_params.get('month')
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+            month = int(month) if month else None
+            if month is not None and not 1 <= month <= 12:
+                raise ValueError
+            start_date = date(year, 1 if month is None else month, 1)
+        except ValueError:
+            return Response(
+                {'error': 'year and month must be a valid year and month (1-12)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if month is None:
+            end_date = date(year, 12, 31)
+        else:
+            end_date = date(year, month, monthrange(year, month)[1])
+        
+        days = DailyRollupSerializer(get_rollup_calendar(request.user, start_date, end_date), many=True).data
         
         return Response({
-            'total_habits': total_habits,
-            'total_completed_today': total_completed,
-            'completion_rate_today': round((total_completed / total_habits * 100) if total_habits > 0 else 0, 2),
-            'total_completions': total_completions,
-            'average_streak': round((total_streak / total_habits) if total_habits > 0 else 0, 2),
-            'longest_streak': longest_streak,
-            'leaf_dollars': request.user.leaf_dollars
+            'year': year,
+            'month': month,
+            'start_date': start_date,
+            'end_date': end_date,
+            'days': days,
+            'total_completed': sum(day['completed'] for day in days),
+            'total_missed': sum(day['missed'] for day in days),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """
+        Global leaderboard: top users and the current user's rank.
+        ?board=streak (total current streak, default) or completions; ?limit= (max 100)
+        """
+        board = request.query_params.get('board', 'streak')
+        if board not in GLOBAL_BOARDS:
+            return Response(
+                {'error': f'board must be one of: {", ".join(GLOBAL_BOARDS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 100)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be a number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        while True:
+            top = global_leaderboard.top(board, limit)
+            users = User.objects.in_bulk([user_id for _, user_id, _ in top])
+            deleted = [user_id for _, user_id, _ in top if user_id not in users]
+            if not deleted:
+                break
+            # Deleted through another process, which this index cannot see
+            global_leaderboard.remove(deleted)
+        rows = [
+            {'rank': rank, 'user': users[user_id], 'score': score}
+            for rank, user_id, score in top
+        ]
+        
+        my_rank, my_score = global_leaderboard.rank(board, request.user.id)
+        if my_rank is None:
+            # No entry written yet for this user
+            refresh_leaderboard_entries([request.user.id])
+            my_rank, my_score = global_leaderboard.rank(board, request.user.id)
+        
+        return Response({
+            'board': board,
+            'total_users': global_leaderboard.size(board),
+            'top': GlobalLeaderboardRowSerializer(rows, many=True).data,
+            'me': {'rank': my_rank, 'score': my_score},
         })
     
     @action(detail=True, methods=['get'])
     def profile(self, request, pk=None):
         """Get a user's public profile (for friends to view)"""
-        from .models import UserReward
-        
         user = self.get_object()
         
-        # Check if users are friends
-        from .models import Friend
-        are_friends = Friend.objects.filter(
-            Q(user=request.user, friend=user, status='accepted') |
-            Q(user=user, friend=request.user, status='accepted')
-        ).exists()
-        
-        if not are_friends:
+        profile = get_public_profiles(request.user, [user.id]).get(user.id)
+        if not profile:
             return Response(
                 {'error': 'You can only view profiles of your friends'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get public habits with current streaks
-        public_habits = Habit.objects.filter(
-            user=user,
-            is_public=True,
-            is_active=True
-        )
-        
-        habits_data = []
-        for habit in public_habits:
-            # Calculate progress
-            completed = habit.logs.filter(status='completed').count()
-            progress = 0
-            if habit.duration_days and habit.duration_days > 0:
-                progress = round((completed / habit.duration_days) * 100, 2)
-                progress = min(100, progress)
-            
-            habits_data.append({
-                'id': habit.id,
-                'name': habit.name,
-                'emoji': habit.emoji,
-                'current_streak': habit.current_streak or 0,
-                'progress': progress,
-            })
+        return Response({
+            'user': UserSerializer(profile['user']).data,
+            'public_habits': profile['public_habits'],
+            'characters': profile['characters'],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def profiles(self, request):
+        """
+        Get public profiles of several friends at once: ?ids=1,2,3
+        Ids that are not friends (or don't exist) are listed in 'unavailable'.
+        """
+        try:
+            user_ids = list(dict.fromkeys(
+                int(user_id) for user_id in request.query_params.get('ids', '').split(',') if user_id.strip()
+            ))
+        except ValueError:
+            return Response(
+                {'error': 'ids must be a comma-separated list of user ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Get user's characters (avatar rewards)
-        avatar_rewards = UserReward.objects.filter(
-            user=user,
-            reward__category='avatar'
-        ).select_related('reward')
+        if not user_ids:
+            return Response(
+                {'error': 'ids is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        characters = []
-        for user_reward in avatar_rewards:
-            # Get emoji from icon_url or use a default
-            icon = user_reward.reward.icon_url or '👤'
-            characters.append(icon)
+        if len(user_ids) > MAX_PROFILE_BATCH:
+            return Response(
+                {'error': f'At most {MAX_PROFILE_BATCH} ids per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # If no characters from rewards, use avatar_url as fallback
-        if not characters and user.avatar_url:
-            characters.append(user.avatar_url)
+        profiles = get_public_profiles(request.user, user_ids)
         
         return Response({
-            'user': UserSerializer(user).data,
-            'public_habits': habits_data,
-            'characters': characters,
+            'profiles': [
+                {
+                    'user': UserSerializer(profiles[user_id]['user']).data,
+                    'public_habits': profiles[user_id]['public_habits'],
+                    'characters': profiles[user_id]['characters'],
+                }
+                for user_id in user_ids if user_id in profiles
+            ],
+            'unavailable': [user_id for user_id in user_ids if user_id not in profiles],
         })
     
     @action(detail=False, methods=['post'])
@@ -175,12 +255,25 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Purchase the character
+        # Purchase the character; the row lock keeps concurrent purchases from
+        # overwriting each other's unlocked list
         with transaction.atomic():
-            user.leaf_dollars -= character_cost
+            unlocked = User.objects.select_for_update().values_list(
+                'unlocked_characters', flat=True
+            ).get(id=user.id) or []
+            if character_id in unlocked:
+                return Response(
+                    {'error': 'Character already unlocked'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not debit_leaf_dollars(user, character_cost, 'character_purchase', character_id):
+                return Response(
+                    {'error': f'Not enough leaf dollars. Need {character_cost}, have {user.leaf_dollars}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             unlocked.append(character_id)
             user.unlocked_characters = unlocked
-            user.save()
+            user.save(update_fields=['unlocked_characters', 'updated_at'])
         
         return Response({
             'success': True,
@@ -213,7 +306,7 @@ class UserViewSet(viewsets.ModelViewSet):
         user.selected_character = character_id
         if icon_path:
             user.avatar_url = icon_path
-        user.save()
+        user.save(update_fields=['selected_character', 'avatar_url', 'updated_at'])
         
         return Response({
             'success': True,
@@ -249,7 +342,7 @@ class UserViewSet(viewsets.ModelViewSet):
         user.selected_character = character_id
         if icon_path:
             user.avatar_url = icon_path
-        user.save()
+        user.save(update_fields=['unlocked_characters', 'selected_character', 'avatar_url', 'updated_at'])
         
         return Response({
             'success': True,
@@ -295,9 +388,7 @@ class UserViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            old_balance = user.leaf_dollars
-            user.leaf_dollars = int(amount)
-            user.save()
+            old_balance = set_leaf_dollars(user, int(amount))
             
             return Response({
                 'success': True,
@@ -337,7 +428,7 @@ class UserViewSet(viewsets.ModelViewSet):
         
         try:
             # Update all users' leaf dollars
-            updated_count = User.objects.all().update(leaf_dollars=int(amount))
+            updated_count = set_all_leaf_dollars(int(amount))
             
             return Response({
                 'success': True,
@@ -358,7 +449,14 @@ class HabitViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Return habits for the current user"""
-        return Habit.objects.filter(user=self.request.user, is_active=True)
+        habits = Habit.objects.filter(user=self.request.user, is_active=True)
+        if self.action in ['list', 'retrieve']:
+            # Today's log and completed count for HabitSerializer in constant queries
+            habits = annotate_completion_summary(habits)
+        elif self.action == 'complete':
+            # Today's log status for check_can_complete, in the same query
+            habits = annotate_today_status(habits)
+        return habits
     
     def get_serializer_class(self):
         """Use different serializer for create"""
@@ -371,19 +469,53 @@ class HabitViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         habit = serializer.save(user=request.user)
+        invalidate_user_stats(request.user.id)
+        # Today's active habit count changed
+        refresh_daily_rollups([request.user.id], [habit.created_at.date()])
         
         # Return full habit data with id
         output_serializer = HabitSerializer(habit)
         headers = self.get_success_headers(output_serializer.data)
         return Response(output_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
+    def perform_update(self, serializer):
+        was_active = serializer.instance.is_active
+        habit = serializer.save()
+        invalidate_user_stats(self.request.user.id)
+        # Deactivating a habit drops it from the leaderboard totals
+        refresh_leaderboard_entries([self.request.user.id])
+        if habit.is_active != was_active:
+            # ... and from the daily rollups since it was created
+            refresh_daily_rollups(
+                [self.request.user.id],
+                self._rollup_days(habit)
+            )
+    
+    def perform_destroy(self, instance):
+        rollup_days = self._rollup_days(instance)
+        with transaction.atomic():
+            record_tombstone(instance.user_id, 'habit', instance.id, instance.id)
+            instance.delete()
+        invalidate_user_stats(self.request.user.id)
+        refresh_leaderboard_entries([self.request.user.id])
+        refresh_daily_rollups([self.request.user.id], rollup_days)
+    
+    def _rollup_days(self, habit):
+        """Days whose rollup a habit counts towards (total_active changes from its creation on)"""
+        created = habit.created_at.date()
+        return set(
+            self.request.user.daily_rollups.filter(date__gte=created).values_list('date', flat=True)
+        ) | set(habit.logs.values_list('log_date', flat=True))
+    
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         """Mark habit as complete for today and award leaf dollars"""
         habit = self.get_object()
+        # get_queryset only returns the user's own habits
+        habit.user = request.user
         
         # Check if habit can be completed (24-hour rule)
-        can_complete = can_complete_habit(habit)
+        can_complete = check_can_complete(habit, habit.today_status)
         
         if not can_complete['can_complete']:
             return Response(
@@ -395,6 +527,13 @@ class HabitViewSet(viewsets.ModelViewSet):
         amount_done = request.data.get('amount_done', None)
         result = mark_habit_complete(habit, notes, amount_done)
         
+        # A concurrent request completed it first
+        if result['already_completed']:
+            return Response(
+                {'error': 'Habit already completed today'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         return Response({
             'completion': HabitLogSerializer(result['completion']).data,
             'leaf_dollars_earned': result['leaf_dollars_earned'],
@@ -402,6 +541,67 @@ class HabitViewSet(viewsets.ModelViewSet):
             'total_leaf_dollars': habit.user.leaf_dollars
         })
     
+    @action(detail=False, methods=['post'])
+    def complete_many(self, request):
+        """
+        Mark several habits as complete for today in one request.
+        Returns one result per requested habit id, in the format of complete
+        (or an error for habits that cannot be completed).
+        """
+        habit_ids = request.data.get('habit_ids')
+        if not isinstance(habit_ids, list) or not habit_ids:
+            return Response(
+                {'error': 'habit_ids must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            habit_ids = list(dict.fromkeys(int(habit_id) for habit_id in habit_ids))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'habit_ids must contain habit ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Validate all habits, including today's log status, in one query
+        habits = annotate_today_status(self.get_queryset().filter(id__in=habit_ids))
+        habits_by_id = {habit.id: habit for habit in habits}
+        
+        errors = {}
+        to_complete = []
+        for habit_id in habit_ids:
+            habit = habits_by_id.get(habit_id)
+            if habit is None:
+                errors[habit_id] = 'Habit not found'
+                continue
+            can_complete = check_can_complete(habit, habit.today_status)
+            if not can_complete['can_complete']:
+                errors[habit_id] = can_complete['reason']
+                continue
+            to_complete.append(habit)
+        
+        notes = request.data.get('notes', '')
+        amount_done = request.data.get('amount_done', None)
+        completed = mark_habits_complete(request.user, to_complete, notes, amount_done)
+        
+        results = []
+        for habit_id in habit_ids:
+            if habit_id in errors:
+                results.append({'habit_id': habit_id, 'error': errors[habit_id]})
+                continue
+            result = completed[habit_id]
+            results.append({
+                'habit_id': habit_id,
+                'completion': HabitLogSerializer(result['completion']).data,
+                'leaf_dollars_earned': result['leaf_dollars_earned'],
+                'new_streak': result['new_streak'],
+                'total_leaf_dollars': request.user.leaf_dollars
+            })
+        
+        return Response({
+            'results': results,
+            'total_leaf_dollars': request.user.leaf_dollars
+        })
+    
     @action(detail=True, methods=['post'])
     def incomplete(self, request, pk=None):
         """Mark habit as incomplete for today"""
@@ -453,31 +653,52 @@ class HabitViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get or create log for that date
-        log, created = habit.logs.get_or_create(
-            log_date=target_date,
-            defaults={'status': 'none'}
-        )
-        
-        # Check if already completed
-        if log.status == 'completed':
-            return Response(
-                {'error': 'This day is already completed'},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            # Lock the habit before the log, in the order the other calendar writers use
+            lock_calendars([habit])
+            
+            # Get or create log for that date
+            log, created = HabitLog.objects.select_for_update().get_or_create(
+                habit=habit,
+                log_date=target_date,
+                defaults={'status': 'none'}
+            )
+            
+            # Check if already completed
+            if log.status == 'completed':
+                return Response(
+                    {'error': 'This day is already completed'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Deduct 10 leaf dollars; fails if a concurrent spend got there first
+            if not debit_leaf_dollars(user, 10, 'revive', habit.id):
+                transaction.set_rollback(True)
+                return Response(
+                    {'error': 'Not enough leaf dollars. Need 10 to revive.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Revive: mark as completed
+            log.status = 'completed'
+            log.save()
+            
+            # Update calendar and merge the streaks around the revived day,
+            # committed together with the log and the debit
+            old_streak = habit.current_streak or 0
+            old_status = calendar_status(habit, target_date)
+            record_log(habit, target_date, 'completed')
+            revive_streak(habit, target_date)
+            habit.save()
+            record_rollup_change(user.id, target_date, *rollup_deltas(old_status, 'completed'))
+            record_leaderboard_change(
+                user.id,
+                streak_delta=habit.current_streak - old_streak,
+                completions_delta=1,
+                week_completions_delta=int(target_date >= get_week_start(today))
             )
         
-        # Revive: mark as completed and deduct leaf dollars
-        log.status = 'completed'
-        log.save()
-        
-        # Deduct 10 leaf dollars
-        user.leaf_dollars -= 10
-        user.save()
-        
-        # Recalculate streak
-        from ..algorithms.streak_calculator import update_streak
-        update_streak(habit)
-        habit.save()
+        invalidate_user_stats(user.id)
         
         return Response({
             'completion': HabitLogSerializer(log).data,
@@ -488,11 +709,36 @@ class HabitViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
-        """Get habit statistics"""
+        """
+        Get habit statistics.
+        With ?mode=streaks, returns streak runs, longest streak and completion
+        rate for the optional start_date/end_date range instead.
+        """
+        from datetime import date
+        
         habit = self.get_object()
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         
+        if request.query_params.get('mode') == 'streaks':
+            try:
+                start_date = date.fromisoformat(start_date) if start_date else None
+                end_date = date.fromisoformat(end_date) if end_date else None
+            except ValueError:
+                return Response(
+                    {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            if bool(start_date) != bool(end_date) or (start_date and start_date > end_date):
+                return Response(
+                    {'error': 'start_date and end_date must both be given, with start_date <= end_date'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            stats = get_range_streaks(habit, start_date=start_date, end_date=end_date)
+            return Response(RangeStreakStatsSerializer(stats).data)
+        
         stats = get_completion_stats(
             habit,
             start_date=start_date,
@@ -504,8 +750,15 @@ class HabitViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def logs(self, request, pk=None):
-        """Get all logs for a specific habit"""
+        """
+        Get all logs for a specific habit.
+        With ?mode=bitmap, returns per-year base64 bitmaps of completed and
+        missed days plus a sparse list of logs with amounts/notes instead.
+        """
         habit = self.get_object()
+        if request.query_params.get('mode') == 'bitmap':
+            return Response({'encoding': 'bitmap', **get_log_bitmaps([habit])[0]})
+        
         logs = habit.logs.all().order_by('-log_date')
         return Response({
             'habit_id': habit.id,
@@ -514,27 +767,85 @@ class HabitViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def all_logs(self, request):
-        """Get all habit logs for the current user (for syncing on login)"""
-        user = request.user
-        habits = Habit.objects.filter(user=user, is_active=True)
-        
-        all_logs = []
-        for habit in habits:
-            for log in habit.logs.all():
-                all_logs.append({
-                    'habit_id': habit.id,
-                    'date': log.log_date.isoformat(),
-                    'completed': log.status == 'completed',
-                    'status': log.status,
-                    'amount_done': float(log.amount_done) if log.amount_done else None,
-                })
+        """
+        Get all habit logs for the current user (for syncing on login).
+        Streamed so worker memory stays flat regardless of log count.
+        With ?mode=bitmap, returns the compact per-habit year bitmaps instead.
+        """
+        if request.query_params.get('mode') == 'bitmap':
+            return Response(get_all_log_bitmaps(request.user))
         
-        return Response({
-            'logs': all_logs,
+        return StreamingHttpResponse(
+            stream_all_logs(request.user),
+            content_type='application/json'
+        )
+    
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Delta sync: get habits, logs and deletes changed since ?cursor=.
+        Without a cursor everything is returned with reset=true, streamed
+        like all_logs.
+        """
+        user = request.user
+        try:
+            delta = get_sync_delta(user, request.query_params.get('cursor'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        document = {
+            'cursor': delta['cursor'],
+            'reset': delta['reset'],
+            'habits': HabitSerializer(delta['habits'], many=True).data,
+            'deleted_habits': delta['deleted_habits'],
+            'deleted_logs': delta['deleted_logs'],
             'leaf_dollars': user.leaf_dollars,
             'unlocked_characters': user.unlocked_characters or [],
             'selected_character': user.selected_character
-        })
+        }
+        if delta['reset']:
+            # Full history - stream it instead of building it in memory
+            return StreamingHttpResponse(
+                stream_sync_document(document, delta['logs']),
+                content_type='application/json'
+            )
+        
+        document['logs'] = [sync_log_entry(*row) for row in delta['logs']]
+        return Response(document)
+    
+    @action(detail=False, methods=['post'])
+    def import_logs(self, request):
+        """
+        Bulk import historical logs from an uploaded CSV or NDJSON file.
+        Expects multipart 'file' with rows of (habit, date, status, amount_done, note);
+        optional 'input_format' (csv/ndjson) and 'keep_existing'.
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': 'file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        input_format = request.data.get('input_format') or detect_import_format(upload.name)
+        if input_format not in IMPORT_FORMATS:
+            return Response(
+                {'error': f'input_format must be one of: {", ".join(IMPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        keep_existing = str(request.data.get('keep_existing', '')).lower() in ('1', 'true', 'yes')
+        
+        # Decode the upload line by line instead of reading it into memory
+        lines = (line.decode('utf-8-sig') for line in upload)
+        try:
+            result = import_logs(lines, input_format=input_format, user=request.user, overwrite=not keep_existing)
+        except UnicodeDecodeError:
+            return Response(
+                {'error': 'File must be UTF-8 encoded'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(result)
 
 
 class RewardViewSet(viewsets.ReadOnlyModelViewSet):
@@ -571,15 +882,25 @@ class RewardViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Purchase the reward
-        with transaction.atomic():
-            user.leaf_dollars -= reward.cost_leaf
-            user.save()
-            
-            user_reward = UserReward.objects.create(
-                user=user,
-                reward=reward,
-                is_equipped=False
+        # Purchase the reward; the unique (user, reward) constraint and the
+        # conditional debit make concurrent purchases safe
+        try:
+            with transaction.atomic():
+                user_reward = UserReward.objects.create(
+                    user=user,
+                    reward=reward,
+                    is_equipped=False
+                )
+                if not debit_leaf_dollars(user, reward.cost_leaf, 'reward_purchase', reward.id):
+                    transaction.set_rollback(True)
+                    return Response(
+                        {'error': f'Insufficient leaf dollars. Need {reward.cost_leaf}, have {user.leaf_dollars}'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+        except IntegrityError:
+            return Response(
+                {'error': 'You already own this reward'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
         return Response({
@@ -640,6 +961,12 @@ class FriendViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Return friend relationships for the current user"""
         user = self.request.user
+        if self.action == 'list':
+            # Accepted friendships, through the user's mirrored edges (one
+            # range scan on friendships.user); requests have their own lists
+            return Friend.objects.filter(edges__user=user).select_related('user', 'friend')
+        # Detail actions look up a single request by id, which the primary key
+        # index serves; the condition only restricts it to the user's requests
         return Friend.objects.filter(
             Q(user=user) | Q(friend=user)
         ).select_related('user', 'friend')
@@ -655,16 +982,55 @@ class FriendViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Search users by username, email, or display_name
-        users = User.objects.filter(
-            Q(username__icontains=query) |
-            Q(email__icontains=query) |
-            Q(display_name__icontains=query)
-        ).exclude(id=request.user.id).order_by('username')[:20]
+        # Search users by username, email, or display_name, best matches first
+        users = list(search_users(query, exclude_user=request.user))
         
-        serializer = UserSearchSerializer(users, many=True, context={'request': request})
+        # All relationships with the results in one query instead of per row
+        friend_statuses = get_friend_statuses(request.user, [user.id for user in users])
+        serializer = UserSearchSerializer(
+            users, many=True,
+            context={'request': request, 'friend_statuses': friend_statuses}
+        )
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """
+        Friend activity feed, newest first.
+        Keyset pagination: pass the returned next_cursor as ?before= for the next page.
+        """
+        try:
+            before = request.query_params.get('before')
+            before = int(before) if before else None
+            limit = min(max(int(request.query_params.get('limit', FEED_PAGE_SIZE)), 1), FEED_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response(
+                {'error': 'before and limit must be numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        timeline = get_timeline(request.user, before=before, limit=limit)
+        return Response({
+            'entries': FeedEntrySerializer(timeline['entries'], many=True).data,
+            'next_cursor': timeline['next_cursor'],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """
+        Rank the current user and accepted friends.
+        ?sort=streak (total current streak, default), week (completions this week) or leaf_dollars
+        """
+        sort = request.query_params.get('sort', 'streak')
+        if sort not in LEADERBOARD_SORTS:
+            return Response(
+                {'error': f'sort must be one of: {", ".join(LEADERBOARD_SORTS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = get_friends_leaderboard(request.user, sort)
+        return Response(LeaderboardEntrySerializer(rows, many=True).data)
+    
     @action(detail=False, methods=['post'])
     def send_request(self, request):
         """Send a friend request"""
@@ -690,29 +1056,34 @@ class FriendViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if relationship already exists
-        existing = Friend.objects.filter(
-            Q(user=request.user, friend=friend) | Q(user=friend, friend=request.user)
-        ).first()
+        # Requests in both directions in one query: two probes of the
+        # (user, friend) index instead of an OR across columns
+        pair = [request.user.id, friend.id]
+        existing = {
+            relation.user_id: relation
+            for relation in Friend.objects.filter(user_id__in=pair, friend_id__in=pair)
+        }
+        sent = existing.get(request.user.id)
+        received = existing.get(friend.id)
+        
+        if 'accepted' in (getattr(sent, 'status', None), getattr(received, 'status', None)):
+            return Response(
+                {'error': 'You are already friends'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if existing:
-            if existing.status == 'accepted':
-                return Response(
-                    {'error': 'You are already friends'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            elif existing.status == 'pending':
-                if existing.user == request.user:
-                    return Response(
-                        {'error': 'Friend request already sent'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                else:
-                    # Other user sent request, accept it
-                    existing.status = 'accepted'
-                    existing.save()
-                    serializer = FriendSerializer(existing, context={'request': request})
-                    return Response(serializer.data, status=status.HTTP_200_OK)
+        if sent and sent.status == 'pending':
+            return Response(
+                {'error': 'Friend request already sent'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if received and received.status == 'pending':
+            # Other user sent request, accept it
+            received.status = 'accepted'
+            received.save()
+            serializer = FriendSerializer(received, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_200_OK)
         
         # Create new friend request
         friend_request = Friend.objects.create(
@@ -749,17 +1120,10 @@ class FriendViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def accepted(self, request):
         """Get accepted friends"""
-        friends = Friend.objects.filter(
-            Q(user=request.user) | Q(friend=request.user),
-            status='accepted'
-        ).select_related('user', 'friend')
+        friendships = Friendship.objects.filter(user=request.user).select_related('friend')
         
-        # Return the other user in each friendship
-        friend_list = []
-        for friendship in friends:
-            other_user = friendship.friend if friendship.user == request.user else friendship.user
-            serializer = UserSerializer(other_user)
-            friend_list.append(serializer.data)
+        # Each friendship has an edge from the current user to the other user
+        friend_list = [UserSerializer(friendship.friend).data for friendship in friendships]
         
         return Response(friend_list)
     
@@ -158,10 +158,31 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        # Encodes with orjson when installed, identical output to JSONRenderer
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100,
 }
 
+# Seconds to cache per-user dashboard stats (0 disables the cache). Needs a
+# cache backend shared by all workers: startup fails with the default LocMemCache
+USER_STATS_CACHE_TIMEOUT = config('USER_STATS_CACHE_TIMEOUT', default=0, cast=int)
+
+# Seconds between syncs of each process' global leaderboard index with the database
+GLOBAL_LEADERBOARD_SYNC_SECONDS = config('GLOBAL_LEADERBOARD_SYNC_SECONDS', default=10, cast=int)
+
+# Activity feed: rows per fan-out INSERT and entries kept per timeline
+FEED_FANOUT_BATCH_SIZE = config('FEED_FANOUT_BATCH_SIZE', default=1000, cast=int)
+FEED_TIMELINE_CAP = config('FEED_TIMELINE_CAP', default=500, cast=int)
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=7),
@@ -10,8 +10,18 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'habittree.settings')
 
 application = get_wsgi_application()
 
+
+# Build the in-process global leaderboard index before serving requests; if
+# the database is not reachable yet it is built on first use instead
+from api.algorithms.global_leaderboard import global_leaderboard  # noqa: E402
+
+try:
+    global_leaderboard.rebuild()
+except DatabaseError:
+    pass
@@ -137,6 +137,7 @@ export const logout = (): void => {
   // Data will be synced fresh from backend on next login
   localStorage.removeItem('habits');
   localStorage.removeItem('habitLogs');
+  localStorage.removeItem('habitLogsSyncCursor');
   localStorage.removeItem('friends');
   localStorage.removeItem('friendRequests');
   localStorage.removeItem('leafDollars');
@@ -91,6 +91,17 @@ export const getFriendProfile = async (userId: number): Promise<FriendProfile> =
   return response;
 };
 
+// Get several friends' public profiles in one request
+export interface FriendProfilesResponse {
+  profiles: FriendProfile[];
+  unavailable: number[];
+}
+
+export const getFriendProfiles = async (userIds: number[]): Promise<FriendProfilesResponse> => {
+  const response = await api.get<FriendProfilesResponse>(`/users/profiles/?ids=${userIds.join(',')}`);
+  return response;
+};
+
 // Get friend profile by username (searches in accepted friends first)
 export const getFriendProfileByUsername = async (username: string): Promise<FriendProfile | null> => {
   try {
@@ -109,3 +120,20 @@ export const getFriendProfileByUsername = async (username: string): Promise<Frie
   }
 };
 
+
+// Friends leaderboard (current user and accepted friends)
+export interface LeaderboardEntry {
+  rank: number;
+  user: Pick<User, 'id' | 'username' | 'display_name' | 'avatar_url'>;
+  total_current_streak: number;
+  week_completions: number;
+  leaf_dollars: number;
+  is_me: boolean;
+}
+
+export const getFriendsLeaderboard = async (
+  sort: 'streak' | 'week' | 'leaf_dollars' = 'streak'
+): Promise<LeaderboardEntry[]> => {
+  const response = await api.get<LeaderboardEntry[]>(`/friends/leaderboard/?sort=${sort}`);
+  return response || [];
+};
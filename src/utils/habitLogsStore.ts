@@ -34,7 +34,29 @@ export const setHabitLogs = (logs: HabitLog[]): void => {
   window.dispatchEvent(new Event('habitLogsChanged'));
 };
 
+interface SyncResponse {
+  cursor: string;
+  reset: boolean;
+  habits: { id: number; is_active: boolean }[];
+  logs: BackendLog[];
+  deleted_habits: number[];
+  deleted_logs: { habit_id: number; date: string }[];
+  leaf_dollars: number;
+  unlocked_characters: number[];
+  selected_character: number;
+}
+
+const HABIT_LOGS_CURSOR_KEY = 'habitLogsSyncCursor';
+
+const toFrontendLog = (log: BackendLog): HabitLog => ({
+  habitId: log.habit_id,
+  date: log.date,
+  completed: log.completed,
+  value: log.amount_done || undefined,
+});
+
 // Sync habit logs from backend to localStorage
+// Uses delta sync: only logs changed since the stored cursor are downloaded
 export const syncHabitLogsFromBackend = async (): Promise<void> => {
   try {
     const token = localStorage.getItem('auth_token');
@@ -43,31 +65,46 @@ export const syncHabitLogsFromBackend = async (): Promise<void> => {
       return;
     }
 
-    console.log('Syncing habit logs from backend...');
-    const response = await api.get<{
-      logs: BackendLog[];
-      leaf_dollars: number;
-      unlocked_characters: number[];
-      selected_character: number;
-    }>('/habits/all_logs/');
-
-    console.log('Backend response:', response);
-
-    if (response.logs && response.logs.length > 0) {
-      // Convert backend logs to frontend format
-      const frontendLogs: HabitLog[] = response.logs.map(log => ({
-        habitId: log.habit_id,
-        date: log.date,
-        completed: log.completed,
-        value: log.amount_done || undefined,
-      }));
-
-      console.log('Converted logs:', frontendLogs);
-      setHabitLogs(frontendLogs);
-      console.log('Habit logs synced successfully, count:', frontendLogs.length);
-    } else {
-      console.log('No habit logs from backend');
+    // Without local logs the cursor is meaningless - do a full sync
+    const cursor = localStorage.getItem(HABIT_LOGS_KEY) ? localStorage.getItem(HABIT_LOGS_CURSOR_KEY) : null;
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+
+    console.log(cursor ? 'Syncing habit log changes from backend...' : 'Syncing habit logs from backend...');
+    const response = await api.get<SyncResponse>(`/habits/sync/${query}`);
+
+    if (response.reset) {
+      // Full sync - replace local logs
+      setHabitLogs(response.logs.map(toFrontendLog));
+    } else if (response.logs.length > 0 || response.habits.length > 0 || response.deleted_habits.length > 0 || response.deleted_logs.length > 0) {
+      // Deactivated habits are dropped like deleted ones
+      const deletedHabits = new Set([
+        ...response.deleted_habits.map(String),
+        ...response.habits.filter(habit => !habit.is_active).map(habit => String(habit.id)),
+      ]);
+      const deletedLogs = new Set(response.deleted_logs.map(log => `${log.habit_id}:${log.date}`));
+      const changed = new Map(response.logs.map(log => [`${log.habit_id}:${log.date}`, toFrontendLog(log)]));
+
+      const merged: HabitLog[] = [];
+      for (const log of getHabitLogs()) {
+        const key = `${log.habitId}:${log.date}`;
+        if (deletedHabits.has(String(log.habitId)) || deletedLogs.has(key)) {
+          continue;
+        }
+        const update = changed.get(key);
+        if (update) {
+          // Preserve wasRevived flag if it was already set
+          merged.push({ ...log, ...update, wasRevived: log.wasRevived });
+          changed.delete(key);
+        } else {
+          merged.push(log);
+        }
+      }
+      merged.push(...changed.values());
+      setHabitLogs(merged);
     }
+
+    localStorage.setItem(HABIT_LOGS_CURSOR_KEY, response.cursor);
+    console.log('Habit logs synced successfully, changed:', response.logs.length);
   } catch (error) {
     console.error('Failed to sync habit logs from backend:', error);
   }